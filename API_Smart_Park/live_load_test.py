@@ -0,0 +1,213 @@
+"""
+Load test of the live feed: thousands of subscribers on LiveBroadcast.
+
+Events are published from a background thread at --rate per second, like
+the MQTT thread does with occupancy changes, and each carries its publish
+time. Subscribers either consume LiveBroadcast.stream() directly as
+asyncio tasks (--transport stream), or connect to /live/ws on a uvicorn
+server started in-process (--transport ws). A --slow share of them sleeps
+--slow-delay seconds after every frame to stand in for clients on bad
+networks.
+
+Reports the fan-out latency (publish to delivery, per delivery and until
+the last subscriber got an event), the events dropped, and the lagging
+subscribers: those resynced or disconnected after falling behind the ring
+buffer, and those that got some event more than --lag seconds late. The
+clients share the process (and its CPU) with the server, so the latencies
+are an upper bound for the server alone.
+
+    python live_load_test.py --subscribers 5000 --events 400 --rate 20
+    python live_load_test.py --subscribers 200 --events 3000 --rate 500 --on-overflow disconnect
+    python live_load_test.py --transport ws --subscribers 1000
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from src.imports.live_broadcast import live_broadcast, Overflow, OVERFLOW_POLICIES, OVERFLOW_RESYNC
+from src.imports.local_dynamodb import latency_report
+
+LOAD_EVENT = "load"
+END_EVENT = "load-end"
+CONNECT_CONCURRENCY = 200  # WebSocket handshakes in flight at once
+
+
+class Subscriber:
+    """What one client received: event numbers, latencies, resyncs and how it ended."""
+
+    def __init__(self, slow_delay: float):
+        self.slow_delay = slow_delay
+        self.received = 0
+        self.last = None
+        self.dropped = 0
+        self.resyncs = 0
+        self.snapshots = 0
+        self.disconnected = False
+        self.finished = False
+        self.latencies = []  # (event number, seconds from publish to delivery)
+
+    async def frame(self, events) -> bool:
+        """Handle one frame of decoded events; False once the end marker arrived."""
+        now = time.perf_counter()
+        for event in events:
+            if event["type"] == "snapshot":
+                self.snapshots += 1
+                if self.snapshots > 1:
+                    # Skipped ahead: events up to the next one received are lost
+                    self.resyncs += 1
+                continue
+            if event["type"] == END_EVENT:
+                self.dropped += event["data"]["n"] - (self.last + 1 if self.last is not None else 0)
+                self.finished = True
+                return False
+            if event["type"] != LOAD_EVENT:
+                continue
+            n = event["data"]["n"]
+            self.dropped += n - (self.last + 1 if self.last is not None else 0)
+            self.last = n
+            self.received += 1
+            self.latencies.append((n, now - event["data"]["sent"]))
+        if self.slow_delay:
+            await asyncio.sleep(self.slow_delay)
+        return True
+
+
+async def consume_stream(subscriber: Subscriber, policy: str):
+    stream = live_broadcast.stream(policy)
+    try:
+        async for frame in stream:
+            if frame is not None and not await subscriber.frame([json.loads(event) for event in frame]):
+                return
+    except Overflow:
+        subscriber.disconnected = True
+    finally:
+        await stream.aclose()
+
+
+async def consume_websocket(subscriber: Subscriber, url: str, connecting: asyncio.Semaphore):
+    import websockets
+    async with connecting:
+        connection = await websockets.connect(url, max_queue=None, open_timeout=60)
+    try:
+        async for message in connection:
+            if not await subscriber.frame(json.loads(message)):
+                return
+        subscriber.disconnected = True  # closed by the server (fell behind or too slow)
+    except websockets.ConnectionClosed:
+        subscriber.disconnected = True
+    finally:
+        await connection.close()
+
+
+def publish(events: int, rate: float):
+    """Publisher thread: `events` load events at `rate` per second, then the end marker."""
+    started = time.perf_counter()
+    for n in range(events):
+        delay = started + n / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        live_broadcast.publish(LOAD_EVENT, {"n": n, "sent": time.perf_counter()})
+    live_broadcast.publish(END_EVENT, {"n": events})
+
+
+async def start_server():
+    """uvicorn serving /live on a free local port; returns (server, its serve task, ws url)."""
+    import uvicorn
+    from fastapi import FastAPI
+    from src.routers.live_router import live_router
+
+    app = FastAPI()
+    app.include_router(live_router)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, task, f"ws://127.0.0.1:{port}/live/ws"
+
+
+async def load(transport: str, count: int, slow: float, slow_delay: float, policy: str, events: int, rate: float):
+    live_broadcast.bind(asyncio.get_running_loop())
+    slow_count = int(count * slow)
+    subscribers = [Subscriber(slow_delay if i < slow_count else 0.0) for i in range(count)]
+
+    server = None
+    if transport == "ws":
+        server, serve_task, url = await start_server()
+        connecting = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        tasks = [asyncio.create_task(consume_websocket(s, f"{url}?on_overflow={policy}", connecting)) for s in subscribers]
+    else:
+        tasks = [asyncio.create_task(consume_stream(s, policy)) for s in subscribers]
+
+    started = time.perf_counter()
+    while live_broadcast.metrics()["connections"] < count:
+        await asyncio.sleep(0.05)
+    print(f"{count} subscribers connected in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    await asyncio.to_thread(publish, events, rate)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    if server:
+        server.should_exit = True
+        await serve_task
+    return subscribers, elapsed
+
+
+def report(subscribers, elapsed: float, events: int, lag: float):
+    latencies = [latency for s in subscribers for _, latency in s.latencies]
+    slowest = {}  # event number -> latency of its last delivery
+    for s in subscribers:
+        for n, latency in s.latencies:
+            slowest[n] = max(slowest.get(n, 0.0), latency)
+    fast = [latency for s in subscribers if not s.slow_delay for _, latency in s.latencies]
+
+    expected = events * len(subscribers)
+    delivered = sum(s.received for s in subscribers)
+    late = [s for s in subscribers if any(latency > lag for _, latency in s.latencies)]
+    lagging = [s for s in subscribers if s.resyncs or s.disconnected or s.dropped or s in late]
+    print(f"{events} events to {len(subscribers)} subscribers in {elapsed:.2f}s "
+          f"({delivered / elapsed:,.0f} deliveries/s)")
+    if latencies:
+        print(latency_report("fan-out, every delivery", latencies))
+        print(latency_report("fan-out, last subscriber", list(slowest.values())))
+    if fast and len(fast) != len(latencies):
+        print(latency_report("fan-out, non-slow subscribers", fast))
+    print(f"delivered {delivered}/{expected} ({delivered / expected:.1%}), dropped {expected - delivered}")
+    print(f"lagging subscribers: {len(lagging)} "
+          f"(slow: {sum(1 for s in lagging if s.slow_delay)}), "
+          f"over {lag:g}s late: {len(late)}, resyncs: {sum(s.resyncs for s in subscribers)}, "
+          f"disconnected: {sum(1 for s in subscribers if s.disconnected)}, "
+          f"unfinished: {sum(1 for s in subscribers if not s.finished and not s.disconnected)}")
+    print(f"broadcast: {live_broadcast.metrics()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=("stream", "ws"), default="stream",
+                        help="asyncio consumers of LiveBroadcast.stream, or WebSocket clients of /live/ws")
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=400, help="events published")
+    parser.add_argument("--rate", type=float, default=20, help="events published per second")
+    parser.add_argument("--slow", type=float, default=0.02, help="share of slow subscribers")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="seconds a slow subscriber takes per frame")
+    parser.add_argument("--on-overflow", choices=OVERFLOW_POLICIES, default=OVERFLOW_RESYNC)
+    parser.add_argument("--lag", type=float, default=1.0, help="seconds late an event may be before its subscriber counts as lagging")
+    args = parser.parse_args()
+
+    subscribers, elapsed = asyncio.run(load(args.transport, args.subscribers, args.slow, args.slow_delay,
+                                            args.on_overflow, args.events, args.rate))
+    report(subscribers, elapsed, args.events, args.lag)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Load test: concurrent throughput of /login, /reservations and
+/private-parking/upload/ against a local DynamoDB (moto, or DynamoDB Local
+when DYNAMODB_ENDPOINT is set).
+
+Requests go through the ASGI app in-process (httpx + ASGITransport), and
+every DynamoDB call is delayed by --latency ms, like a network round trip.
+Each endpoint is run twice: once with boto3 calls offloaded by run_io, and
+once with them executed inline on the event loop, which is how the routers
+behaved before run_io.
+
+    python load_test.py --requests 400 --concurrency 50 --latency 20
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import Executor, Future
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+# Captures and archives go to a scratch directory, not the repo's uploads/
+os.chdir(tempfile.mkdtemp(prefix="smartpark-load-"))
+
+import httpx
+from PIL import Image
+
+from src.imports import dynamodb_helper
+from src.imports.auth import create_access_token
+from src.imports.dynamodb_helper import get_table
+from src.imports.local_dynamodb import latency_report, local_dynamodb
+from src.imports.passwords import hash_password
+from src.main import app
+
+PASSWORD = "load-test-password"
+
+
+class InlineExecutor(Executor):
+    """Runs every submitted call right away on the caller's thread (the event loop)."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def add_latency(resource, seconds: float):
+    """Sleep before every DynamoDB call made through `resource`'s client."""
+    def delay(**kwargs):
+        time.sleep(seconds)
+    resource.meta.client.meta.events.register("before-call.dynamodb.*", delay)
+
+
+def jpeg(i: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (i % 256, (i // 256) % 256, 128)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def plate(mode: str, i: int) -> str:
+    # Per mode, so the plate index cache of one run doesn't serve the other
+    return f"{mode[:2].upper()}{i:05d}"
+
+
+def seed_users(mode: str, count: int):
+    # One scrypt hash shared by all users; hashing per user would dominate the setup
+    password_hash = hash_password(PASSWORD)
+    with get_table("Users").batch_writer() as batch:
+        for i in range(count):
+            batch.put_item(Item={
+                "email": f"load-{mode}-{i}@example.com",
+                "name": f"Load {i}",
+                "phone": "+10000000000",
+                "car_plate_ids": [plate(mode, i)],
+                "role": "regular",
+                "password_hash": password_hash,
+            })
+
+
+async def run(client: httpx.AsyncClient, name: str, requests: int, concurrency: int, make_request):
+    """Send `requests` calls with at most `concurrency` in flight; prints throughput and latency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    codes = " ".join(f"{code}x{count}" for code, count in sorted(statuses.items()))
+    print(f"{latency_report(name, latencies)} {requests / elapsed:8.1f} req/s  [{codes}]")
+
+
+async def load(mode: str, day: str, requests: int, concurrency: int):
+    prefix = f"load-{mode}-"
+    device_token = create_access_token("load-camera", "device")
+    images = [jpeg(i) for i in range(requests)]
+
+    def user_headers(i: int) -> dict:
+        return {"Authorization": f"Bearer {create_access_token(f'{prefix}{i}@example.com', 'regular')}"}
+
+    async def login(client, i):
+        return await client.post("/login/", json={"email": f"{prefix}{i}@example.com", "password": PASSWORD})
+
+    async def reserve(client, i):
+        return await client.post("/reservations/", headers=user_headers(i), json={
+            "email": f"{prefix}{i}@example.com",
+            "car_plate": plate(mode, i),
+            "parking_spot_id": i + 1,
+            "date": day,
+            "hour_range": ["10:00", "11:00"],
+        })
+
+    async def list_reservations(client, i):
+        return await client.get("/reservations/", headers=user_headers(i), params={"email": f"{prefix}{i}@example.com"})
+
+    async def upload(client, i):
+        return await client.post(
+            "/private-parking/upload/",
+            headers={"Authorization": f"Bearer {device_token}"},
+            files={"file": (f"capture-{i}.jpg", images[i], "image/jpeg")},
+            data={"plate": plate(mode, i), "spot_id": str(i + 1)},
+        )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+        await run(client, f"{mode} POST /login/", requests, concurrency, login)
+        await run(client, f"{mode} POST /reservations/", requests, concurrency, reserve)
+        await run(client, f"{mode} GET /reservations/", requests, concurrency, list_reservations)
+        await run(client, f"{mode} POST /private-parking/upload/", requests, concurrency, upload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight at once")
+    parser.add_argument("--latency", type=float, default=20, help="extra ms per DynamoDB call")
+    args = parser.parse_args()
+
+    pool = dynamodb_helper.aws_executor
+    # A day per mode, so the spot bitmaps cached by one run don't reject the other's bookings
+    modes = (("run_io", pool, 1), ("inline", InlineExecutor(), 2))
+    for mode, executor, days_ahead in modes:
+        with local_dynamodb() as resource:
+            add_latency(resource, args.latency / 1000)
+            seed_users(mode, args.requests)
+            dynamodb_helper.aws_executor = executor
+            try:
+                day = (date.today() + timedelta(days=days_ahead)).isoformat()
+                asyncio.run(load(mode, day, args.requests, args.concurrency))
+            finally:
+                dynamodb_helper.aws_executor = pool
+    dynamodb_helper.shutdown_io()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import threading
+from bisect import bisect_right, insort
+from datetime import time
+from typing import Dict, List, Optional, Tuple
+from src.imports.reservation_repository import get_reservation_repository
+
+
+def seconds_of_day(t) -> int:
+    """Convert a time object or 'HH:MM:SS' string to seconds since midnight."""
+    if isinstance(t, str):
+        t = time.fromisoformat(t)
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+class _SpotDay:
+    """Reservations of one spot on one day, sorted by start time."""
+
+    def __init__(self):
+        self.intervals: List[Tuple[int, int, str]] = []  # (start, end, reservation_id)
+        self.starts: List[int] = []
+        self.max_end: List[int] = []  # running max of end times, for overlapping intervals
+        self.reservations: Dict[str, Dict] = {}
+
+    def add(self, start: int, end: int, reservation: Dict):
+        insort(self.intervals, (start, end, reservation["reservation_id"]))
+        self.reservations[reservation["reservation_id"]] = reservation
+        self._rebuild()
+
+    def remove(self, reservation_id: str):
+        self.intervals = [i for i in self.intervals if i[2] != reservation_id]
+        self.reservations.pop(reservation_id, None)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.starts = [i[0] for i in self.intervals]
+        self.max_end = []
+        running = -1
+        for _, end, _ in self.intervals:
+            running = max(running, end)
+            self.max_end.append(running)
+
+    def find(self, at: int) -> Optional[Dict]:
+        # Last interval starting at or before `at`, then walk back only while
+        # some earlier interval can still cover it (normally zero steps).
+        i = bisect_right(self.starts, at) - 1
+        while i >= 0 and self.max_end[i] >= at:
+            start, end, reservation_id = self.intervals[i]
+            if start <= at <= end:
+                return self.reservations[reservation_id]
+            i -= 1
+        return None
+
+
+class ActiveReservationIndex:
+    """
+    In-memory interval index of reservations keyed by (spot_id, date).
+
+    Days are loaded from DynamoDB once (warmed at startup, or lazily per
+    spot on first lookup) and then kept current by the reservation router,
+    so finding the active reservation for a camera event is a binary
+    search instead of a query plus a parse of every hour_range.
+    """
+
+    def __init__(self, repository=None):
+        self._repository = repository
+        self._lock = threading.Lock()
+        self._spot_days: Dict[Tuple[str, str], _SpotDay] = {}
+        self._locations: Dict[str, Tuple[str, str]] = {}
+        self._loaded_days = set()
+        self._loaded_spot_days = set()
+        self._current_day = None  # days before it are pruned
+        self._seq = 0  # bumped by every upsert/remove
+        self._touched: Dict[str, int] = {}  # reservation_id -> seq of its last upsert/remove, while loads run
+        self._loads = 0  # loads in flight
+
+    @property
+    def repository(self):
+        return self._repository or get_reservation_repository()
+
+    def warm(self, day: str):
+        """Load every reservation of a day and drop days before it."""
+        started = self._begin_load()
+        try:
+            reservations = self.repository.by_date(day)
+        except Exception:
+            self._end_load()
+            raise
+        with self._lock:
+            self._prune(day)
+            self._add_loaded(reservations, started)
+            self._loaded_days.add(day)
+            self._loads -= 1
+
+    def _ensure_loaded(self, spot_id: str, day: str):
+        with self._lock:
+            if day in self._loaded_days or (spot_id, day) in self._loaded_spot_days:
+                return
+        started = self._begin_load()
+        try:
+            reservations = self.repository.by_spot_and_date(spot_id, day)
+        except Exception:
+            self._end_load()
+            raise
+        with self._lock:
+            self._add_loaded(reservations, started)
+            self._loaded_spot_days.add((spot_id, day))
+            self._loads -= 1
+
+    def _begin_load(self) -> int:
+        with self._lock:
+            self._loads += 1
+            return self._seq
+
+    def _end_load(self):
+        with self._lock:
+            self._loads -= 1
+
+    def _add_loaded(self, reservations: List[Dict], started: int):
+        # A reservation upserted or removed while the query ran keeps that newer state,
+        # so a booking cancelled meanwhile is not re-added
+        for reservation in reservations:
+            if self._touched.get(reservation["reservation_id"], -1) < started:
+                self._add(reservation)
+        if self._loads == 1:
+            self._touched.clear()
+
+    def _touch(self, reservation_id: str):
+        self._seq += 1
+        if self._loads:
+            self._touched[reservation_id] = self._seq
+
+    def _prune(self, day: str):
+        """Drop every day before `day` (called with the lock held)."""
+        if self._current_day is not None and day <= self._current_day:
+            return
+        self._current_day = day
+        for key in [k for k in self._spot_days if k[1] < day]:
+            for reservation_id in self._spot_days.pop(key).reservations:
+                self._locations.pop(reservation_id, None)
+        self._loaded_days = {d for d in self._loaded_days if d >= day}
+        self._loaded_spot_days = {k for k in self._loaded_spot_days if k[1] >= day}
+
+    def _add(self, reservation: Dict):
+        hour_range = reservation.get("hour_range") or []
+        if len(hour_range) < 2:
+            return
+        try:
+            start, end = seconds_of_day(hour_range[0]), seconds_of_day(hour_range[1])
+        except (TypeError, ValueError):
+            return
+        self._remove(reservation["reservation_id"])
+        key = (str(reservation["parking_spot_id"]), reservation["date"])
+        self._spot_days.setdefault(key, _SpotDay()).add(start, end, reservation)
+        self._locations[reservation["reservation_id"]] = key
+
+    def _remove(self, reservation_id: str):
+        key = self._locations.pop(reservation_id, None)
+        if key and key in self._spot_days:
+            self._spot_days[key].remove(reservation_id)
+
+    def upsert(self, reservation: Dict):
+        """Insert a new reservation or replace an updated one."""
+        with self._lock:
+            self._touch(reservation["reservation_id"])
+            self._add(reservation)
+
+    def remove(self, reservation_id: str):
+        with self._lock:
+            self._touch(reservation_id)
+            self._remove(reservation_id)
+
+    def find_active(self, spot_id, day: str, at: time) -> Optional[Dict]:
+        """Return the reservation covering `at` on a spot, if any."""
+        spot_id = str(spot_id)
+        with self._lock:
+            # Lookups are always for today, so the first one of a new day prunes the old ones
+            self._prune(day)
+        self._ensure_loaded(spot_id, day)
+        with self._lock:
+            spot_day = self._spot_days.get((spot_id, day))
+            return spot_day.find(seconds_of_day(at)) if spot_day else None
+
+    def count(self, spot_id, day: str) -> int:
+        with self._lock:
+            spot_day = self._spot_days.get((str(spot_id), day))
+            return len(spot_day.intervals) if spot_day else 0
+
+
+active_reservation_index = ActiveReservationIndex()
@@ -0,0 +1,320 @@
+import heapq
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+import boto3
+from src.imports.dynamodb_helper import user_cache
+
+logger = logging.getLogger(__name__)
+
+# Dispatcher settings
+ALERT_OUTBOX_PATH = Path(os.getenv("ALERT_OUTBOX_PATH", "outbox/alerts.jsonl"))
+ALERT_WORKERS = int(os.getenv("ALERT_WORKERS", "2"))
+ALERT_BATCH_SIZE = 10  # alerts a worker takes from the queue at once
+ALERT_DEDUP_WINDOW = 600  # seconds before the same (reservation, plate) alerts again
+ALERT_MAX_ATTEMPTS = 5
+ALERT_BACKOFF_BASE = 2.0  # seconds, doubled after every failed attempt
+ALERT_BACKOFF_MAX = 300.0
+
+
+def format_phone_number(phone: str) -> str:
+    """Normalize a stored phone number to E.164 (Romanian numbers by default)."""
+    phone = str(phone or "").strip()
+    if phone and not phone.startswith('+'):
+        if phone.startswith('0'):
+            phone = '+4' + phone[1:]
+        else:
+            phone = '+40' + phone
+    return phone
+
+
+class AlertDispatcher:
+    """
+    Background SMS pipeline for unauthorized-vehicle alerts.
+
+    Alerts are written to an append-only outbox file, put on an in-process
+    queue and delivered by a small worker pool, so the upload request only
+    pays for the enqueue. Repeated alerts for the same reservation and plate
+    are suppressed while one is pending and for ALERT_DEDUP_WINDOW after it
+    was delivered; an alert that is dropped doesn't suppress the next one.
+    Failed deliveries are retried with exponential backoff, and every
+    attempt is recorded in the outbox. Undelivered alerts found there are
+    re-queued on start with their attempt count. Outbox write errors are
+    logged and retried with the next batch; delivery goes on meanwhile.
+    """
+
+    def __init__(self, sns_client=None, outbox_path: Path = ALERT_OUTBOX_PATH, workers: int = ALERT_WORKERS):
+        self.sns_client = sns_client or boto3.client("sns", region_name="eu-north-1")
+        self.outbox_path = outbox_path
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._retries = []  # heap of (due_time, alert_id, alert)
+        self._retry_cond = threading.Condition()
+        self._outbox_lock = threading.Lock()
+        self._dedup_lock = threading.Lock()
+        self._last_sent: Dict[tuple, float] = {}  # (reservation, plate) -> delivery time
+        self._pending: Dict[tuple, str] = {}  # (reservation, plate) -> id of its queued alert
+        self._threads = []
+        self._running = False
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "delivered": 0,
+            "failed": 0,
+            "retried": 0,
+            "deduplicated": 0,
+            "outbox_errors": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+            "latency_last": None,
+        }
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        try:
+            pending = self._load_outbox()
+        except OSError as e:
+            logger.error(f"Reading {self.outbox_path} failed, starting without it: {e}")
+            pending = []
+        for alert in pending:
+            with self._dedup_lock:
+                self._pending[(alert["reservation_id"], alert["plate"])] = alert["id"]
+            self._queue.put(alert)
+        for i in range(self.workers):
+            self._spawn(self._worker_loop, f"alert-worker-{i}")
+        self._spawn(self._retry_loop, "alert-retry")
+
+    def stop(self):
+        self._running = False
+        with self._retry_cond:
+            self._retry_cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    # --- Public API ---
+
+    def enqueue(self, reservation: Dict, plate: str) -> bool:
+        """Queue an alert for a reservation; False if it was deduplicated."""
+        key = (reservation.get("reservation_id"), plate)
+        now = time.time()
+        alert_id = uuid.uuid4().hex
+        with self._dedup_lock:
+            last = self._last_sent.get(key)
+            if key in self._pending or (last is not None and now - last < ALERT_DEDUP_WINDOW):
+                self._bump("deduplicated")
+                return False
+            self._pending[key] = alert_id
+
+        alert = {
+            "id": alert_id,
+            "reservation_id": reservation.get("reservation_id"),
+            "email": str(reservation.get("email", "")).strip(),
+            "reserved_plate": str(reservation.get("car_plate", "")).strip().upper(),
+            "plate": plate,
+            "detected_at": datetime.now().strftime('%H:%M:%S'),
+            "enqueued_at": now,
+            "attempts": 0,
+        }
+        # If the outbox can't be written the alert is still delivered from memory
+        self._try_append([{"op": "enqueued", "alert": alert}])
+        self._queue.put(alert)
+        self._bump("enqueued")
+        return True
+
+    def metrics(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self._retry_cond:
+            waiting_retry = len(self._retries)
+        delivered = stats.pop("delivered")
+        latency_total = stats.pop("latency_total")
+        return {
+            "queue_depth": self._queue.qsize(),
+            "waiting_retry": waiting_retry,
+            "delivered": delivered,
+            **stats,
+            "latency_avg": latency_total / delivered if delivered else None,
+        }
+
+    # --- Workers ---
+
+    def _worker_loop(self):
+        unwritten = []  # outbox records kept until the outbox can be written again
+        while self._running:
+            try:
+                batch = [self._queue.get(timeout=1)]
+            except queue.Empty:
+                continue
+            while len(batch) < ALERT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = unwritten
+            for alert in batch:
+                if self._deliver(alert):
+                    records.append({"op": "done", "id": alert["id"]})
+                else:
+                    # Kept across restarts, so a crash doesn't reset the retry budget
+                    records.append({"op": "attempt", "id": alert["id"], "attempts": alert["attempts"]})
+            unwritten = [] if self._try_append(records) else records
+
+    def _deliver(self, alert: Dict) -> bool:
+        """Send one alert. Returns True once the alert is finished (sent or dropped)."""
+        alert["attempts"] += 1
+        try:
+            phone_number = self._lookup_phone(alert["email"])
+            if not phone_number:
+                logger.warning(f"Dropping alert {alert['id']}: no phone number for {alert['email']}")
+                self._finish(alert, delivered=False)
+                return True
+
+            message = (
+                f"🚨 PARKING ALERT!\n"
+                f"Car plate: {alert['plate']}\n"
+                f"Your reserved plate: {alert['reserved_plate']}\n"
+                f"Time: {alert['detected_at']}\n"
+                f"Please check your parking spot."
+            )
+            self.sns_client.publish(
+                PhoneNumber=phone_number,
+                Message=message,
+                MessageAttributes={
+                    'SMS.SMSType': {
+                        'DataType': 'String',
+                        'StringValue': 'Transactional'
+                    }
+                }
+            )
+        except Exception as e:
+            if alert["attempts"] >= ALERT_MAX_ATTEMPTS:
+                logger.error(f"Giving up on alert {alert['id']} after {alert['attempts']} attempts: {e}")
+                self._finish(alert, delivered=False)
+                return True
+            delay = min(ALERT_BACKOFF_BASE * 2 ** (alert["attempts"] - 1), ALERT_BACKOFF_MAX)
+            logger.warning(f"Alert {alert['id']} failed ({e}), retrying in {delay:.0f}s")
+            self._schedule_retry(alert, delay)
+            return False
+
+        self._finish(alert, delivered=True)
+        latency = time.time() - alert["enqueued_at"]
+        with self._stats_lock:
+            self._stats["delivered"] += 1
+            self._stats["latency_total"] += latency
+            self._stats["latency_max"] = max(self._stats["latency_max"], latency)
+            self._stats["latency_last"] = latency
+        return True
+
+    def _finish(self, alert: Dict, delivered: bool):
+        """Release the alert's dedup key; only a delivered alert opens the dedup window."""
+        key = (alert["reservation_id"], alert["plate"])
+        now = time.time()
+        with self._dedup_lock:
+            if self._pending.get(key) == alert["id"]:
+                del self._pending[key]
+            if delivered:
+                self._last_sent[key] = now
+                # Forget windows that have expired so the map stays small
+                if len(self._last_sent) > 1000:
+                    self._last_sent = {k: t for k, t in self._last_sent.items() if now - t < ALERT_DEDUP_WINDOW}
+        if not delivered:
+            self._bump("failed")
+
+    def _lookup_phone(self, email: str) -> Optional[str]:
+        if not email:
+            return None
+        user = user_cache.get(email)
+        if not user:
+            return None
+        return format_phone_number(user.get("phone", ""))
+
+    # --- Retries ---
+
+    def _schedule_retry(self, alert: Dict, delay: float):
+        with self._retry_cond:
+            heapq.heappush(self._retries, (time.monotonic() + delay, alert["id"], alert))
+            self._retry_cond.notify()
+        self._bump("retried")
+
+    def _retry_loop(self):
+        with self._retry_cond:
+            while self._running:
+                now = time.monotonic()
+                while self._retries and self._retries[0][0] <= now:
+                    _, _, alert = heapq.heappop(self._retries)
+                    self._queue.put(alert)
+                timeout = self._retries[0][0] - now if self._retries else None
+                self._retry_cond.wait(timeout)
+
+    # --- Outbox ---
+
+    def _append_outbox(self, records):
+        with self._outbox_lock:
+            self.outbox_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.outbox_path.open("a") as outbox:
+                for record in records:
+                    outbox.write(json.dumps(record) + "\n")
+
+    def _try_append(self, records) -> bool:
+        """Append to the outbox; False (logged) if it can't be written, e.g. disk full."""
+        try:
+            self._append_outbox(records)
+        except OSError as e:
+            self._bump("outbox_errors")
+            logger.error(f"Writing {len(records)} records to {self.outbox_path} failed: {e}")
+            return False
+        return True
+
+    def _load_outbox(self):
+        """Return undelivered alerts and rewrite the outbox with only those."""
+        if not self.outbox_path.exists():
+            return []
+        pending = {}
+        with self._outbox_lock:
+            with self.outbox_path.open() as outbox:
+                for line in outbox:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a crash
+                    if record.get("op") == "enqueued":
+                        pending[record["alert"]["id"]] = record["alert"]
+                    elif record.get("op") == "attempt" and record.get("id") in pending:
+                        pending[record["id"]]["attempts"] = record["attempts"]
+                    elif record.get("op") == "done":
+                        pending.pop(record.get("id"), None)
+
+            tmp_path = self.outbox_path.with_suffix(".tmp")
+            with tmp_path.open("w") as outbox:
+                for alert in pending.values():
+                    outbox.write(json.dumps({"op": "enqueued", "alert": alert}) + "\n")
+            tmp_path.replace(self.outbox_path)
+
+        if pending:
+            logger.info(f"Re-queued {len(pending)} undelivered alerts from outbox")
+        return list(pending.values())
+
+    def _bump(self, stat: str):
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+
+alert_dispatcher = AlertDispatcher()
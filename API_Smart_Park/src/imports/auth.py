@@ -0,0 +1,189 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+import jwt
+
+# Secret key & algorithm
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", 'td_WKP0BViNq3n4t-z9kmEcOexJOhGZfDWseUnO0rPY')
+ALGORITHM = 'HS256'
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# Verified-token cache
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+# Roles beyond a regular user, who only gets their own data
+ADMIN_ROLE = "admin"  # any user's data
+DEVICE_ROLE = "device"  # camera nodes: capture uploads only
+PRIVILEGED_ROLES = (ADMIN_ROLE, DEVICE_ROLE)
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def create_access_token(subject: str, role: Optional[str], expires_in: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)) -> str:
+    now = datetime.utcnow()
+    payload = {
+        "sub": subject,
+        "iat": now,
+        "exp": now + expires_in,
+        "role": role
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+class TokenCache:
+    """
+    LRU cache of verified JWT claims, keyed by the SHA-256 of the token.
+
+    A token that verified once only needs a hash and a dict lookup on its
+    next requests; its exp claim is still checked on every hit, so cached
+    tokens expire exactly like decoded ones. Only valid tokens are stored.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, clock=time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._items: OrderedDict = OrderedDict()  # token hash -> claims
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalid": 0}
+
+    def verify(self, token: str) -> dict:
+        """Claims of a valid token; raises jwt.InvalidTokenError otherwise."""
+        key = hashlib.sha256(token.encode()).digest()
+        now = self.clock()
+        with self._lock:
+            claims = self._items.get(key)
+            if claims is not None:
+                if claims["exp"] > now:
+                    self._items.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return claims
+                del self._items[key]
+                self._stats["expired"] += 1
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            self._stats["misses"] += 1
+
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+        except jwt.InvalidTokenError:
+            with self._lock:
+                self._stats["invalid"] += 1
+            raise
+
+        with self._lock:
+            self._items[key] = claims
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return claims
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._items)
+        stats["maxsize"] = self.maxsize
+        return stats
+
+
+token_cache = TokenCache()
+
+
+async def require_user(request: Request, credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> dict:
+    """Router dependency: verify the bearer token and attach its claims to request.state.user."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = token_cache.verify(credentials.credentials)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired", headers={"WWW-Authenticate": "Bearer"})
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    request.state.user = claims
+    return claims
+
+
+async def require_device(claims: dict = Depends(require_user)) -> dict:
+    """Route dependency: only device (camera) tokens and admins get through."""
+    if claims.get("role") not in PRIVILEGED_ROLES:
+        raise HTTPException(status_code=403, detail="Device token required")
+    return claims
+
+
+async def require_admin(claims: dict = Depends(require_user)) -> dict:
+    """Route dependency: only admin tokens get through (operations and metrics endpoints)."""
+    if claims.get("role") != ADMIN_ROLE:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return claims
+
+
+def is_owner(request: Request, email: str) -> bool:
+    """True if the caller's token was issued to `email`, or the caller is an admin."""
+    claims = request.state.user
+    return claims.get("role") == ADMIN_ROLE or claims.get("sub") == email
+
+
+def check_owner(request: Request, email: str):
+    """403 unless the caller may act for `email` (see is_owner)."""
+    if not is_owner(request, email):
+        raise HTTPException(status_code=403, detail="Not allowed for this user")
+
+
+def benchmark(tokens: int, requests: int):
+    """Time token checks as require_user does them: jwt.decode every time vs the TokenCache."""
+    import random
+    import types
+    from src.imports.local_dynamodb import latency_report
+
+    rng = random.Random(1)
+    issued = [(f"user{i}@example.com", create_access_token(f"user{i}@example.com", "regular")) for i in range(tokens)]
+    picks = [issued[rng.randrange(tokens)] for _ in range(requests)]
+    cache = TokenCache(maxsize=max(tokens, 1))
+
+    def decode(token):
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+
+    results = {"jwt.decode": [], "TokenCache cold": [], "TokenCache warm": [], "warm + check_owner": []}
+    for email, token in issued:
+        started = time.perf_counter()
+        cache.verify(token)
+        results["TokenCache cold"].append(time.perf_counter() - started)
+    for email, token in picks:
+        started = time.perf_counter()
+        decode(token)
+        results["jwt.decode"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        cache.verify(token)
+        results["TokenCache warm"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        request = types.SimpleNamespace(state=types.SimpleNamespace(user=cache.verify(token)))
+        check_owner(request, email)
+        results["warm + check_owner"].append(time.perf_counter() - started)
+
+    for name, samples in results.items():
+        print(f"{latency_report(name, samples)} {len(samples) / sum(samples):12,.0f} checks/s")
+    print(cache.metrics())
+
+
+if __name__ == "__main__":
+    # python -m src.imports.auth camera 365: long-lived token for a device (e.g. FASTAPI_TOKEN on the Pi Zero)
+    # python -m src.imports.auth ops@example.com 1 --admin: admin token (e.g. to read the metrics endpoints)
+    # python -m src.imports.auth --bench: token verification microbenchmark
+    import argparse
+    parser = argparse.ArgumentParser(description="Issue a device or admin token, or benchmark token verification")
+    parser.add_argument("name", nargs="?", default="camera", help="device name (token subject)")
+    parser.add_argument("days", nargs="?", type=int, default=365, help="token lifetime in days")
+    parser.add_argument("--admin", action="store_true", help="issue an admin token instead of a device token")
+    parser.add_argument("--bench", action="store_true", help="run the verification benchmark instead")
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct tokens in the benchmark")
+    parser.add_argument("--requests", type=int, default=20000, help="verifications timed per method")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.tokens, args.requests)
+    else:
+        print(create_access_token(args.name, ADMIN_ROLE if args.admin else DEVICE_ROLE, timedelta(days=args.days)))
@@ -0,0 +1,36 @@
+import boto3
+
+dynamodb = boto3.resource('dynamodb', region_name='eu-north-1')
+
+# Plate -> owner index, kept in sync with Users.car_plate_ids by the API
+table = dynamodb.create_table(
+    TableName='CarPlates',
+    KeySchema=[
+        {
+            'AttributeName': 'plate',  # Partition key, normalized plate
+            'KeyType': 'HASH'
+        },
+        {
+            'AttributeName': 'email',  # Sort key, one item per owner of the plate
+            'KeyType': 'RANGE'
+        },
+    ],
+    AttributeDefinitions=[
+        {
+            'AttributeName': 'plate',
+            'AttributeType': 'S'
+        },
+        {
+            'AttributeName': 'email',
+            'AttributeType': 'S'
+        },
+    ],
+    ProvisionedThroughput={
+        'ReadCapacityUnits': 1,
+        'WriteCapacityUnits': 1
+    }
+)
+
+table.meta.client.get_waiter('table_exists').wait(TableName='CarPlates')
+
+print(f"Table {table.table_name} created successfully!")
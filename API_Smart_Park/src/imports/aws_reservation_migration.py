@@ -0,0 +1,136 @@
+"""
+Migrate a deployed Reservations table to the indexes the API queries.
+
+Tables created before the repository layer have EmailIndex (email only)
+and no SpotDateIndex. A GSI's key schema can't be changed in place, so:
+
+1. EmailDateIndex (email + date) and SpotDateIndex are created next to
+   the old indexes, one at a time, and awaited until ACTIVE.
+2. Items without spot_date (or expires_at) get them, so the new index
+   and TTL cover reservations made before the change.
+3. Once the new API version is deployed, --drop-old-email-index removes
+   EmailIndex.
+
+Every step is idempotent; run it before deploying the API:
+
+    python -m src.imports.aws_reservation_migration
+    python -m src.imports.aws_reservation_migration --drop-old-email-index
+"""
+import time
+from typing import Dict, List
+from botocore.exceptions import ClientError
+from src.imports.reservation_repository import (
+    RESERVATIONS_TABLE, EMAIL_INDEX, SPOT_DATE_INDEX, TTL_ATTRIBUTE, spot_date_key, expires_at
+)
+
+OLD_EMAIL_INDEX = "EmailIndex"
+INDEX_POLL_INTERVAL = 10  # seconds between index status checks
+
+# Indexes to create: name -> (key attributes, HASH then RANGE)
+NEW_INDEXES = {
+    EMAIL_INDEX: ("email", "date"),
+    SPOT_DATE_INDEX: ("spot_date",),
+}
+
+
+def _describe(client, table_name: str) -> Dict:
+    return client.describe_table(TableName=table_name)["Table"]
+
+
+def _indexes(description: Dict) -> Dict[str, str]:
+    """index name -> IndexStatus"""
+    return {index["IndexName"]: index.get("IndexStatus", "ACTIVE") for index in description.get("GlobalSecondaryIndexes", [])}
+
+
+def wait_for_indexes(client, table_name: str, poll: float = INDEX_POLL_INTERVAL):
+    """Block until the table and all its indexes are ACTIVE (index backfills can take a while)."""
+    while True:
+        description = _describe(client, table_name)
+        if description["TableStatus"] == "ACTIVE" and all(status == "ACTIVE" for status in _indexes(description).values()):
+            return
+        time.sleep(poll)
+
+
+def create_indexes(client, table_name: str = RESERVATIONS_TABLE, poll: float = INDEX_POLL_INTERVAL) -> List[str]:
+    """Create the missing new indexes (DynamoDB takes one GSI creation per update); returns their names."""
+    created = []
+    for name, keys in NEW_INDEXES.items():
+        description = _describe(client, table_name)
+        if name in _indexes(description):
+            continue
+        index = {
+            "IndexName": name,
+            "KeySchema": [{"AttributeName": key, "KeyType": kind} for key, kind in zip(keys, ("HASH", "RANGE"))],
+            "Projection": {"ProjectionType": "ALL"},
+        }
+        if description.get("BillingModeSummary", {}).get("BillingMode") != "PAY_PER_REQUEST":
+            index["ProvisionedThroughput"] = {"ReadCapacityUnits": 1, "WriteCapacityUnits": 1}
+        print(f"Creating {name} on {table_name}")
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=[{"AttributeName": key, "AttributeType": "S"} for key in keys],
+            GlobalSecondaryIndexUpdates=[{"Create": index}],
+        )
+        wait_for_indexes(client, table_name, poll)
+        created.append(name)
+    return created
+
+
+def backfill(table) -> int:
+    """Set spot_date and expires_at on items that lack them; returns how many items were updated."""
+    updated = 0
+    kwargs = {"FilterExpression": "attribute_not_exists(spot_date) OR attribute_not_exists(#expires)",
+              "ExpressionAttributeNames": {"#expires": TTL_ATTRIBUTE}}
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get("Items", []):
+            if "parking_spot_id" not in item or "date" not in item:
+                continue
+            try:
+                table.update_item(
+                    Key={"reservation_id": item["reservation_id"]},
+                    UpdateExpression="SET spot_date = if_not_exists(spot_date, :spot_date), "
+                                     "#expires = if_not_exists(#expires, :expires)",
+                    ConditionExpression="attribute_exists(reservation_id)",
+                    ExpressionAttributeNames={"#expires": TTL_ATTRIBUTE},
+                    ExpressionAttributeValues={
+                        ":spot_date": spot_date_key(item["parking_spot_id"], item["date"]),
+                        ":expires": expires_at(item["date"]),
+                    },
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                continue  # deleted since the scan
+            updated += 1
+        if "LastEvaluatedKey" not in response:
+            return updated
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def drop_old_email_index(client, table_name: str = RESERVATIONS_TABLE, poll: float = INDEX_POLL_INTERVAL) -> bool:
+    """Delete EmailIndex once nothing queries it; False if it is already gone."""
+    if OLD_EMAIL_INDEX not in _indexes(_describe(client, table_name)):
+        return False
+    print(f"Deleting {OLD_EMAIL_INDEX} from {table_name}")
+    client.update_table(TableName=table_name, GlobalSecondaryIndexUpdates=[{"Delete": {"IndexName": OLD_EMAIL_INDEX}}])
+    wait_for_indexes(client, table_name, poll)
+    return True
+
+
+def migrate(resource, drop_old: bool = False, poll: float = INDEX_POLL_INTERVAL):
+    table = resource.Table(RESERVATIONS_TABLE)
+    client = resource.meta.client
+    create_indexes(client, RESERVATIONS_TABLE, poll)
+    print(f"Backfilled {backfill(table)} reservations")
+    if drop_old:
+        drop_old_email_index(client, RESERVATIONS_TABLE, poll)
+
+
+if __name__ == "__main__":
+    import argparse
+    import boto3
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drop-old-email-index", action="store_true", help=f"delete {OLD_EMAIL_INDEX} (after the API is deployed)")
+    args = parser.parse_args()
+    migrate(boto3.resource("dynamodb", region_name="eu-north-1"), args.drop_old_email_index)
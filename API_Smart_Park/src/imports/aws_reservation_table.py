@@ -22,6 +22,10 @@ table = dynamodb.create_table(
         {
             'AttributeName': 'date',
             'AttributeType': 'S'
+        },
+        {
+            'AttributeName': 'spot_date',  # "<parking_spot_id>#<date>"
+            'AttributeType': 'S'
         }
     ],
     ProvisionedThroughput={
@@ -30,11 +34,15 @@ table = dynamodb.create_table(
     },
     GlobalSecondaryIndexes=[
         {
-            'IndexName': 'EmailIndex',
+            'IndexName': 'EmailDateIndex',
             'KeySchema': [
                 {
                     'AttributeName': 'email',
                     'KeyType': 'HASH'
+                },
+                {
+                    'AttributeName': 'date',
+                    'KeyType': 'RANGE'
                 }
             ],
             'Projection': {
@@ -60,10 +68,35 @@ table = dynamodb.create_table(
                 'ReadCapacityUnits': 1,
                 'WriteCapacityUnits': 1
             }
+        },
+        {
+            'IndexName': 'SpotDateIndex',
+            'KeySchema': [
+                {
+                    'AttributeName': 'spot_date',
+                    'KeyType': 'HASH'
+                }
+            ],
+            'Projection': {
+                'ProjectionType': 'ALL'
+            },
+            'ProvisionedThroughput': {
+                'ReadCapacityUnits': 1,
+                'WriteCapacityUnits': 1
+            }
         }
     ]
 )
 
 table.meta.client.get_waiter('table_exists').wait(TableName='Reservations')
 
+# DynamoDB deletes items once their expires_at (epoch seconds) has passed
+table.meta.client.update_time_to_live(
+    TableName='Reservations',
+    TimeToLiveSpecification={
+        'Enabled': True,
+        'AttributeName': 'expires_at'
+    }
+)
+
 print(f"Table {table.table_name} created successfully!")
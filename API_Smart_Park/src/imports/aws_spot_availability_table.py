@@ -0,0 +1,37 @@
+import boto3
+
+dynamodb = boto3.resource('dynamodb', region_name='eu-north-1')
+
+# Reserved-minute bitmap per spot and day, written with the reservations in one transaction
+table = dynamodb.create_table(
+    TableName='SpotAvailability',
+    KeySchema=[
+        {
+            'AttributeName': 'spot_date',  # Partition key, "<parking_spot_id>#<YYYY-MM-DD>"
+            'KeyType': 'HASH'
+        },
+    ],
+    AttributeDefinitions=[
+        {
+            'AttributeName': 'spot_date',
+            'AttributeType': 'S'
+        },
+    ],
+    ProvisionedThroughput={
+        'ReadCapacityUnits': 1,
+        'WriteCapacityUnits': 1
+    }
+)
+
+table.meta.client.get_waiter('table_exists').wait(TableName='SpotAvailability')
+
+# DynamoDB deletes items once their expires_at (epoch seconds) has passed
+table.meta.client.update_time_to_live(
+    TableName='SpotAvailability',
+    TimeToLiveSpecification={
+        'Enabled': True,
+        'AttributeName': 'expires_at'
+    }
+)
+
+print(f"Table {table.table_name} created successfully!")
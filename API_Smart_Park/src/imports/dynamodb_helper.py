@@ -1,13 +1,202 @@
+import asyncio
+import copy
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import boto3
-import hashlib
+from boto3.dynamodb.types import TypeDeserializer
 
 # Create a shared DynamoDB resource
 dynamodb = boto3.resource('dynamodb', region_name='eu-north-1')
 
+# Shared pool for blocking AWS calls, so they never run on the event loop
+AWS_IO_WORKERS = int(os.getenv("AWS_IO_WORKERS", "32"))
+aws_executor = ThreadPoolExecutor(max_workers=AWS_IO_WORKERS, thread_name_prefix="aws-io")
+
+_tables = {}
+
+
 def get_table(table_name: str):
-    """Get a DynamoDB table reference"""
-    return dynamodb.Table(table_name)
+    """Get a (cached) DynamoDB table reference"""
+    table = _tables.get(table_name)
+    if table is None:
+        table = _tables[table_name] = dynamodb.Table(table_name)
+    return table
+
+
+def set_dynamodb(resource):
+    """Point every table lookup at another DynamoDB resource (e.g. DynamoDB Local or moto)"""
+    global dynamodb
+    dynamodb = resource
+    _tables.clear()
+
+
+_deserializer = TypeDeserializer()
+
+
+def deserialize_item(item: Optional[dict]) -> Optional[dict]:
+    """Convert a low-level item (e.g. from a ClientError response) to plain Python values"""
+    if not item:
+        return None
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+
+# Batch API limits
+BATCH_GET_SIZE = 100  # keys per BatchGetItem
+BATCH_RETRY_DELAY = 0.05  # first backoff (seconds) before re-sending unprocessed keys
+BATCH_RETRY_MAX = 8  # unprocessed retries before giving up
+
+
+def batch_get(table_name: str, keys: List[Dict], consistent: bool = False, projection: Optional[str] = None) -> List[Dict]:
+    """
+    Get many items with BatchGetItem, 100 keys per call, re-sending
+    UnprocessedKeys with exponential backoff. Missing keys are skipped (blocking).
+    """
+    items = []
+    for i in range(0, len(keys), BATCH_GET_SIZE):
+        request = {"Keys": keys[i:i + BATCH_GET_SIZE], "ConsistentRead": consistent}
+        if projection:
+            request["ProjectionExpression"] = projection
+        request_items = {table_name: request}
+        delay = BATCH_RETRY_DELAY
+        for _ in range(BATCH_RETRY_MAX + 1):
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            items.extend(response.get("Responses", {}).get(table_name, []))
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                break
+            time.sleep(delay)
+            delay *= 2
+        else:
+            raise RuntimeError(f"BatchGetItem on {table_name} left keys unprocessed after {BATCH_RETRY_MAX} retries")
+    return items
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking call (boto3, file I/O) on the shared AWS I/O pool and await it"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(aws_executor, functools.partial(func, *args, **kwargs))
+
+
+# Users read-through cache
+USERS_TABLE = "Users"
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "2048"))  # users kept in memory
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))  # seconds before a record is re-read
+
+
+class UserCache:
+    """
+    LRU cache of Users items keyed by email, with a TTL.
+
+    Reads go through get()/get_user(); routers that write a user must call
+    invalidate(email) afterwards. Unknown emails are cached too (as None),
+    so repeated failed logins don't reach DynamoDB. A load that overlaps an
+    invalidation of the same email is returned but not stored, and
+    concurrent misses for one email share a single get_item. Callers get
+    their own copy of the item and may modify it.
+    """
+
+    def __init__(self, table_name: str = USERS_TABLE, maxsize: int = USER_CACHE_SIZE,
+                 ttl: float = USER_CACHE_TTL, clock=time.monotonic):
+        self.table_name = table_name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._items: OrderedDict = OrderedDict()  # email -> (expires_at, item or None)
+        self._versions = {}  # email -> invalidations during its in-flight loads
+        self._loading = {}  # email -> [lock held by the thread loading it, threads loading or waiting]
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "invalidations": 0, "evictions": 0, "expired": 0}
+
+    def lookup(self, email: str) -> Tuple[bool, Optional[dict]]:
+        """(True, item) on a fresh cache hit, (False, None) otherwise; never does I/O."""
+        with self._lock:
+            entry = self._items.get(email)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self._items.move_to_end(email)
+                    self._stats["hits"] += 1
+                    return True, copy.deepcopy(entry[1])
+                del self._items[email]
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return False, None
+
+    def get(self, email: str) -> Optional[dict]:
+        """Cached user, read from DynamoDB on a miss (blocking)."""
+        hit, item = self.lookup(email)
+        return item if hit else self.load(email)
+
+    def load(self, email: str) -> Optional[dict]:
+        """Read the user from DynamoDB and cache it (blocking)."""
+        with self._lock:
+            loading = self._loading.get(email)
+            if loading is None:
+                loading = self._loading[email] = [threading.Lock(), 0]
+            loading[1] += 1
+        try:
+            with loading[0]:
+                # Another thread may have loaded it while we waited
+                with self._lock:
+                    entry = self._items.get(email)
+                    if entry is not None and entry[0] > self.clock():
+                        return copy.deepcopy(entry[1])
+                    version = self._versions.get(email, 0)
+
+                item = get_table(self.table_name).get_item(Key={"email": email}).get("Item")
+
+                with self._lock:
+                    self._stats["loads"] += 1
+                    if self._versions.get(email, 0) == version:
+                        self._items[email] = (self.clock() + self.ttl, item)
+                        self._items.move_to_end(email)
+                        while len(self._items) > self.maxsize:
+                            self._items.popitem(last=False)
+                            self._stats["evictions"] += 1
+                return copy.deepcopy(item)
+        finally:
+            # The last thread out forgets the email, even if get_item raised
+            with self._lock:
+                loading[1] -= 1
+                if not loading[1]:
+                    del self._loading[email]
+                    self._versions.pop(email, None)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._items.pop(email, None)
+            if email in self._loading:
+                # Only in-flight loads need to know; nothing is kept otherwise
+                self._versions[email] = self._versions.get(email, 0) + 1
+            self._stats["invalidations"] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._items)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["maxsize"] = self.maxsize
+        stats["ttl"] = self.ttl
+        return stats
+
+
+user_cache = UserCache()
+
+
+async def get_user(email: str) -> Optional[dict]:
+    """Users item for `email` (or None); hits are served without leaving the event loop"""
+    hit, item = user_cache.lookup(email)
+    if hit:
+        return item
+    return await run_io(user_cache.load, email)
+
+
+def shutdown_io():
+    """Stop the shared pool once in-flight calls are done"""
+    aws_executor.shutdown(wait=True)
 
-def hash_password(password: str) -> str:
-    """Return a SHA-256 hashed version of the password"""
-    return hashlib.sha256(password.encode()).hexdigest()
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+from fastapi import UploadFile
+from PIL import Image
+from src.imports.dynamodb_helper import run_io
+
+logger = logging.getLogger(__name__)
+
+# Storage layout: uploads/objects/<ab>/<sha256>.<jpg|png> and uploads/thumbs/<sha256>.jpg
+UPLOAD_DIR = Path("uploads")
+OBJECTS_DIR = UPLOAD_DIR / "objects"
+THUMBS_DIR = UPLOAD_DIR / "thumbs"
+TMP_DIR = UPLOAD_DIR / "tmp"
+HISTORY_PATH = UPLOAD_DIR / "captures.json"
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+# Ingestion settings
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZE = (320, 240)
+
+# Retention policy: keep the newest captures per spot, and none older than the max age
+RETENTION_PER_SPOT = int(os.getenv("RETENTION_PER_SPOT", "50"))
+RETENTION_MAX_AGE = int(os.getenv("RETENTION_MAX_AGE", str(7 * 24 * 3600)))  # seconds
+
+thumbnail_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnail")
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def object_path(digest: str, suffix: str) -> Path:
+    return OBJECTS_DIR / digest[:2] / f"{digest}{suffix}"
+
+
+def blob_suffix(head: bytes) -> str:
+    """Extension of a blob from its first bytes, so the same bytes always get the same path."""
+    return ".png" if head.startswith(b"\x89PNG\r\n\x1a\n") else ".jpg"
+
+
+def thumbnail_path(digest: str) -> Path:
+    return THUMBS_DIR / f"{digest}.jpg"
+
+
+def make_thumbnail(source: Path, target: Path):
+    """Write a downscaled JPEG copy of an image (blocking)."""
+    if target.exists():
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as image:
+        image.draft("RGB", THUMBNAIL_SIZE)  # lets JPEG decode at reduced scale
+        image = image.convert("RGB")
+        image.thumbnail(THUMBNAIL_SIZE)
+        # Unique name: two uploads of the same frame may build the thumbnail at once
+        tmp = target.with_name(f"{target.stem}.{uuid.uuid4().hex}.tmp")
+        image.save(tmp, format="JPEG", quality=80)
+        tmp.replace(target)
+
+
+class ImageStore:
+    """
+    Content-addressed store for camera captures.
+
+    Uploads are streamed to disk chunk by chunk while being hashed, so the
+    stored name is the SHA-256 of the bytes and identical frames are kept
+    once. Each capture also gets a thumbnail, built on a small worker pool
+    after the request returns. A per-spot capture history is kept in
+    captures.json and trimmed by the retention policy; blobs no longer
+    referenced by any capture are deleted. Committing a blob, recording its
+    capture and deleting evicted files all happen under one lock, so an
+    upload can never be recorded against a blob that is being evicted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._history: Dict[str, List[Dict]] = self._load_history()
+
+    def _load_history(self) -> Dict[str, List[Dict]]:
+        try:
+            with HISTORY_PATH.open() as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    async def ingest(self, file: UploadFile, spot_id: str) -> Dict:
+        """Store an upload and record it as the newest capture of a spot."""
+        TMP_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = TMP_DIR / uuid.uuid4().hex
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+
+        out = await run_io(tmp_path.open, "wb")
+        try:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if not size:
+                    head = chunk[:8]
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise ImageTooLarge(f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+                await run_io(out.write, chunk)
+        except BaseException:
+            await run_io(out.close)
+            tmp_path.unlink(missing_ok=True)
+            raise
+        await run_io(out.close)
+
+        hex_digest = digest.hexdigest()
+        # Keyed on the content, not the upload's name: a.jpg and a.jpeg share one blob
+        stored = object_path(hex_digest, blob_suffix(head))
+        capture = {
+            "digest": hex_digest,
+            "spot_id": str(spot_id),
+            "size": size,
+            "captured_at": time.time(),
+            "image_url": f"/{stored.as_posix()}",
+            "thumbnail_url": f"/{thumbnail_path(hex_digest).as_posix()}",
+        }
+        await run_io(self._store, tmp_path, stored, capture)
+
+        # Thumbnail is built in the background; the URL is valid once it lands
+        future = asyncio.get_running_loop().run_in_executor(
+            thumbnail_executor, self._build_thumbnail, stored, hex_digest
+        )
+        future.add_done_callback(self._log_thumbnail_error)
+        return capture
+
+    def _store(self, tmp_path: Path, stored: Path, capture: Dict):
+        """Commit the blob and record its capture, with no eviction in between."""
+        with self._lock:
+            self._commit_blob(tmp_path, stored)
+            self._record(capture)
+
+    @staticmethod
+    def _commit_blob(tmp_path: Path, stored: Path):
+        if stored.exists():
+            tmp_path.unlink()  # same bytes already stored
+            return
+        stored.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.replace(stored)
+
+    @staticmethod
+    def _log_thumbnail_error(future):
+        if future.exception():
+            logger.error(f"Thumbnail generation failed: {future.exception()}")
+
+    def _build_thumbnail(self, stored: Path, digest: str):
+        try:
+            make_thumbnail(stored, thumbnail_path(digest))
+        except FileNotFoundError:
+            pass  # blob evicted before the thumbnail was built
+        # Evicted while it was being built: don't leave it behind
+        with self._lock:
+            if not self._referenced(digest):
+                thumbnail_path(digest).unlink(missing_ok=True)
+
+    def _referenced(self, digest: str) -> bool:
+        return any(c["digest"] == digest for captures in self._history.values() for c in captures)
+
+    def _record(self, capture: Dict):
+        """Add a capture, apply retention and delete what it evicted (caller holds the lock)."""
+        self._history.setdefault(capture["spot_id"], []).insert(0, capture)
+        evicted = self._apply_retention()
+        self._save_history()
+        for path in evicted:
+            path.unlink(missing_ok=True)
+
+    def _apply_retention(self) -> List[Path]:
+        """Trim histories and return blobs that are no longer referenced."""
+        cutoff = time.time() - RETENTION_MAX_AGE
+        dropped = []
+        for spot_id, captures in self._history.items():
+            kept = [c for c in captures[:RETENTION_PER_SPOT] if c["captured_at"] >= cutoff]
+            dropped.extend(c for c in captures if c not in kept)
+            self._history[spot_id] = kept
+
+        referenced = {c["digest"] for captures in self._history.values() for c in captures}
+        evicted = []
+        for capture in dropped:
+            if capture["digest"] not in referenced:
+                evicted.append(object_path(capture["digest"], Path(capture["image_url"]).suffix))
+                evicted.append(thumbnail_path(capture["digest"]))
+                referenced.add(capture["digest"])  # don't list the same blob twice
+        return evicted
+
+    def _save_history(self):
+        tmp = HISTORY_PATH.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            json.dump(self._history, f)
+        tmp.replace(HISTORY_PATH)
+
+    def history(self, spot_id: str, limit: int = 20) -> List[Dict]:
+        with self._lock:
+            return list(self._history.get(str(spot_id), [])[:limit])
+
+
+image_store = ImageStore()
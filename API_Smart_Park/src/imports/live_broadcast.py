@@ -0,0 +1,178 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Broadcast settings
+LIVE_BUFFER_SIZE = 1024  # events kept in the shared ring buffer
+LIVE_BATCH_SIZE = 64  # events sent to a client in one frame
+LIVE_SEND_TIMEOUT = 5.0  # seconds a single send may take before the client is dropped
+LIVE_HEARTBEAT = 15.0  # seconds of silence before a keep-alive is sent
+
+OVERFLOW_RESYNC = "resync"  # lagging client gets a fresh snapshot and skips ahead
+OVERFLOW_DISCONNECT = "disconnect"  # lagging client is closed and must reconnect
+OVERFLOW_POLICIES = (OVERFLOW_RESYNC, OVERFLOW_DISCONNECT)
+
+
+class Overflow(Exception):
+    """The client fell further behind than the ring buffer holds."""
+
+
+def _json_default(value):
+    # DynamoDB numbers come back as Decimal: send them as JSON numbers (1, not "1")
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+
+class LiveBroadcast:
+    """
+    Fan-out of live events (spot availability, reservation status) to
+    WebSocket and SSE clients.
+
+    Events are encoded once and appended to a single ring buffer with a
+    sequence number. Each connection only keeps a cursor into the buffer
+    and reads at its own pace, so a slow client never holds up publishers
+    or other clients. A client whose cursor has been overwritten is handled
+    by its overflow policy: resync (snapshot, then continue from the head)
+    or disconnect.
+
+    publish() may be called from any thread (MQTT network thread, request
+    handlers); waiting clients are woken on the event loop.
+    """
+
+    def __init__(self, size: int = LIVE_BUFFER_SIZE):
+        self.size = size
+        self._buffer: deque = deque(maxlen=size)  # (seq, encoded event)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._wake_pending = False
+        self._snapshots: Dict[str, Callable[[], dict]] = {}
+        self._stats = {"published": 0, "connections": 0, "connected_total": 0, "resyncs": 0, "disconnects": 0, "slow_sends": 0}
+
+    # --- Lifecycle ---
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Attach to the event loop the clients are served on (called at startup)."""
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+
+    def add_snapshot(self, name: str, provider: Callable[[], dict]):
+        """Register state sent in full on connect and on resync."""
+        self._snapshots[name] = provider
+
+    # --- Publishing ---
+
+    def publish(self, event_type: str, data: dict):
+        event = json.dumps({"type": event_type, "ts": round(time.time(), 3), "data": data}, default=_json_default)
+        with self._lock:
+            self._seq += 1
+            self._buffer.append((self._seq, event))
+            self._stats["published"] += 1
+            if self._loop is None or self._wake_pending:
+                return
+            self._wake_pending = True
+        try:
+            self._loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # Loop already closed (shutdown)
+            pass
+
+    def _wake(self):
+        # Runs on the event loop: release every waiter, arm a fresh event
+        with self._lock:
+            self._wake_pending = False
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    # --- Reading ---
+
+    def head(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def snapshot(self) -> str:
+        with self._lock:
+            seq = self._seq
+        state = {name: provider() for name, provider in self._snapshots.items()}
+        return json.dumps({"type": "snapshot", "seq": seq, "ts": round(time.time(), 3), "data": state}, default=_json_default)
+
+    def read(self, cursor: int, limit: int = LIVE_BATCH_SIZE) -> Tuple[int, List[str]]:
+        """Events after `cursor` (at most `limit`); raises Overflow if some were overwritten."""
+        with self._lock:
+            if cursor >= self._seq:
+                return cursor, []
+            oldest = self._seq - len(self._buffer) + 1
+            if cursor + 1 < oldest:
+                raise Overflow()
+            start = cursor + 1 - oldest
+            events = [self._buffer[i][1] for i in range(start, min(len(self._buffer), start + limit))]
+            return cursor + len(events), events
+
+    async def wait(self, cursor: int, timeout: float):
+        """Sleep until an event after `cursor` is published or `timeout` passes."""
+        if self._wakeup is None:
+            # Not bound at startup (a script or test serving clients itself): use the caller's loop
+            self.bind(asyncio.get_running_loop())
+        wakeup = self._wakeup
+        if self.head() > cursor:
+            return
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def stream(self, policy: str = OVERFLOW_RESYNC):
+        """
+        Frames for one client: a snapshot, then batches of events, with None
+        as a keep-alive after LIVE_HEARTBEAT seconds of silence. Raises
+        Overflow when the client lags too far under the disconnect policy.
+        """
+        self._count("connections", 1)
+        self._count("connected_total", 1)
+        try:
+            cursor = self.head()
+            yield [self.snapshot()]
+            while True:
+                try:
+                    cursor, events = self.read(cursor)
+                except Overflow:
+                    if policy == OVERFLOW_DISCONNECT:
+                        self._count("disconnects", 1)
+                        raise
+                    self._count("resyncs", 1)
+                    cursor = self.head()
+                    yield [self.snapshot()]
+                    continue
+                if events:
+                    yield events
+                    continue
+                before = cursor
+                await self.wait(cursor, LIVE_HEARTBEAT)
+                if self.head() == before:
+                    yield None
+        finally:
+            self._count("connections", -1)
+
+    def slow_send(self):
+        self._count("slow_sends", 1)
+
+    def _count(self, key: str, delta: int):
+        with self._lock:
+            self._stats[key] += delta
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["head"] = self._seq
+            stats["buffered"] = len(self._buffer)
+        stats["buffer_size"] = self.size
+        return stats
+
+
+live_broadcast = LiveBroadcast()
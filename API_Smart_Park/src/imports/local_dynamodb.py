@@ -0,0 +1,114 @@
+import os
+import statistics
+import threading
+from contextlib import contextmanager
+from typing import List
+import boto3
+from src.imports import dynamodb_helper
+
+# Local stand-in for tests and benchmarks: moto in-process, or a DynamoDB Local
+# server when DYNAMODB_ENDPOINT is set (e.g. http://localhost:8001)
+DYNAMODB_ENDPOINT = os.getenv("DYNAMODB_ENDPOINT")
+REGION = "eu-north-1"
+
+
+def _index(name, *keys):
+    return {
+        "IndexName": name,
+        "KeySchema": [{"AttributeName": key, "KeyType": kind} for key, kind in zip(keys, ("HASH", "RANGE"))],
+        "Projection": {"ProjectionType": "ALL"},
+    }
+
+
+# Same keys and indexes as the aws_*_table.py scripts, on-demand capacity
+TABLES = [
+    {
+        "TableName": "Users",
+        "KeySchema": [{"AttributeName": "email", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "email", "AttributeType": "S"}],
+    },
+    {
+        "TableName": "Reservations",
+        "KeySchema": [{"AttributeName": "reservation_id", "KeyType": "HASH"}],
+        "AttributeDefinitions": [
+            {"AttributeName": name, "AttributeType": "S"}
+            for name in ("reservation_id", "email", "date", "spot_date")
+        ],
+        "GlobalSecondaryIndexes": [
+            _index("EmailDateIndex", "email", "date"),
+            _index("DateIndex", "date"),
+            _index("SpotDateIndex", "spot_date"),
+        ],
+    },
+    {
+        "TableName": "CarPlates",
+        "KeySchema": [{"AttributeName": "plate", "KeyType": "HASH"}, {"AttributeName": "email", "KeyType": "RANGE"}],
+        "AttributeDefinitions": [{"AttributeName": "plate", "AttributeType": "S"}, {"AttributeName": "email", "AttributeType": "S"}],
+    },
+    {
+        "TableName": "SpotAvailability",
+        "KeySchema": [{"AttributeName": "spot_date", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "spot_date", "AttributeType": "S"}],
+    },
+]
+
+
+def _create_tables(resource):
+    for spec in TABLES:
+        resource.create_table(BillingMode="PAY_PER_REQUEST", **spec)
+    for spec in TABLES:
+        resource.meta.client.get_waiter("table_exists").wait(TableName=spec["TableName"])
+
+
+@contextmanager
+def local_dynamodb():
+    """
+    Empty copies of the API tables, with dynamodb_helper pointed at them
+    for the duration of the block; yields the boto3 resource.
+    """
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        os.environ.setdefault(name, "local")
+    previous = dynamodb_helper.dynamodb
+
+    if DYNAMODB_ENDPOINT:
+        resource = boto3.resource("dynamodb", region_name=REGION, endpoint_url=DYNAMODB_ENDPOINT)
+        _create_tables(resource)
+        dynamodb_helper.set_dynamodb(resource)
+        try:
+            yield resource
+        finally:
+            dynamodb_helper.set_dynamodb(previous)
+            for spec in TABLES:
+                resource.Table(spec["TableName"]).delete()
+        return
+
+    from moto import mock_aws
+    from moto.core.models import botocore_stubber
+
+    # moto's in-memory tables aren't thread-safe, and the API calls DynamoDB
+    # from its I/O pool: handle one mocked request at a time
+    lock = threading.Lock()
+    process_request = botocore_stubber.process_request
+
+    def serialized(request):
+        with lock:
+            return process_request(request)
+
+    with mock_aws():
+        botocore_stubber.process_request = serialized
+        resource = boto3.resource("dynamodb", region_name=REGION)
+        _create_tables(resource)
+        dynamodb_helper.set_dynamodb(resource)
+        try:
+            yield resource
+        finally:
+            dynamodb_helper.set_dynamodb(previous)
+            del botocore_stubber.process_request
+
+
+def latency_report(name: str, samples: List[float]) -> str:
+    """One line of mean / p50 / p99 / max for latencies in seconds."""
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (f"{name:<32} n={len(ordered):<6} mean={statistics.fmean(ordered) * 1000:8.2f}ms "
+            f"p50={ordered[len(ordered) // 2] * 1000:8.2f}ms p99={p99 * 1000:8.2f}ms max={ordered[-1] * 1000:8.2f}ms")
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import paho.mqtt.client as mqtt
+
+logger = logging.getLogger(__name__)
+
+# MQTT settings (the broker runs on the Pi 4)
+MQTT_BROKER = os.getenv("MQTT_BROKER", "192.168.1.8")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+OCCUPANCY_TOPIC = os.getenv("OCCUPANCY_TOPIC", "parking/occupancy")
+OCCUPANCY_STALE_AFTER = 60  # seconds without a message before the table is reported stale
+
+
+class OccupancyTable:
+    """
+    Live spot occupancy, built from the deltas published by sensorControl.
+
+    Messages carry the publisher id (src) and a sequence number. A message
+    from an older sequence is ignored, a skipped sequence is counted as a
+    gap (the next full snapshot repairs the table), and a new publisher id
+    means the controller restarted, so the table waits for its snapshot.
+    The snapshot served by the API is rebuilt only when a message changed
+    something. Listeners are called with the spots each applied message
+    changed.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._spots: Dict[str, dict] = {}
+        self._source: Optional[str] = None
+        self._seq = 0
+        self._updated_at: Optional[float] = None
+        self._received_at: Optional[float] = None
+        self._snapshot: Optional[dict] = None
+        self._listeners: List[Callable[[List[dict], dict], None]] = []
+        self._stats = {"messages": 0, "applied": 0, "stale": 0, "gaps": 0, "invalid": 0, "lag_total": 0.0, "lag_max": 0.0}
+
+    def apply(self, message: dict) -> bool:
+        """Apply one occupancy message; False if it was stale or malformed."""
+        now = self.clock()
+        with self._lock:
+            self._stats["messages"] += 1
+            try:
+                source, seq, full = str(message["src"]), int(message["seq"]), bool(message.get("full"))
+                entries = [(str(e[0]), bool(e[1]), e[2], e[3]) for e in message["spots"]]
+            except (KeyError, TypeError, ValueError, IndexError):
+                self._stats["invalid"] += 1
+                return False
+
+            if source != self._source:
+                if not full:
+                    # Restarted publisher: wait for its first snapshot
+                    self._stats["stale"] += 1
+                    return False
+                self._source = source
+                self._seq = seq - 1
+            if seq <= self._seq:
+                self._stats["stale"] += 1
+                return False
+            if seq != self._seq + 1:
+                self._stats["gaps"] += 1
+
+            if full:
+                self._spots = {}
+            changed = []
+            for spot_id, occupied, distance, changed_at in entries:
+                spot = {
+                    "spot_id": spot_id,
+                    "occupied": occupied,
+                    "distance": distance,
+                    "changed_at": changed_at,
+                }
+                self._spots[spot_id] = spot
+                changed.append(spot)
+            self._seq = seq
+            self._updated_at = message.get("ts")
+            self._received_at = now
+            self._snapshot = None
+
+            self._stats["applied"] += 1
+            if self._updated_at is not None:
+                lag = max(0.0, now - self._updated_at)
+                self._stats["lag_total"] += lag
+                self._stats["lag_max"] = max(self._stats["lag_max"], lag)
+            summary = {
+                "total": len(self._spots),
+                "available": sum(1 for s in self._spots.values() if not s["occupied"]),
+                "full": full,
+            }
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(changed, summary)
+            except Exception as e:
+                logger.error(f"Occupancy listener failed: {e}")
+        return True
+
+    def add_listener(self, listener: Callable[[List[dict], dict], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def snapshot(self) -> dict:
+        """Current table; the cached dict is shared, callers must not modify it."""
+        with self._lock:
+            if self._snapshot is None:
+                spots = sorted(self._spots.values(), key=lambda s: (len(s["spot_id"]), s["spot_id"]))
+                self._snapshot = {
+                    "source": self._source,
+                    "seq": self._seq,
+                    "updated_at": self._updated_at,
+                    "total": len(spots),
+                    "available": sum(1 for s in spots if not s["occupied"]),
+                    "spots": spots,
+                }
+            snapshot = self._snapshot
+            received_at = self._received_at
+        stale = received_at is None or self.clock() - received_at > OCCUPANCY_STALE_AFTER
+        return {**snapshot, "stale": stale}
+
+    def get(self, spot_id: str) -> Optional[dict]:
+        with self._lock:
+            spot = self._spots.get(str(spot_id))
+            return dict(spot) if spot else None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lag_total = stats.pop("lag_total")
+        stats["lag_avg"] = round(lag_total / stats["applied"], 4) if stats["applied"] else None
+        stats["lag_max"] = round(stats["lag_max"], 4)
+        return stats
+
+
+class OccupancySubscriber:
+    """Feeds an OccupancyTable from the MQTT occupancy topic (paho network thread)."""
+
+    def __init__(self, table: OccupancyTable, broker: str = MQTT_BROKER, port: int = MQTT_PORT,
+                 topic: str = OCCUPANCY_TOPIC):
+        self.table = table
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self._client = None
+
+    def start(self):
+        if self._client is not None:
+            return
+        client = mqtt.Client()
+        client.on_connect = self._on_connect
+        client.on_message = self._on_message
+        try:
+            # connect_async + loop_start keeps retrying without blocking the API startup
+            client.connect_async(self.broker, self.port, 60)
+            client.loop_start()
+        except OSError as e:
+            logger.error(f"Occupancy subscriber could not start: {e}")
+            return
+        self._client = client
+
+    def stop(self):
+        if self._client is None:
+            return
+        self._client.loop_stop()
+        self._client.disconnect()
+        self._client = None
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            # Re-subscribed on every reconnect
+            client.subscribe(self.topic, qos=0)
+            logger.info(f"Subscribed to {self.topic} on {self.broker}")
+        else:
+            logger.error(f"Occupancy subscriber failed to connect, return code {rc}")
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            message = json.loads(msg.payload)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict) or not self.table.apply(message):
+            logger.debug(f"Occupancy message ignored: {msg.payload[:80]!r}")
+
+
+occupancy_table = OccupancyTable()
+occupancy_subscriber = OccupancySubscriber(occupancy_table)
@@ -0,0 +1,47 @@
+import base64
+import hashlib
+import hmac
+import json
+from typing import Dict, Optional, Sequence
+from src.imports.auth import SECRET_KEY
+
+# Page sizes accepted by paginated listings
+PAGE_SIZE_DEFAULT = 20
+PAGE_SIZE_MAX = 100
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not issued by this API or belongs to a different query."""
+
+
+def _signature(payload: bytes) -> str:
+    digest = hmac.new(SECRET_KEY.encode(), payload, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def encode_cursor(last_key: Optional[Dict], query: Sequence) -> Optional[str]:
+    """
+    Opaque token for the page after `last_key` (a LastEvaluatedKey), bound to the
+    query it came from, so it can't be edited or replayed against other filters.
+    """
+    if not last_key:
+        return None
+    payload = json.dumps({"k": last_key, "q": list(query)}, separators=(",", ":"), default=str).encode()
+    return f"{base64.urlsafe_b64encode(payload).decode().rstrip('=')}.{_signature(payload)}"
+
+
+def decode_cursor(cursor: Optional[str], query: Sequence) -> Optional[Dict]:
+    """ExclusiveStartKey of a cursor from encode_cursor(); raises InvalidCursor."""
+    if not cursor:
+        return None
+    try:
+        body, signature = cursor.split(".")
+        payload = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+        if not hmac.compare_digest(signature, _signature(payload)):
+            raise InvalidCursor("Invalid cursor")
+        data = json.loads(payload)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if data.get("q") != json.loads(json.dumps(list(query), default=str)):
+        raise InvalidCursor("Cursor does not match this query")
+    return data["k"]
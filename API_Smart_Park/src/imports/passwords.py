@@ -0,0 +1,156 @@
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+# scrypt parameters (memory = 128 * N * r bytes = 16 MiB)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+SALT_BYTES = 16
+SCRYPT_MAX_COST = 4 * SCRYPT_N * SCRYPT_R  # N * r a stored hash may ask for (64 MiB)
+
+# hashlib.scrypt releases the GIL, so a thread pool hashes in parallel without
+# blocking the event loop; PASSWORD_MAX_PENDING bounds the queue behind it.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64"))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="password")
+
+_pending: Optional[asyncio.Semaphore] = None
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolBusy(Exception):
+    """More password hashes are waiting than PASSWORD_MAX_PENDING."""
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def legacy_sha256(password: str) -> str:
+    """Unsalted SHA-256 used for passwords stored before scrypt"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def hash_password(password: str, salt: Optional[bytes] = None, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P) -> str:
+    """Salted scrypt hash, stored as 'scrypt$N$r$p$salt$hash' (blocking, ~65ms on one core)"""
+    salt = salt or os.urandom(SALT_BYTES)
+    key = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=SCRYPT_DKLEN)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    """(matches, needs_rehash) for a stored scrypt or legacy SHA-256 hash (blocking)"""
+    if not stored:
+        # Same work as a real check, so unknown emails can't be told apart by timing
+        hash_password(password)
+        return False, False
+
+    if stored.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, expected = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            salt, expected = base64.b64decode(salt), base64.b64decode(expected)
+            # A corrupt record must fail the login, not make scrypt raise or allocate gigabytes
+            if n < 2 or n & (n - 1) or r < 1 or p < 1 or n * r > SCRYPT_MAX_COST or not expected:
+                raise ValueError(f"unusable scrypt parameters N={n} r={r} p={p}")
+            key = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=len(expected))
+        except ValueError as e:
+            logger.warning(f"Rejecting malformed scrypt hash: {e}")
+            return False, False
+        matches = hmac.compare_digest(key, expected)
+        return matches, matches and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+    matches = hmac.compare_digest(legacy_sha256(password), stored)
+    return matches, matches
+
+
+async def _run(func, *args):
+    global _pending
+    if _pending is None:
+        _pending = asyncio.Semaphore(PASSWORD_WORKERS + PASSWORD_MAX_PENDING)
+    if _pending.locked():
+        raise PasswordPoolBusy()
+    async with _pending:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, functools.partial(func, *args))
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    return await _run(verify_password, password, stored)
+
+
+def shutdown_passwords():
+    password_executor.shutdown(wait=True)
+
+
+def benchmark(users: int, bursts, repeats: int):
+    """
+    Fire bursts of concurrent /login/ requests at the app (local DynamoDB,
+    users already cached) and print p99 latency, throughput and how many
+    requests were turned away with 503 by PASSWORD_MAX_PENDING.
+    """
+    import time
+    import httpx
+    from fastapi import FastAPI
+    from src.imports.dynamodb_helper import get_table
+    from src.imports.local_dynamodb import latency_report, local_dynamodb
+    from src.routers.register_router import login_router
+
+    app = FastAPI()
+    app.include_router(login_router)
+    password = "benchmark-password"
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def login(i):
+                started = time.perf_counter()
+                response = await client.post("/login/", json={"email": f"user{i % users}@example.com", "password": password})
+                return response.status_code, time.perf_counter() - started
+
+            await asyncio.gather(*(login(i) for i in range(users)))  # warm the user cache
+            for burst in bursts:
+                latencies, statuses, elapsed = [], {}, 0.0
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    results = await asyncio.gather(*(login(i) for i in range(burst)))
+                    elapsed += time.perf_counter() - started
+                    for status, latency in results:
+                        statuses[status] = statuses.get(status, 0) + 1
+                        if status == 200:
+                            latencies.append(latency)
+                codes = " ".join(f"{code}x{count}" for code, count in sorted(statuses.items()))
+                logins = statuses.get(200, 0)
+                print(f"{latency_report(f'burst of {burst}', latencies or [0.0])} {logins / elapsed:6.1f} logins/s  [{codes}]")
+
+    with local_dynamodb():
+        password_hash = hash_password(password)
+        with get_table("Users").batch_writer() as batch:
+            for i in range(users):
+                batch.put_item(Item={"email": f"user{i}@example.com", "name": f"User {i}", "password_hash": password_hash})
+        print(f"workers={PASSWORD_WORKERS} max_pending={PASSWORD_MAX_PENDING} N={SCRYPT_N} r={SCRYPT_R} p={SCRYPT_P}")
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # python -m src.imports.passwords --bursts 1 10 50 200: login latency and throughput under bursts
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark /login/ under bursts of concurrent requests")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--bursts", type=int, nargs="+", default=[1, 10, 50, 200], help="concurrent logins per burst")
+    parser.add_argument("--repeats", type=int, default=3, help="bursts timed per size")
+    args = parser.parse_args()
+    benchmark(args.users, args.bursts, args.repeats)
@@ -0,0 +1,195 @@
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from boto3.dynamodb.conditions import Key
+from src.imports.dynamodb_helper import get_table
+
+logger = logging.getLogger(__name__)
+
+CAR_PLATES_TABLE = "CarPlates"
+USERS_TABLE = "Users"
+PLATE_INDEX_TTL = float(os.getenv("PLATE_INDEX_TTL", "60"))  # seconds before a plate is re-read (other workers may change it)
+
+
+def normalize_plate(plate: str) -> str:
+    """Index key of a plate: upper case, letters and digits only ("b 123-abc" -> "B123ABC")."""
+    return re.sub(r"[^0-9A-Z]", "", str(plate or "").upper())
+
+
+class PlateIndex:
+    """
+    Plate -> owner emails, stored in the CarPlates table with an in-memory mirror.
+
+    The routers that change a user's car_plate_ids call add/remove/replace
+    after their Users write, so looking up who owns a detected plate is a
+    dict lookup (or, for a plate not seen yet, a single query) instead of
+    a scan of Users. A plate can belong to several users (shared cars).
+
+    Memory only changes after the table write succeeded. Every plate (and
+    the "not registered" answer of warm()) is trusted for `ttl` seconds and
+    then re-read with one query, so changes made through other API workers
+    show up within that time.
+    """
+
+    def __init__(self, table_name: str = CAR_PLATES_TABLE, ttl: float = PLATE_INDEX_TTL, clock=time.monotonic):
+        self.table_name = table_name
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._owners: Dict[str, Tuple[Set[str], float]] = {}  # plate -> (emails, loaded_at)
+        self._warmed_at: Optional[float] = None  # plates missing from a fresh warm() are unregistered
+        self._prune_at = 1024
+
+    @property
+    def table(self):
+        return get_table(self.table_name)
+
+    def _scan(self) -> Dict[str, Set[str]]:
+        owners: Dict[str, Set[str]] = {}
+        kwargs = {"ProjectionExpression": "plate, email"}
+        while True:
+            response = self.table.scan(**kwargs)
+            for item in response.get("Items", []):
+                owners.setdefault(item["plate"], set()).add(item["email"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        return owners
+
+    def warm(self):
+        """Load the whole index into memory (one paginated scan at startup)."""
+        started = self.clock()
+        try:
+            owners = self._scan()
+        except Exception as e:
+            # Lookups fall back to one query per plate
+            logger.error(f"Could not load the plate index: {e}")
+            return
+        with self._lock:
+            self._owners = {plate: (emails, started) for plate, emails in owners.items()}
+            self._warmed_at = started
+
+    def owners(self, plate: str) -> Set[str]:
+        """Emails of the users that registered `plate` (empty set if none)."""
+        key = normalize_plate(plate)
+        if not key:
+            return set()
+        now = self.clock()
+        with self._lock:
+            entry = self._owners.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                return set(entry[0])
+            if entry is None and self._warmed_at is not None and now - self._warmed_at < self.ttl:
+                return set()
+        response = self.table.query(KeyConditionExpression=Key("plate").eq(key), ProjectionExpression="email")
+        emails = {item["email"] for item in response.get("Items", [])}
+        with self._lock:
+            self._owners[key] = (set(emails), now)
+            if len(self._owners) > self._prune_at:
+                # Expired entries of plates nobody looks up anymore (misreads, old cars)
+                self._owners = {p: e for p, e in self._owners.items() if now - e[1] < self.ttl}
+                self._prune_at = max(1024, 2 * len(self._owners))
+        return emails
+
+    def add(self, email: str, plate: str):
+        self.replace(email, [], [plate])
+
+    def remove(self, email: str, plate: str, remaining: Iterable[str] = ()):
+        """Remove `plate` from `email`, unless it is still in `remaining` in another spelling."""
+        if normalize_plate(plate) in {normalize_plate(p) for p in remaining}:
+            return
+        self.replace(email, [plate], [])
+
+    @staticmethod
+    def _diff(old_plates: Optional[Iterable[str]], new_plates: Optional[Iterable[str]]) -> Tuple[Set[str], Set[str]]:
+        """(added, removed) index keys between two car_plate_ids lists."""
+        old = {normalize_plate(p) for p in old_plates or []} - {""}
+        new = {normalize_plate(p) for p in new_plates or []} - {""}
+        return new - old, old - new
+
+    def replace(self, email: str, old_plates: Optional[Iterable[str]], new_plates: Optional[Iterable[str]]):
+        """Move `email` from its old plates to its new ones (only the difference is written)."""
+        added, removed = self._diff(old_plates, new_plates)
+        if not added and not removed:
+            return
+
+        try:
+            with self.table.batch_writer() as batch:
+                for plate in added:
+                    batch.put_item(Item={"plate": plate, "email": email})
+                for plate in removed:
+                    batch.delete_item(Key={"plate": plate, "email": email})
+        except Exception as e:
+            # Users stays the source of truth; rebuild_from_users() repairs the table.
+            # Part of the batch may have landed: re-read these plates on their next lookup
+            logger.error(f"Plate index update for {email} failed: {e}")
+            with self._lock:
+                for plate in added | removed:
+                    self._owners[plate] = (set(), float("-inf"))
+            return
+        self._remember(email, added, removed)
+
+    def transact_items(self, email: str, old_plates: Optional[Iterable[str]], new_plates: Optional[Iterable[str]]) -> List[dict]:
+        """The CarPlates writes of replace() as transaction items, to commit with the Users write."""
+        added, removed = self._diff(old_plates, new_plates)
+        return ([{"Put": {"TableName": self.table_name, "Item": {"plate": plate, "email": email}}} for plate in added]
+                + [{"Delete": {"TableName": self.table_name, "Key": {"plate": plate, "email": email}}} for plate in removed])
+
+    def committed(self, email: str, old_plates: Optional[Iterable[str]], new_plates: Optional[Iterable[str]]):
+        """Update memory once a transaction holding transact_items() went through."""
+        self._remember(email, *self._diff(old_plates, new_plates))
+
+    def _remember(self, email: str, added: Set[str], removed: Set[str]):
+        now = self.clock()
+        with self._lock:
+            warm = self._warmed_at is not None and now - self._warmed_at < self.ttl
+            for plate in added:
+                entry = self._owners.get(plate)
+                if entry is not None:
+                    entry[0].add(email)
+                elif warm:
+                    self._owners[plate] = ({email}, now)
+            for plate in removed:
+                entry = self._owners.get(plate)
+                if entry is not None:
+                    entry[0].discard(email)
+
+    def rebuild_from_users(self):
+        """Recreate the index from every user's car_plate_ids (backfill / repair)."""
+        users = get_table(USERS_TABLE)
+        kwargs = {"ProjectionExpression": "email, car_plate_ids"}
+        owners: Dict[str, Set[str]] = {}
+        while True:
+            response = users.scan(**kwargs)
+            for user in response.get("Items", []):
+                for plate in user.get("car_plate_ids", []) or []:
+                    key = normalize_plate(plate)
+                    if key:
+                        owners.setdefault(key, set()).add(user["email"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        wanted = {(plate, email) for plate, emails in owners.items() for email in emails}
+        existing = {(plate, email) for plate, emails in self._scan().items() for email in emails}
+        with self.table.batch_writer() as batch:
+            for plate, email in wanted - existing:
+                batch.put_item(Item={"plate": plate, "email": email})
+            for plate, email in existing - wanted:
+                batch.delete_item(Key={"plate": plate, "email": email})
+        now = self.clock()
+        with self._lock:
+            self._owners = {plate: (emails, now) for plate, emails in owners.items()}
+            self._warmed_at = now
+        return len(wanted)
+
+
+plate_index = PlateIndex()
+
+
+if __name__ == "__main__":
+    # python -m src.imports.plate_index: backfill CarPlates from the Users table
+    print(f"Indexed {plate_index.rebuild_from_users()} plates")
@@ -0,0 +1,283 @@
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from boto3.dynamodb.conditions import Attr
+from src.imports.reservation_repository import get_reservation_repository, TTL_ATTRIBUTE
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle settings
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "1"))  # full days after a reservation's day before it is archived
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))  # seconds between compaction runs
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "archive/reservations"))
+
+# One Parquet file per month: reservations-YYYY-MM.parquet, sorted by day, spot and start time
+ARCHIVE_SCHEMA = pa.schema([
+    ("reservation_id", pa.string()),
+    ("email", pa.string()),
+    ("car_plate", pa.string()),
+    ("parking_spot_id", pa.int32()),
+    ("date", pa.date32()),
+    ("start", pa.time32("s")),
+    ("end", pa.time32("s")),
+    ("status", pa.string()),
+    ("archived_at", pa.timestamp("s")),
+])
+
+
+def _months(start: Optional[date], end: Optional[date]) -> Optional[set]:
+    if start is None or end is None:
+        return None
+    months, current = set(), start.replace(day=1)
+    while current <= end:
+        months.add(current.strftime("%Y-%m"))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+class ReservationArchive:
+    """
+    Moves finished reservations out of the hot Reservations table.
+
+    A background thread runs compact() every ARCHIVE_INTERVAL: reservations
+    of days that ended at least ARCHIVE_AFTER_DAYS ago are read through the
+    DateIndex, merged into the Parquet file of their month and then
+    deleted from DynamoDB. History and analytics queries read the Parquet
+    files only. Every item also carries a TTL (expires_at), so the table
+    stays bounded if compaction is not running. Days are never revisited
+    once archived, which holds because past days can't be booked.
+    """
+
+    def __init__(self, directory: Path = ARCHIVE_DIR, repository=None):
+        self.directory = directory
+        self._repository = repository
+        self._lock = threading.Lock()  # one compaction at a time
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"runs": 0, "archived": 0, "last_run": None, "last_error": None}
+
+    @property
+    def repository(self):
+        return self._repository or get_reservation_repository()
+
+    @property
+    def state_path(self) -> Path:
+        return self.directory / "state.json"
+
+    def month_path(self, month: str) -> Path:
+        return self.directory / f"reservations-{month}.parquet"
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reservation-archive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.compact()
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+                logger.error(f"Reservation compaction failed: {e}")
+            self._stop.wait(ARCHIVE_INTERVAL)
+
+    # --- Compaction ---
+
+    def _load_state(self) -> Dict:
+        try:
+            return json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict):
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.state_path)
+
+    def _finished(self, through: Optional[str], cutoff: date) -> List[Dict]:
+        """Reservations of the days after `through` and before `cutoff`."""
+        if through is None:
+            # First run: one scan finds the whole backlog, later runs query one day at a time
+            table, items = self.repository.table, []
+            kwargs = {"FilterExpression": Attr("date").lt(cutoff.isoformat())}
+            while True:
+                response = table.scan(**kwargs)
+                items.extend(response.get("Items", []))
+                if "LastEvaluatedKey" not in response:
+                    return items
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        items, day = [], date.fromisoformat(through) + timedelta(days=1)
+        while day < cutoff:
+            items.extend(self.repository.by_date(day.isoformat()))
+            day += timedelta(days=1)
+        return items
+
+    def compact(self, today: Optional[date] = None) -> int:
+        """Archive and delete every finished reservation not archived yet; returns how many (blocking)."""
+        today = today or date.today()
+        cutoff = today - timedelta(days=ARCHIVE_AFTER_DAYS)
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            state = self._load_state()
+            through = state.get("archived_through")
+            if through and through >= (cutoff - timedelta(days=1)).isoformat():
+                return 0
+
+            items = self._finished(through, cutoff)
+            by_month: Dict[str, List[Dict]] = {}
+            for item in items:
+                by_month.setdefault(item["date"][:7], []).append(item)
+            for month, rows in sorted(by_month.items()):
+                self._merge(month, rows)
+
+            # Deleted only once they are safely on disk; a crash before this re-archives them next run
+            with self.repository.table.batch_writer() as batch:
+                for item in items:
+                    batch.delete_item(Key={"reservation_id": item["reservation_id"]})
+
+            state["archived_through"] = (cutoff - timedelta(days=1)).isoformat()
+            self._save_state(state)
+            self._stats["runs"] += 1
+            self._stats["archived"] += len(items)
+            self._stats["last_run"] = datetime.now().isoformat(timespec="seconds")
+            self._stats["last_error"] = None
+            if items:
+                logger.info(f"Archived {len(items)} reservations through {state['archived_through']}")
+            return len(items)
+
+    @staticmethod
+    def _to_arrow(items: Iterable[Dict]) -> pa.Table:
+        archived_at = datetime.now().replace(microsecond=0)
+        rows = []
+        for item in items:
+            hour_range = item.get("hour_range") or [None, None]
+            rows.append({
+                "reservation_id": item["reservation_id"],
+                "email": item.get("email"),
+                "car_plate": item.get("car_plate"),
+                "parking_spot_id": int(item["parking_spot_id"]) if isinstance(item.get("parking_spot_id"), (int, Decimal)) else None,
+                "date": date.fromisoformat(item["date"]),
+                "start": time.fromisoformat(hour_range[0]) if hour_range[0] else None,
+                "end": time.fromisoformat(hour_range[1]) if len(hour_range) > 1 and hour_range[1] else None,
+                "status": item.get("status"),
+                "archived_at": archived_at,
+            })
+        return pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA)
+
+    def _merge(self, month: str, items: List[Dict]):
+        """Add items to a month file (replacing rows with the same reservation_id), written atomically."""
+        table = self._to_arrow(items)
+        path = self.month_path(month)
+        if path.exists():
+            existing = pq.read_table(path, schema=ARCHIVE_SCHEMA)
+            keep = pc.invert(pc.is_in(existing["reservation_id"], value_set=table["reservation_id"]))
+            table = pa.concat_tables([existing.filter(keep), table])
+        table = table.sort_by([("date", "ascending"), ("parking_spot_id", "ascending"), ("start", "ascending")])
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(table, tmp, compression="zstd", row_group_size=64 * 1024)
+        os.replace(tmp, path)
+
+    # --- Queries ---
+
+    def _read(self, email: Optional[str] = None, spot_id: Optional[int] = None,
+              start: Optional[date] = None, end: Optional[date] = None) -> pa.Table:
+        months = _months(start, end)
+        files = sorted(
+            str(path) for path in self.directory.glob("reservations-*.parquet")
+            if months is None or path.stem[len("reservations-"):] in months
+        )
+        if not files:
+            return ARCHIVE_SCHEMA.empty_table()
+
+        conditions = []
+        if email is not None:
+            conditions.append(pc.field("email") == email)
+        if spot_id is not None:
+            conditions.append(pc.field("parking_spot_id") == spot_id)
+        if start is not None:
+            conditions.append(pc.field("date") >= pa.scalar(start, pa.date32()))
+        if end is not None:
+            conditions.append(pc.field("date") <= pa.scalar(end, pa.date32()))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return ds.dataset(files, format="parquet", schema=ARCHIVE_SCHEMA).to_table(filter=expression)
+
+    def history(self, email: Optional[str] = None, spot_id: Optional[int] = None,
+                start: Optional[date] = None, end: Optional[date] = None, limit: int = 100) -> List[Dict]:
+        """Archived reservations matching the filters, newest first (blocking)."""
+        table = self._read(email, spot_id, start, end)
+        table = table.sort_by([("date", "descending"), ("start", "descending")]).slice(0, limit)
+        return [
+            {
+                "reservation_id": row["reservation_id"],
+                "email": row["email"],
+                "car_plate": row["car_plate"],
+                "parking_spot_id": row["parking_spot_id"],
+                "date": row["date"].isoformat(),
+                "hour_range": [t.isoformat() if t else None for t in (row["start"], row["end"])],
+                "status": row["status"],
+            }
+            for row in table.to_pylist()
+        ]
+
+    def summary(self, start: Optional[date] = None, end: Optional[date] = None) -> List[Dict]:
+        """Reservation count and reserved hours per spot over the archive (blocking)."""
+        table = self._read(start=start, end=end)
+        seconds = pc.subtract(pc.cast(table["end"], pa.int32()), pc.cast(table["start"], pa.int32()))
+        grouped = (
+            table.append_column("seconds", seconds)
+            .group_by("parking_spot_id")
+            .aggregate([("reservation_id", "count"), ("seconds", "sum")])
+            .sort_by("parking_spot_id")
+        )
+        return [
+            {
+                "parking_spot_id": row["parking_spot_id"],
+                "reservations": row["reservation_id_count"],
+                "reserved_hours": round((row["seconds_sum"] or 0) / 3600, 2),
+            }
+            for row in grouped.to_pylist()
+        ]
+
+    def metrics(self) -> Dict:
+        return {**self._stats, **self._load_state()}
+
+
+reservation_archive = ReservationArchive()
+
+
+if __name__ == "__main__":
+    # python -m src.imports.reservation_archive: enable TTL on the tables and run one compaction now
+    from botocore.exceptions import ClientError
+    from src.imports.dynamodb_helper import dynamodb
+    for table_name in ("Reservations", "SpotAvailability"):
+        try:
+            dynamodb.meta.client.update_time_to_live(
+                TableName=table_name,
+                TimeToLiveSpecification={"Enabled": True, "AttributeName": TTL_ATTRIBUTE}
+            )
+            print(f"TTL enabled on {table_name}")
+        except ClientError as e:
+            print(f"{table_name}: {e.response['Error']['Message']}")
+    print(f"Archived {reservation_archive.compact()} reservations")
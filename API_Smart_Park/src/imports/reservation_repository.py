@@ -0,0 +1,217 @@
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from boto3.dynamodb.conditions import Key
+from src.imports.dynamodb_helper import batch_get, get_table
+
+RESERVATIONS_TABLE = "Reservations"
+
+# Global secondary indexes defined in aws_reservation_table.py
+EMAIL_INDEX = "EmailDateIndex"  # email + date; aws_reservation_migration.py replaces the old email-only EmailIndex
+DATE_INDEX = "DateIndex"
+SPOT_DATE_INDEX = "SpotDateIndex"
+
+# Attributes returned by paginated listings (what the app renders)
+LIST_ATTRIBUTES = ("reservation_id", "date", "parking_spot_id", "car_plate", "hour_range", "status")
+
+# DynamoDB TTL: items are deleted this many days after their reservation day
+TTL_ATTRIBUTE = "expires_at"
+RESERVATION_TTL_DAYS = int(os.getenv("RESERVATION_TTL_DAYS", "30"))
+
+
+def spot_date_key(parking_spot_id, day: str) -> str:
+    """Build the composite SpotDateIndex key for a spot on a given day."""
+    return f"{parking_spot_id}#{day}"
+
+
+def expires_at(day: str, ttl_days: int = RESERVATION_TTL_DAYS) -> int:
+    """TTL value (epoch seconds) for an item of `day`: the local midnight after it, plus ttl_days."""
+    end_of_day = datetime.combine(date.fromisoformat(day) + timedelta(days=1), time())
+    return int((end_of_day + timedelta(days=ttl_days)).timestamp())
+
+
+class ReservationRepository:
+    """
+    Query layer for the Reservations table.
+
+    Every lookup goes through one of the table's GSIs instead of a full
+    scan, and follows LastEvaluatedKey so results are never cut off at
+    the 1 MB page limit. The table is resolved through a getter so a
+    different backend (e.g. DynamoDB Local) can be plugged in.
+    """
+
+    def __init__(self, table_getter: Callable = get_table, table_name: str = RESERVATIONS_TABLE):
+        self.table_getter = table_getter
+        self.table_name = table_name
+
+    @property
+    def table(self):
+        return self.table_getter(self.table_name)
+
+    def query_all(self, **kwargs) -> List[Dict]:
+        """Run a Query and collect every page."""
+        items = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get("Items", []))
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return items
+            kwargs["ExclusiveStartKey"] = last_key
+
+    def get(self, reservation_id: str) -> Optional[Dict]:
+        response = self.table.get_item(Key={"reservation_id": reservation_id})
+        return response.get("Item")
+
+    def get_many(self, reservation_ids: List[str]) -> Dict[str, Dict]:
+        """reservation_id -> item for every id that exists (BatchGetItem, 100 per call)."""
+        keys = [{"reservation_id": reservation_id} for reservation_id in dict.fromkeys(reservation_ids)]
+        return {item["reservation_id"]: item for item in batch_get(self.table_name, keys)}
+
+    def by_email(self, email: str) -> List[Dict]:
+        """All reservations made by a user, oldest day first."""
+        return self.query_all(
+            IndexName=EMAIL_INDEX,
+            KeyConditionExpression=Key("email").eq(email)
+        )
+
+    def page_by_email(self, email: str, start: Optional[str] = None, end: Optional[str] = None,
+                      newest_first: bool = False, limit: int = 20, exclusive_start_key: Optional[Dict] = None,
+                      attributes=LIST_ATTRIBUTES) -> Tuple[List[Dict], Optional[Dict]]:
+        """
+        One page of a user's reservations, optionally between two days (inclusive).
+        Returns (items, LastEvaluatedKey), with only `attributes` read from the index.
+        """
+        condition = Key("email").eq(email)
+        if start and end:
+            condition &= Key("date").between(start, end)
+        elif start:
+            condition &= Key("date").gte(start)
+        elif end:
+            condition &= Key("date").lte(end)
+
+        names = {f"#a{i}": attribute for i, attribute in enumerate(attributes)}
+        kwargs = {
+            "IndexName": EMAIL_INDEX,
+            "KeyConditionExpression": condition,
+            "ScanIndexForward": not newest_first,
+            "Limit": limit,
+            "ProjectionExpression": ", ".join(names),
+            "ExpressionAttributeNames": names,
+        }
+        if exclusive_start_key:
+            kwargs["ExclusiveStartKey"] = exclusive_start_key
+        response = self.table.query(**kwargs)
+        return response.get("Items", []), response.get("LastEvaluatedKey")
+
+    def by_email_and_date(self, email: str, day: str) -> List[Dict]:
+        """A user's reservations on a single day."""
+        return self.query_all(
+            IndexName=EMAIL_INDEX,
+            KeyConditionExpression=Key("email").eq(email) & Key("date").eq(day)
+        )
+
+    def by_date(self, day: str) -> List[Dict]:
+        """Every reservation on a single day, across all spots."""
+        return self.query_all(
+            IndexName=DATE_INDEX,
+            KeyConditionExpression=Key("date").eq(day)
+        )
+
+    def by_spot_and_date(self, parking_spot_id, day: str) -> List[Dict]:
+        """Reservations for one parking spot on a single day."""
+        return self.query_all(
+            IndexName=SPOT_DATE_INDEX,
+            KeyConditionExpression=Key("spot_date").eq(spot_date_key(parking_spot_id, day))
+        )
+
+
+_repository = ReservationRepository()
+
+
+def get_reservation_repository() -> ReservationRepository:
+    """Get the shared reservation repository"""
+    return _repository
+
+
+def set_reservation_repository(repository: ReservationRepository):
+    """Swap the shared repository, e.g. to point at a local DynamoDB."""
+    global _repository
+    _repository = repository
+
+
+def benchmark(count: int, users: int, spots: int, days: int, probes: int):
+    """
+    Seed `count` reservations into a local DynamoDB and time the overlap
+    lookups of create_reservation: the old filtered scans against the GSI queries.
+    """
+    import random
+    import time as timer
+    from boto3.dynamodb.conditions import Attr
+    from src.imports.local_dynamodb import latency_report, local_dynamodb
+
+    rng = random.Random(1)
+    first_day = date(2030, 1, 1)
+    with local_dynamodb():
+        repository = ReservationRepository()
+        started = timer.perf_counter()
+        with repository.table.batch_writer() as batch:
+            for i in range(count):
+                day = (first_day + timedelta(days=rng.randrange(days))).isoformat()
+                spot = rng.randrange(1, spots + 1)
+                start = rng.randrange(0, 22)
+                batch.put_item(Item={
+                    "reservation_id": f"bench-{i}",
+                    "email": f"user{rng.randrange(users)}@example.com",
+                    "car_plate": f"B{i % 1000:03d}XYZ",
+                    "parking_spot_id": spot,
+                    "date": day,
+                    "spot_date": spot_date_key(spot, day),
+                    "hour_range": [f"{start:02d}:00:00", f"{start + 1:02d}:00:00"],
+                    "status": "pending",
+                })
+        print(f"seeded {count} reservations in {timer.perf_counter() - started:.1f}s")
+
+        def scan_all(**kwargs):
+            items, scanned = [], 0
+            while True:
+                response = repository.table.scan(**kwargs)
+                items.extend(response["Items"])
+                scanned += response["ScannedCount"]
+                if "LastEvaluatedKey" not in response:
+                    return items, scanned
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        results = {"scan email+date": [], "query EmailDateIndex": [], "scan spot+date": [], "query SpotDateIndex": []}
+        scanned = {name: 0 for name in results}
+        for _ in range(probes):
+            email = f"user{rng.randrange(users)}@example.com"
+            day = (first_day + timedelta(days=rng.randrange(days))).isoformat()
+            spot = rng.randrange(1, spots + 1)
+            runs = [
+                ("scan email+date", lambda: scan_all(FilterExpression=Attr("email").eq(email) & Attr("date").eq(day))),
+                ("query EmailDateIndex", lambda: (repository.by_email_and_date(email, day), None)),
+                ("scan spot+date", lambda: scan_all(FilterExpression=Attr("parking_spot_id").eq(spot) & Attr("date").eq(day))),
+                ("query SpotDateIndex", lambda: (repository.by_spot_and_date(spot, day), None)),
+            ]
+            for name, run in runs:
+                started = timer.perf_counter()
+                items, examined = run()
+                results[name].append(timer.perf_counter() - started)
+                scanned[name] += examined if examined is not None else len(items)
+
+        for name, samples in results.items():
+            print(f"{latency_report(name, samples)} items read/lookup={scanned[name] / probes:,.0f}")
+
+
+if __name__ == "__main__":
+    # python -m src.imports.reservation_repository --count 1000000: scans vs GSI queries on a local DynamoDB
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark reservation lookups against a local DynamoDB (moto or DYNAMODB_ENDPOINT)")
+    parser.add_argument("--count", type=int, default=1_000_000, help="reservations to seed")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--spots", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--probes", type=int, default=20, help="lookups timed per method")
+    args = parser.parse_args()
+    benchmark(args.count, args.users, args.spots, args.days, args.probes)
@@ -0,0 +1,536 @@
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from botocore.exceptions import ClientError
+from src.imports.dynamodb_helper import batch_get, get_table
+from src.imports.reservation_repository import get_reservation_repository, spot_date_key, expires_at, RESERVATIONS_TABLE, TTL_ATTRIBUTE
+
+AVAILABILITY_TABLE = "SpotAvailability"
+
+# Spots that can be reserved (same ids as HardwareControl/spots.json)
+PARKING_SPOTS = [s.strip() for s in os.getenv("PARKING_SPOTS", "1,2,3").split(",") if s.strip()]
+
+MINUTES_PER_DAY = 24 * 60
+BITMAP_BYTES = MINUTES_PER_DAY // 8
+AVAILABILITY_TTL = 30  # seconds before a mirrored day is re-read (other API instances may book)
+BOOKING_ATTEMPTS = 3  # optimistic retries when another booking changed the same spot-day
+TRANSACT_MAX_ITEMS = 100  # TransactWriteItems item limit
+
+
+class SpotConflict(Exception):
+    """The spot is already reserved for part of the requested time."""
+
+
+class ReservationExists(Exception):
+    """A reservation with the same id already exists."""
+
+
+class UnknownSpot(Exception):
+    """The parking spot is not one of PARKING_SPOTS."""
+
+
+class _ItemConditionFailed(Exception):
+    """The condition of a non-availability item in the transaction failed."""
+
+
+def minute_of_day(t, round_up: bool = False) -> int:
+    """Minute index of a time object or 'HH:MM[:SS]' string (seconds round down, or up for end times)."""
+    if isinstance(t, str):
+        parts = [int(p) for p in t.split(":")]
+        hour, minute, second = (parts + [0, 0])[:3]
+    else:
+        hour, minute, second = t.hour, t.minute, t.second
+    minutes = hour * 60 + minute + second / 60
+    return min(MINUTES_PER_DAY, math.ceil(minutes) if round_up else math.floor(minutes))
+
+
+def minute_mask(start, end) -> int:
+    """Bitmap with one bit per minute of [start, end)."""
+    first, last = minute_of_day(start), minute_of_day(end, round_up=True)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def reservation_mask(reservation: Dict) -> int:
+    hour_range = reservation.get("hour_range") or []
+    if len(hour_range) < 2:
+        return 0
+    return minute_mask(hour_range[0], hour_range[1])
+
+
+def _to_bytes(bitmap: int) -> bytes:
+    return bitmap.to_bytes(BITMAP_BYTES, "little")
+
+
+def _from_bytes(value) -> int:
+    return int.from_bytes(bytes(getattr(value, "value", value)), "little")
+
+
+class SpotAvailabilityIndex:
+    """
+    Per-spot, per-day minute bitmaps of reserved time.
+
+    Each spot-day is one SpotAvailability item (spot_date, 180-byte bitmap,
+    version) mirrored in memory as a Python int, so "is this spot free
+    between T1 and T2" is a single AND and listing the free spots of a
+    window is one AND per spot.
+
+    Bookings are conflict-free across all users: the bitmap update
+    (conditioned on the version read) and the reservation put go through
+    one TransactWriteItems call, so two bookings of the same minutes can't
+    both succeed. A spot-day without an item yet is built from its
+    existing reservations on first use.
+    """
+
+    def __init__(self, spots: Iterable[str] = PARKING_SPOTS, table_name: str = AVAILABILITY_TABLE,
+                 repository=None, clock=time.monotonic):
+        self.spots = [str(s) for s in spots]
+        self.table_name = table_name
+        self._repository = repository
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._days: Dict[str, Tuple[int, int, float]] = {}  # spot_date -> (bitmap, version, loaded_at)
+
+    @property
+    def repository(self):
+        return self._repository or get_reservation_repository()
+
+    # --- Loading ---
+
+    def _fresh(self, key: str) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            entry = self._days.get(key)
+            if entry and self.clock() - entry[2] < AVAILABILITY_TTL:
+                return entry[0], entry[1]
+            return None
+
+    def _store(self, key: str, bitmap: int, version: int):
+        with self._lock:
+            self._days[key] = (bitmap, version, self.clock())
+
+    def load(self, keys: Iterable[str], force: bool = False) -> Dict[str, Tuple[int, int]]:
+        """(bitmap, version) of each spot_date key; reads the missing ones with BatchGetItem."""
+        result, missing = {}, []
+        for key in dict.fromkeys(keys):
+            state = None if force else self._fresh(key)
+            if state is None:
+                missing.append(key)
+            else:
+                result[key] = state
+
+        if not missing:
+            return result
+
+        found = {
+            item["spot_date"]: (_from_bytes(item["minutes"]), int(item["version"]))
+            for item in batch_get(self.table_name, [{"spot_date": key} for key in missing], consistent=True)
+        }
+        for key in missing:
+            if key not in found:
+                # No bitmap yet: build it from the reservations already made for that spot-day
+                spot_id, day = key.split("#", 1)
+                bitmap = 0
+                for reservation in self.repository.by_spot_and_date(spot_id, day):
+                    bitmap |= reservation_mask(reservation)
+                found[key] = (bitmap, 0)
+            self._store(key, *found[key])
+            result[key] = found[key]
+        return result
+
+    # --- Queries ---
+
+    def has_spot(self, spot_id) -> bool:
+        return str(spot_id) in self.spots
+
+    def is_free(self, spot_id, day: str, start, end) -> bool:
+        key = spot_date_key(spot_id, day)
+        bitmap, _ = self.load([key])[key]
+        return bitmap & minute_mask(start, end) == 0
+
+    def free_spots(self, day: str, start, end, spots: Optional[Iterable[str]] = None) -> List[str]:
+        """Spots with no reservation overlapping [start, end) on `day`."""
+        spots = [str(s) for s in spots] if spots is not None else self.spots
+        mask = minute_mask(start, end)
+        states = self.load(spot_date_key(spot, day) for spot in spots)
+        return [spot for spot in spots if states[spot_date_key(spot, day)][0] & mask == 0]
+
+    def conflicts(self, reservations: List[Dict]) -> List[Tuple[Dict, str]]:
+        """
+        (reservation, reason) for each reservation overlapping a booked time or
+        an earlier reservation of the list on the same spot; one BatchGetItem for all spot-days.
+        """
+        keys = [spot_date_key(r["parking_spot_id"], r["date"]) for r in reservations]
+        states = self.load(keys)
+        taken = {key: bitmap for key, (bitmap, _) in states.items()}
+        found = []
+        for key, reservation in zip(keys, reservations):
+            mask = reservation_mask(reservation)
+            if taken[key] & mask:
+                found.append((reservation, f"Spot {reservation['parking_spot_id']} is already reserved during this time"))
+            else:
+                taken[key] |= mask
+        return found
+
+    # --- Writes ---
+
+    def _availability_update(self, key: str, bitmap: int, version: int) -> Dict:
+        update = {
+            "TableName": self.table_name,
+            "Key": {"spot_date": key},
+            "UpdateExpression": "SET #minutes = :minutes, #version = :next, #expires = :expires",
+            "ExpressionAttributeNames": {"#minutes": "minutes", "#version": "version", "#expires": TTL_ATTRIBUTE},
+            "ExpressionAttributeValues": {
+                ":minutes": _to_bytes(bitmap),
+                ":next": version + 1,
+                ":expires": expires_at(key.split("#", 1)[1]),
+            },
+        }
+        if version == 0:
+            update["ConditionExpression"] = "attribute_not_exists(spot_date)"
+        else:
+            update["ConditionExpression"] = "#version = :version"
+            update["ExpressionAttributeValues"][":version"] = version
+        return {"Update": update}
+
+    def _transact(self, key: str, build_items, attempts: int = BOOKING_ATTEMPTS):
+        """
+        Run build_items(bitmap) -> (new bitmap, other transaction items) against
+        the current bitmap of `key`, retrying when another write bumped its version.
+        """
+        # The resource's client serializes plain Python values itself, like Table calls
+        client = get_table(self.table_name).meta.client
+        force = False
+        for _ in range(attempts):
+            bitmap, version = self.load([key], force=force)[key]
+            new_bitmap, items = build_items(bitmap)
+            try:
+                client.transact_write_items(TransactItems=[self._availability_update(key, new_bitmap, version)] + items)
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "TransactionCanceledException":
+                    raise
+                reasons = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+                if any(code == "ConditionalCheckFailed" for code in reasons[1:]):
+                    raise _ItemConditionFailed()
+                # A stale bitmap version, or a concurrent write to any item of the transaction
+                if reasons and (reasons[0] == "ConditionalCheckFailed" or "TransactionConflict" in reasons):
+                    force = True
+                    continue
+                raise
+            self._store(key, new_bitmap, version + 1)
+            return
+        raise SpotConflict("Spot is being booked concurrently, try again")
+
+    def book(self, reservation: Dict):
+        """Put a reservation and mark its minutes reserved, atomically (blocking)."""
+        if not self.has_spot(reservation["parking_spot_id"]):
+            raise UnknownSpot(f"Spot {reservation['parking_spot_id']} does not exist")
+        key = spot_date_key(reservation["parking_spot_id"], reservation["date"])
+        mask = reservation_mask(reservation)
+
+        def build(bitmap):
+            if bitmap & mask:
+                raise SpotConflict(f"Spot {reservation['parking_spot_id']} is already reserved during this time")
+            put = {
+                "Put": {
+                    "TableName": RESERVATIONS_TABLE,
+                    "Item": reservation,
+                    "ConditionExpression": "attribute_not_exists(reservation_id)",
+                }
+            }
+            return bitmap | mask, [put]
+
+        try:
+            self._transact(key, build)
+        except _ItemConditionFailed:
+            raise ReservationExists()
+
+    def _kept(self, key: str, released: Iterable[str]) -> int:
+        """Minutes of the spot-day's reservations other than `released` (legacy data may overlap)."""
+        spot_id, day = key.split("#", 1)
+        released = set(released)
+        bitmap = 0
+        for reservation in self.repository.by_spot_and_date(spot_id, day):
+            if reservation["reservation_id"] not in released:
+                bitmap |= reservation_mask(reservation)
+        return bitmap
+
+    def release(self, reservation_id: str) -> Optional[Dict]:
+        """Delete a reservation and free its minutes, atomically; returns the deleted item (blocking)."""
+        reservation = self.repository.get(reservation_id)
+        if not reservation:
+            return None
+        key = spot_date_key(reservation["parking_spot_id"], reservation["date"])
+        mask = reservation_mask(reservation)
+        kept = self._kept(key, [reservation_id])
+
+        def build(bitmap):
+            delete = {
+                "Delete": {
+                    "TableName": RESERVATIONS_TABLE,
+                    "Key": {"reservation_id": reservation_id},
+                    "ConditionExpression": "attribute_exists(reservation_id)",
+                }
+            }
+            # Minutes another reservation also holds stay reserved; bits outside the mask are
+            # kept as read, since a booking made meanwhile may not be on the index yet
+            return (bitmap & ~mask) | (kept & mask), [delete]
+
+        try:
+            self._transact(key, build)
+        except _ItemConditionFailed:
+            # Someone else deleted it first
+            return None
+        return reservation
+
+    # --- Bulk writes ---
+
+    def _write_many(self, reservations: List[Dict], apply, action) -> Tuple[List[Dict], List[Tuple[Dict, str]]]:
+        """
+        Apply many reservation writes with as few transactions as possible.
+
+        Reservations are grouped per spot-day; each group becomes one bitmap
+        update plus its reservation items (apply(bitmap, reservation) -> new
+        bitmap, or None when the reservation no longer fits; action(reservation)
+        -> transaction item). Groups of different spot-days share a transaction
+        up to TRANSACT_MAX_ITEMS. Returns (written, [(reservation, reason)]).
+        """
+        written, failed = [], []
+        pending = list(reservations)
+        for attempt in range(BOOKING_ATTEMPTS):
+            if not pending:
+                break
+            retry = []
+            groups: Dict[str, List[Dict]] = {}
+            for reservation in pending:
+                groups.setdefault(spot_date_key(reservation["parking_spot_id"], reservation["date"]), []).append(reservation)
+            states = self.load(groups, force=attempt > 0)
+
+            # Units: (key, version expected, new bitmap, reservations); a group with more
+            # items than a transaction holds is split into units applied one after another
+            units = []
+            for key, group in groups.items():
+                bitmap, version = states[key]
+                accepted = []
+                for reservation in group:
+                    new_bitmap = apply(bitmap, reservation)
+                    if new_bitmap is None:
+                        failed.append((reservation, f"Spot {reservation['parking_spot_id']} is already reserved during this time"))
+                        continue
+                    bitmap = new_bitmap
+                    accepted.append(reservation)
+                    if len(accepted) == TRANSACT_MAX_ITEMS - 1:
+                        units.append((key, version, bitmap, accepted))
+                        version, accepted = version + 1, []
+                if accepted:
+                    units.append((key, version, bitmap, accepted))
+
+            broken = set()  # spot-days whose version is now unknown
+            while units:
+                batch, deferred, keys, size = [], [], set(), 0
+                for unit in units:
+                    if unit[0] in keys or size + 1 + len(unit[3]) > TRANSACT_MAX_ITEMS:
+                        deferred.append(unit)
+                    else:
+                        batch.append(unit)
+                        keys.add(unit[0])
+                        size += 1 + len(unit[3])
+                units = deferred
+
+                items, owners = [], []
+                for key, version, bitmap, group in batch:
+                    if key in broken:
+                        retry.extend(group)
+                        continue
+                    items.append(self._availability_update(key, bitmap, version))
+                    owners.append((key, None))
+                    for reservation in group:
+                        items.append(action(reservation))
+                        owners.append((key, reservation))
+                if not items:
+                    continue
+
+                try:
+                    get_table(self.table_name).meta.client.transact_write_items(TransactItems=items)
+                except ClientError as e:
+                    reasons = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+                    if e.response["Error"]["Code"] != "TransactionCanceledException" or not reasons:
+                        failed.extend((r, f"AWS error: {e.response['Error']['Message']}") for _, r in owners if r)
+                        broken.update(key for key, _ in owners)
+                        continue
+                    for (key, reservation), code in zip(owners, reasons):
+                        if reservation is None:
+                            continue
+                        if code == "ConditionalCheckFailed":
+                            failed.append((reservation, "condition"))
+                        else:
+                            # Cancelled along with the item that failed, or a concurrent bitmap write
+                            retry.append(reservation)
+                    broken.update(key for key, _ in owners)
+                    continue
+
+                for key, version, bitmap, group in batch:
+                    if key not in broken:
+                        self._store(key, bitmap, version + 1)
+                        written.extend(group)
+            pending = retry
+
+        failed.extend((reservation, "Spot is being booked concurrently, try again") for reservation in pending)
+        return written, failed
+
+    def book_many(self, reservations: List[Dict]) -> Tuple[List[Dict], List[Tuple[Dict, str]]]:
+        """Put many reservations and mark their minutes reserved; returns (booked, [(reservation, reason)]) (blocking)."""
+        def action(reservation):
+            return {
+                "Put": {
+                    "TableName": RESERVATIONS_TABLE,
+                    "Item": reservation,
+                    "ConditionExpression": "attribute_not_exists(reservation_id)",
+                }
+            }
+
+        def apply(bitmap, reservation):
+            mask = reservation_mask(reservation)
+            return None if bitmap & mask else bitmap | mask
+
+        unknown = [r for r in reservations if not self.has_spot(r["parking_spot_id"])]
+        booked, failed = self._write_many([r for r in reservations if self.has_spot(r["parking_spot_id"])], apply, action)
+        failed = [(r, "Reservation already exists" if reason == "condition" else reason) for r, reason in failed]
+        return booked, failed + [(r, f"Spot {r['parking_spot_id']} does not exist") for r in unknown]
+
+    def release_many(self, reservation_ids: List[str]) -> Tuple[List[Dict], List[str], List[Tuple[Dict, str]]]:
+        """
+        Delete many reservations and free their minutes; returns
+        (deleted items, ids not found, [(reservation, reason)]) (blocking).
+        """
+        items = self.repository.get_many(reservation_ids)
+        missing = [reservation_id for reservation_id in dict.fromkeys(reservation_ids) if reservation_id not in items]
+
+        def action(reservation):
+            return {
+                "Delete": {
+                    "TableName": RESERVATIONS_TABLE,
+                    "Key": {"reservation_id": reservation["reservation_id"]},
+                    "ConditionExpression": "attribute_exists(reservation_id)",
+                }
+            }
+
+        keys = {spot_date_key(r["parking_spot_id"], r["date"]) for r in items.values()}
+        kept = {key: self._kept(key, items) for key in keys}
+
+        def apply(bitmap, reservation):
+            mask = reservation_mask(reservation)
+            return (bitmap & ~mask) | (kept[spot_date_key(reservation["parking_spot_id"], reservation["date"])] & mask)
+
+        deleted, failed = self._write_many(list(items.values()), apply, action)
+        # A delete whose condition failed was already deleted by someone else
+        missing.extend(r["reservation_id"] for r, reason in failed if reason == "condition")
+        return deleted, missing, [(r, reason) for r, reason in failed if reason != "condition"]
+
+
+spot_availability = SpotAvailabilityIndex()
+
+
+def benchmark(spots: int, count: int, probes: int):
+    """
+    Seed `count` reservations over `spots` spots of one day (with their
+    bitmaps) into a local DynamoDB, then time bookings and free-spot
+    lookups: bitmaps mirrored in memory, bitmaps re-read from the table,
+    and a scan of the day's reservations as it had to be done before.
+    moto copies its tables on every transaction, so book timings there
+    grow with the seed; use DynamoDB Local for realistic numbers.
+    """
+    import random
+    from boto3.dynamodb.conditions import Attr
+    from src.imports.local_dynamodb import latency_report, local_dynamodb
+
+    rng = random.Random(1)
+    day = "2030-01-01"
+
+    def reservation(i, spot, start, minutes):
+        end = start + minutes
+        return {
+            "reservation_id": f"bench-{i}",
+            "email": f"user{i % 1000}@example.com",
+            "car_plate": f"B{i % 1000:03d}XYZ",
+            "parking_spot_id": spot,
+            "date": day,
+            "spot_date": spot_date_key(spot, day),
+            "hour_range": [f"{start // 60:02d}:{start % 60:02d}:00", f"{end // 60:02d}:{end % 60:02d}:00"],
+            "status": "pending",
+        }
+
+    with local_dynamodb():
+        index = SpotAvailabilityIndex(spots=range(1, spots + 1))
+        # Back-to-back slots per spot, leaving the end of the day free for the timed bookings
+        per_spot = -(-count // spots)
+        slot = MINUTES_PER_DAY // (per_spot + 1)
+        bitmaps = {}
+        started = time.perf_counter()
+        with get_table(RESERVATIONS_TABLE).batch_writer() as batch:
+            for i in range(count):
+                item = reservation(i, i % spots + 1, (i // spots) * slot, slot)
+                bitmaps[item["spot_date"]] = bitmaps.get(item["spot_date"], 0) | reservation_mask(item)
+                batch.put_item(Item=item)
+        with get_table(index.table_name).batch_writer() as batch:
+            for key, bitmap in bitmaps.items():
+                batch.put_item(Item={"spot_date": key, "minutes": _to_bytes(bitmap), "version": 1})
+        print(f"seeded {count} reservations on {spots} spots in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        index.load(spot_date_key(spot, day) for spot in index.spots)
+        print(f"loaded {spots} bitmaps in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+        results = {"book (free)": [], "book (conflict)": [], "free_spots (mirrored)": [],
+                   "free_spots (re-read)": [], "scan day (before)": []}
+        first_free = per_spot * slot
+        for i in range(probes):
+            spot = rng.randrange(1, spots + 1)
+            start = rng.randrange(first_free, MINUTES_PER_DAY - 1)
+            started = time.perf_counter()
+            index.book(reservation(count + i, spot, start, 1))
+            results["book (free)"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            try:
+                index.book(reservation(count + probes + i, spot, start, 1))
+            except SpotConflict:
+                pass
+            results["book (conflict)"].append(time.perf_counter() - started)
+
+            window = sorted(rng.sample(range(MINUTES_PER_DAY), 2))
+            start_t, end_t = (f"{m // 60:02d}:{m % 60:02d}" for m in window)
+            started = time.perf_counter()
+            index.free_spots(day, start_t, end_t)
+            results["free_spots (mirrored)"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            index.load((spot_date_key(spot, day) for spot in index.spots), force=True)
+            index.free_spots(day, start_t, end_t)
+            results["free_spots (re-read)"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            kwargs, taken, mask = {"FilterExpression": Attr("date").eq(day)}, set(), minute_mask(start_t, end_t)
+            while True:
+                response = get_table(RESERVATIONS_TABLE).scan(**kwargs)
+                taken.update(str(r["parking_spot_id"]) for r in response["Items"] if reservation_mask(r) & mask)
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+            results["scan day (before)"].append(time.perf_counter() - started)
+
+        for name, samples in results.items():
+            print(latency_report(name, samples))
+
+
+if __name__ == "__main__":
+    # python -m src.imports.spot_availability --spots 2000 --count 10000: booking and free-spot lookup timings
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark spot bitmaps against a local DynamoDB (moto or DYNAMODB_ENDPOINT)")
+    parser.add_argument("--spots", type=int, default=2000)
+    parser.add_argument("--count", type=int, default=10000, help="reservations seeded before timing")
+    parser.add_argument("--probes", type=int, default=5, help="operations timed per kind")
+    args = parser.parse_args()
+    benchmark(args.spots, args.count, args.probes)
@@ -0,0 +1,487 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, time as dtime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from botocore.exceptions import ClientError
+from src.imports.active_reservation_index import active_reservation_index
+from src.imports.dynamodb_helper import get_table
+from src.imports.live_broadcast import live_broadcast
+from src.imports.reservation_repository import get_reservation_repository, RESERVATIONS_TABLE
+
+logger = logging.getLogger(__name__)
+
+# Reservation statuses
+PENDING = "pending"
+ACTIVE = "active"
+COMPLETED = "completed"
+NO_SHOW = "no-show"
+CANCELLED = "cancelled"
+FINAL_STATUSES = {COMPLETED, NO_SHOW, CANCELLED}
+
+# Engine settings
+NO_SHOW_GRACE = int(os.getenv("NO_SHOW_GRACE", "900"))  # seconds after the start without the car before a no-show
+STATUS_BATCH_SIZE = 100  # TransactWriteItems item limit
+STATUS_WRITE_ATTEMPTS = 3
+STATUS_RETRY_DELAY = 5.0  # seconds before changes whose write failed are written again
+ENGINE_MAX_SLEEP = 60.0  # seconds; also how late a day rollover is noticed
+
+
+def reservation_window(reservation: Dict) -> Optional[Tuple[float, float]]:
+    """(start, end) of a reservation as local epoch seconds, or None if its hour_range is unusable."""
+    hour_range = reservation.get("hour_range") or []
+    if len(hour_range) < 2:
+        return None
+    try:
+        day = date.fromisoformat(reservation["date"])
+        start = datetime.combine(day, dtime.fromisoformat(hour_range[0])).timestamp()
+        end = datetime.combine(day, dtime.fromisoformat(hour_range[1])).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (start, end) if end > start else None
+
+
+class _Tracked:
+    __slots__ = ("reservation", "status", "arrived", "generation", "ended")
+
+    def __init__(self, reservation: Dict, status: str, arrived: bool, generation: int):
+        self.reservation = reservation
+        self.status = status  # as last written to (or read from) the table
+        self.arrived = arrived
+        self.generation = generation
+        self.ended = False  # past its end, kept only until its final status is written
+
+
+class StatusEngine:
+    """
+    Moves reservations through pending -> active -> completed / no-show.
+
+    Every tracked reservation has three entries in a heap of upcoming
+    transitions (start, start + NO_SHOW_GRACE, end). A background thread
+    sleeps until the earliest one is due and then handles everything due,
+    so no consumer has to compare hour_range with the clock. A reservation
+    is "arrived" once its spot is reported occupied during its window or the
+    camera matched its plate; one still not arrived at the grace deadline
+    becomes a no-show (and active again if the car shows up later).
+
+    Status changes found in one pass are coalesced per reservation, written
+    with TransactWriteItems (100 per call, each conditioned on the previous
+    status so a client's PUT wins) and published on the live feed as
+    "status" events. A change stays queued until its write is applied:
+    failed writes are retried after STATUS_RETRY_DELAY from the same
+    previous status, and a reservation past its end stays tracked until
+    its final status is written. One whose status was changed by someone
+    else is re-read and rescheduled from the table. Rescheduling a
+    reservation (create / PUT) bumps its generation, which invalidates its
+    older heap entries.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time, writer=None, publisher=None, repository=None):
+        self.clock = clock
+        self._writer = writer or self._write_dynamodb
+        self._publisher = publisher or self._publish_live
+        self._repository = repository
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, str, int, str]] = []  # (due, seq, reservation_id, generation, kind)
+        self._seq = itertools.count()
+        self._generations = itertools.count()  # unique per schedule(), so re-created ids never match old entries
+        self._tracked: Dict[str, _Tracked] = {}
+        self._by_spot: Dict[str, Set[str]] = {}  # spot -> reservations inside their window
+        self._occupied: Set[str] = set()
+        self._changes: Dict[str, Tuple[str, str, _Tracked]] = {}  # reservation_id -> (previous, new, tracked) not written yet
+        self._retry_at = 0.0  # clock time before which failed changes aren't written again
+        self._loaded_day = None
+        self._thread = None
+        self._running = False
+        self._stats = {"scheduled": 0, "transitions": 0, "writes": 0, "write_failures": 0, "lag_max": 0.0}
+        self._stats.update({status: 0 for status in (ACTIVE, COMPLETED, NO_SHOW)})
+
+    @property
+    def repository(self):
+        return self._repository or get_reservation_repository()
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="status-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                timeout = ENGINE_MAX_SLEEP
+                if self._heap:
+                    timeout = min(timeout, max(0.0, self._heap[0][0] - self.clock()))
+                if self._changes:
+                    timeout = min(timeout, max(0.0, self._retry_at - self.clock()))
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+            try:
+                self.load_day(date.fromtimestamp(self.clock()).isoformat())
+                self.advance()
+            except Exception as e:
+                logger.error(f"Status engine pass failed: {e}")
+                time.sleep(1)
+
+    def load_day(self, day: str):
+        """Track every reservation of `day` (once per day; called at start and at midnight)."""
+        if self._loaded_day == day:
+            return
+        for reservation in self.repository.by_date(day):
+            self.schedule(reservation)
+        self._loaded_day = day
+
+    # --- Tracking ---
+
+    def schedule(self, reservation: Dict):
+        """Track a new or updated reservation; final statuses stop tracking it."""
+        reservation_id = reservation["reservation_id"]
+        status = reservation.get("status") or PENDING
+        window = reservation_window(reservation)
+        with self._cond:
+            previous = self._tracked.get(reservation_id)
+            if previous:
+                self._untrack(reservation_id)
+            if status in FINAL_STATUSES or window is None:
+                return
+            # An already active reservation (e.g. after a restart) is never turned into a no-show blindly
+            arrived = previous.arrived if previous else status == ACTIVE
+            tracked = _Tracked(dict(reservation), status, arrived, next(self._generations))
+            self._tracked[reservation_id] = tracked
+            start, end = window
+            for due, kind in ((start, "start"), (start + NO_SHOW_GRACE, "grace"), (end, "end")):
+                heapq.heappush(self._heap, (due, next(self._seq), reservation_id, tracked.generation, kind))
+            self._stats["scheduled"] += 1
+            self._cond.notify()
+
+    def unschedule(self, reservation_id: str):
+        with self._cond:
+            self._untrack(reservation_id)
+
+    def _untrack(self, reservation_id: str):
+        # Heap entries are left behind and skipped when popped (generation check)
+        tracked = self._tracked.pop(reservation_id, None)
+        if tracked:
+            self._by_spot.get(str(tracked.reservation.get("parking_spot_id")), set()).discard(reservation_id)
+            self._changes.pop(reservation_id, None)
+
+    # --- Arrivals ---
+
+    def mark_arrived(self, reservation_id: str):
+        """The reservation's car was seen (e.g. camera plate match)."""
+        with self._cond:
+            tracked = self._tracked.get(reservation_id)
+            if tracked is None or tracked.ended:
+                return
+            tracked.arrived = True
+            if self._status(reservation_id, tracked) == NO_SHOW:
+                # Late arrival inside the window
+                self._change(reservation_id, tracked, ACTIVE)
+                self._cond.notify()
+
+    def on_occupancy(self, spots: List[Dict], summary: Dict):
+        """Occupancy table listener: an occupied spot counts as an arrival for its active reservations."""
+        with self._cond:
+            for spot in spots:
+                spot_id = str(spot["spot_id"])
+                if not spot["occupied"]:
+                    self._occupied.discard(spot_id)
+                    continue
+                self._occupied.add(spot_id)
+                for reservation_id in self._by_spot.get(spot_id, ()):
+                    tracked = self._tracked[reservation_id]
+                    tracked.arrived = True
+                    if self._status(reservation_id, tracked) == NO_SHOW:
+                        self._change(reservation_id, tracked, ACTIVE)
+            if self._changes:
+                self._cond.notify()
+
+    # --- Transitions ---
+
+    def _status(self, reservation_id: str, tracked: _Tracked) -> str:
+        """Status the reservation has once its queued change (if any) is written."""
+        change = self._changes.get(reservation_id)
+        return change[1] if change else tracked.status
+
+    def _change(self, reservation_id: str, tracked: _Tracked, status: str):
+        # Coalesce: one write per reservation, from the status it has in the table. A change
+        # back to that status is kept until the next flush, in case a write is in flight.
+        self._changes[reservation_id] = (tracked.status, status, tracked)
+
+    def _settle(self, reservation_id: str, tracked: _Tracked):
+        """Stop tracking an ended reservation once nothing is left to write for it."""
+        change = self._changes.get(reservation_id)
+        if tracked.ended and self._tracked.get(reservation_id) is tracked and (change is None or change[0] == change[1]):
+            self._changes.pop(reservation_id, None)
+            del self._tracked[reservation_id]
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Apply every transition due at `now` (default: the clock) and flush them; returns how many were written."""
+        now = self.clock() if now is None else now
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due, _, reservation_id, generation, kind = heapq.heappop(self._heap)
+                tracked = self._tracked.get(reservation_id)
+                if tracked is None or tracked.generation != generation:
+                    continue
+                self._stats["lag_max"] = max(self._stats["lag_max"], now - due)
+                spot_id = str(tracked.reservation.get("parking_spot_id"))
+                status = self._status(reservation_id, tracked)
+
+                if kind == "start":
+                    self._by_spot.setdefault(spot_id, set()).add(reservation_id)
+                    if spot_id in self._occupied:
+                        tracked.arrived = True
+                    if status == PENDING:
+                        self._change(reservation_id, tracked, ACTIVE)
+                elif kind == "grace":
+                    if status == ACTIVE and not tracked.arrived:
+                        self._change(reservation_id, tracked, NO_SHOW)
+                else:
+                    if status in (PENDING, ACTIVE):
+                        self._change(reservation_id, tracked, COMPLETED if tracked.arrived else NO_SHOW)
+                    self._by_spot.get(spot_id, set()).discard(reservation_id)
+                    tracked.ended = True
+                    self._settle(reservation_id, tracked)
+
+            changes = []
+            for reservation_id, change in list(self._changes.items()):
+                if change[0] != change[1]:
+                    changes.append(change)
+                elif change[2].ended:
+                    self._settle(reservation_id, change[2])
+                else:
+                    del self._changes[reservation_id]
+        return self._flush(changes)
+
+    def _flush(self, changes: List[Tuple[str, str, _Tracked]]) -> int:
+        written, stale = 0, []
+        for i in range(0, len(changes), STATUS_BATCH_SIZE):
+            batch = changes[i:i + STATUS_BATCH_SIZE]
+            try:
+                applied = self._writer(batch)
+            except Exception as e:
+                # Left queued: the next pass after STATUS_RETRY_DELAY writes them again
+                with self._cond:
+                    self._stats["write_failures"] += len(batch)
+                    self._retry_at = self.clock() + STATUS_RETRY_DELAY
+                logger.error(f"Writing {len(batch)} status changes failed, will retry: {e}")
+                continue
+            applied_ids = {id(change) for change in applied}
+            with self._cond:
+                self._stats["writes"] += 1
+                self._stats["write_failures"] += len(batch) - len(applied)
+                self._stats["transitions"] += len(applied)
+                for change in batch:
+                    previous, status, tracked = change
+                    reservation_id = tracked.reservation["reservation_id"]
+                    queued = self._changes.get(reservation_id)
+                    if id(change) not in applied_ids:
+                        # Someone else changed or deleted it: the table wins
+                        if queued is change:
+                            del self._changes[reservation_id]
+                        stale.append((reservation_id, tracked))
+                        continue
+                    self._stats[status] += 1
+                    tracked.status = status
+                    tracked.reservation["status"] = status
+                    if queued is change:
+                        del self._changes[reservation_id]
+                    elif queued is not None and queued[2] is tracked:
+                        # Changed again while this write was in flight
+                        self._changes[reservation_id] = (status, queued[1], tracked)
+                    self._settle(reservation_id, tracked)
+            for previous, status, tracked in applied:
+                self._publisher(previous, status, dict(tracked.reservation))
+            written += len(applied)
+        if stale:
+            self._resync(stale)
+        return written
+
+    def _resync(self, stale: List[Tuple[str, _Tracked]]):
+        """Re-read reservations whose conditional write failed and track them as the table has them."""
+        try:
+            items = self.repository.get_many([reservation_id for reservation_id, _ in stale])
+        except Exception as e:
+            # Their next change conflicts again and retries this
+            logger.error(f"Re-reading {len(stale)} reservations failed: {e}")
+            return
+        for reservation_id, tracked in stale:
+            with self._cond:
+                if self._tracked.get(reservation_id) is not tracked:
+                    continue  # rescheduled or removed meanwhile
+                if reservation_id not in items:
+                    self._untrack(reservation_id)
+                    continue
+            self.schedule(items[reservation_id])
+
+    def _write_dynamodb(self, batch: List[Tuple[str, str, _Tracked]]) -> List[Tuple[str, str, _Tracked]]:
+        """Conditional status updates in one transaction; drops items a client changed meanwhile (blocking)."""
+        client = get_table(RESERVATIONS_TABLE).meta.client
+        pending = list(batch)
+        for _ in range(STATUS_WRITE_ATTEMPTS):
+            items = [
+                {
+                    "Update": {
+                        "TableName": RESERVATIONS_TABLE,
+                        "Key": {"reservation_id": tracked.reservation["reservation_id"]},
+                        "UpdateExpression": "SET #st = :new",
+                        "ConditionExpression": "#st = :previous",
+                        "ExpressionAttributeNames": {"#st": "status"},
+                        "ExpressionAttributeValues": {":new": status, ":previous": previous},
+                    }
+                }
+                for previous, status, tracked in pending
+            ]
+            try:
+                client.transact_write_items(TransactItems=items)
+                return pending
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "TransactionCanceledException":
+                    raise
+                reasons = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+                # Changed by a client or deleted: their value wins; retry the rest
+                pending = [change for change, code in zip(pending, reasons) if code != "ConditionalCheckFailed"]
+                if not pending:
+                    return []
+        raise RuntimeError("Status transaction kept conflicting")
+
+    @staticmethod
+    def _publish_live(previous: str, status: str, reservation: Dict):
+        active_reservation_index.upsert(reservation)
+        live_broadcast.publish("status", {
+            "parking_spot_id": reservation.get("parking_spot_id"),
+            "date": reservation.get("date"),
+            "hour_range": reservation.get("hour_range"),
+            "previous": previous,
+            "status": status,
+        })
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["tracked"] = len(self._tracked)
+            stats["pending_writes"] = len(self._changes)
+            stats["heap"] = len(self._heap)
+            stats["next_due"] = datetime.fromtimestamp(self._heap[0][0]).isoformat() if self._heap else None
+        return stats
+
+
+status_engine = StatusEngine()
+
+
+def simulate(count: int = 100_000, spots: int = 400, arrival_rate: float = 0.85, step: float = 60.0, seed: int = 1) -> Dict:
+    """
+    Drive `count` synthetic reservations through one day on a simulated
+    clock, with in-memory writes, and check every one ends completed or no-show.
+
+    Every written transition is also checked against when it was due: the
+    activation at the start, the no-show at the grace deadline and the final
+    status at the end must each be written within one `step` of it, and the
+    final status must match the arrival (none lost). Returns the counts.
+    """
+    import math
+    import random
+    rng = random.Random(seed)
+    day = date(2030, 1, 7)
+    midnight = datetime.combine(day, datetime.min.time()).timestamp()
+    now = [midnight]
+    table = {}
+    history = {}  # reservation_id -> [(status, clock time written)]
+
+    def writer(batch):
+        for previous, status, tracked in batch:
+            table[tracked.reservation["reservation_id"]] = status
+            history.setdefault(tracked.reservation["reservation_id"], []).append((status, now[0]))
+        return batch
+
+    def tick(t):
+        # First simulated clock time at or after t: when an event at t is handled
+        return midnight + math.ceil((t - midnight) / step) * step
+
+    engine = StatusEngine(clock=lambda: now[0], writer=writer, publisher=lambda *args: None)
+    windows = {}  # reservation_id -> (start, end, arrival or None)
+    arrivals = []
+    started = time.perf_counter()
+    for i in range(count):
+        start = rng.randrange(6 * 60, 20 * 60)
+        end = min(start + rng.randrange(30, 240), 24 * 60 - 1)
+        reservation = {
+            "reservation_id": f"sim-{i}",
+            "parking_spot_id": 1 + i % spots,
+            "date": day.isoformat(),
+            "hour_range": [f"{start // 60:02d}:{start % 60:02d}:00", f"{end // 60:02d}:{end % 60:02d}:00"],
+            "status": PENDING,
+        }
+        table[reservation["reservation_id"]] = PENDING
+        engine.schedule(reservation)
+        arrival = None
+        if rng.random() < arrival_rate:
+            # Mostly on time, some after the grace period
+            arrival = midnight + start * 60 + rng.expovariate(1 / 600)
+            arrivals.append((arrival, reservation["reservation_id"]))
+        windows[reservation["reservation_id"]] = (midnight + start * 60, midnight + end * 60, arrival)
+    arrivals.sort()
+    scheduled = time.perf_counter()
+
+    next_arrival = 0
+    while now[0] < midnight + 24 * 3600:
+        now[0] += step
+        while next_arrival < len(arrivals) and arrivals[next_arrival][0] <= now[0]:
+            engine.mark_arrived(arrivals[next_arrival][1])
+            next_arrival += 1
+        engine.advance()
+    finished = time.perf_counter()
+
+    late, lost = 0, 0
+    for reservation_id, (start, end, arrival) in windows.items():
+        written = history.get(reservation_id, [])
+        # An arrival counts if it is handled no later than the end
+        expected = COMPLETED if arrival is not None and tick(arrival) <= tick(end) else NO_SHOW
+        if not written or written[-1][0] != expected or table[reservation_id] != expected:
+            lost += 1
+            continue
+        due = [(ACTIVE, start, written[0])]
+        if expected == COMPLETED:
+            due.append((COMPLETED, end, written[-1]))
+        else:
+            due.append((NO_SHOW, min(start + NO_SHOW_GRACE, end), written[-1]))
+        late += sum(1 for status, at, (applied, applied_at) in due
+                    if applied != status or not at <= applied_at < at + step)
+
+    final = {}
+    for status in table.values():
+        final[status] = final.get(status, 0) + 1
+    metrics = engine.metrics()
+    print(f"{count} reservations: scheduled in {scheduled - started:.2f}s, day simulated in {finished - scheduled:.2f}s")
+    print(f"final statuses: {final}")
+    print(f"transitions: {metrics['transitions']} in {metrics['writes']} batched writes, max lag {metrics['lag_max']:.0f}s, "
+          f"late {late}, lost {lost}")
+    assert set(final) <= {COMPLETED, NO_SHOW}, "reservations left unfinished"
+    assert metrics["tracked"] == 0
+    return {**metrics, "final": final, "late": late, "lost": lost,
+            "written": sum(len(statuses) for statuses in history.values())}
+
+
+if __name__ == "__main__":
+    # python -m src.imports.status_engine [count]: simulated-clock run of one day
+    import sys
+    simulate(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -1,10 +1,26 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from datetime import date
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.staticfiles import StaticFiles
+
+from src.imports.active_reservation_index import active_reservation_index
+from src.imports.dynamodb_helper import run_io, shutdown_io, user_cache
+from src.imports.alert_dispatcher import alert_dispatcher
+from src.imports.occupancy_subscriber import occupancy_subscriber, occupancy_table
+from src.imports.live_broadcast import live_broadcast
+from src.imports.plate_index import plate_index
+from src.imports.auth import require_admin, token_cache
+from src.imports.passwords import shutdown_passwords
+from src.imports.reservation_archive import reservation_archive
+from src.imports.status_engine import status_engine
 
 from src.routers.register_router import register_router, login_router
 from src.routers.car_plate_router import car_plate_router
 from src.routers.reservation_router import reservation_router
 from src.routers.profile_router import profile_router
 from src.routers.private_park_router import private_parking_router
+from src.routers.occupancy_router import occupancy_router
+from src.routers.live_router import live_router
 
 app = FastAPI()
 
@@ -15,12 +31,96 @@ app.include_router(reservation_router)
 app.include_router(car_plate_router)
 app.include_router(profile_router)
 app.include_router(private_parking_router)
+app.include_router(occupancy_router)
+app.include_router(live_router)
+
+# Serve stored captures and their thumbnails
+app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+
+
+@app.on_event("startup")
+async def warm_reservation_index():
+    # Load today's reservations so the first camera event doesn't hit DynamoDB
+    await run_io(active_reservation_index.warm, date.today().isoformat())
+
+
+@app.on_event("startup")
+async def warm_plate_index():
+    # Plate -> owner lookups for camera uploads are served from memory
+    await run_io(plate_index.warm)
+
+
+@app.on_event("startup")
+def start_alert_dispatcher():
+    alert_dispatcher.start()
+
+
+@app.on_event("startup")
+async def start_live_broadcast():
+    # Occupancy changes go out on the live feed; new clients get the full table first
+    live_broadcast.bind(asyncio.get_running_loop())
+    live_broadcast.add_snapshot("occupancy", occupancy_table.snapshot)
+    occupancy_table.add_listener(
+        lambda spots, summary: live_broadcast.publish("availability", {**summary, "spots": spots})
+    )
+
+
+@app.on_event("startup")
+def start_status_engine():
+    # Promotes reservations at their start/end; an occupied spot counts as an arrival
+    occupancy_table.add_listener(status_engine.on_occupancy)
+    status_engine.start()
+
+
+@app.on_event("startup")
+def start_occupancy_subscriber():
+    occupancy_subscriber.start()
+
+
+@app.on_event("startup")
+def start_reservation_archive():
+    # Moves finished reservations from DynamoDB to the Parquet archive
+    reservation_archive.start()
+
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    reservation_archive.stop()
+    status_engine.stop()
+    occupancy_subscriber.stop()
+    alert_dispatcher.stop()
+    shutdown_passwords()
+    shutdown_io()
 
 
 @app.get("/")
 def read_root():
     return {"message": "Parking System API is running"}
 
+
+@app.get("/cache/users/metrics", dependencies=[Depends(require_admin)])
+def get_user_cache_metrics():
+    """Hit/miss counts of the Users read-through cache."""
+    return user_cache.metrics()
+
+
+@app.get("/cache/tokens/metrics", dependencies=[Depends(require_admin)])
+def get_token_cache_metrics():
+    """Hit/miss counts of the verified-token cache."""
+    return token_cache.metrics()
+
+
+@app.get("/reservations-engine/metrics", dependencies=[Depends(require_admin)])
+def get_status_engine_metrics():
+    """Tracked reservations, transitions by status and batched writes of the status engine."""
+    return status_engine.metrics()
+
+
+@app.get("/archive/reservations/metrics", dependencies=[Depends(require_admin)])
+def get_reservation_archive_metrics():
+    """Compaction runs, archived count and the last archived day."""
+    return reservation_archive.metrics()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -4,6 +4,7 @@ from typing import Optional
 class PrivateParking(BaseModel):
     plate_detected: Optional[str]
     image_url: Optional[str]
+    thumbnail_url: Optional[str] = None
     success: bool
     plate_matches: Optional[bool] = None
     alert_sent: Optional[bool] = None
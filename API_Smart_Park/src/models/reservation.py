@@ -16,3 +16,40 @@ class Reservation(BaseModel):
             # Convert strings to time objects if needed
             return [time.fromisoformat(t) if isinstance(t, str) else t for t in v]
         raise ValueError('hour_range must be a list of two times')
+
+    @validator('hour_range')
+    def start_before_end(cls, v):
+        if len(v) != 2 or v[0] >= v[1]:
+            raise ValueError('hour_range must be a start and a later end')
+        return v
+
+    @validator('date')
+    def not_in_the_past(cls, v):
+        # Past days may already be archived, and compaction never goes back to them
+        if v < date.today():
+            raise ValueError('date must not be in the past')
+        return v
+
+
+# Most reservations accepted by one bulk call
+BULK_MAX = 200
+
+
+class ReservationBulk(BaseModel):
+    reservations: List[Reservation]
+
+    @validator('reservations')
+    def check_size(cls, v):
+        if not 1 <= len(v) <= BULK_MAX:
+            raise ValueError(f'reservations must hold 1 to {BULK_MAX} items')
+        return v
+
+
+class ReservationIds(BaseModel):
+    reservation_ids: List[str]
+
+    @validator('reservation_ids')
+    def check_size(cls, v):
+        if not 1 <= len(v) <= BULK_MAX:
+            raise ValueError(f'reservation_ids must hold 1 to {BULK_MAX} items')
+        return v
@@ -1,87 +1,118 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Body
-from src.imports.dynamodb_helper import get_table
+from fastapi import FastAPI, APIRouter, HTTPException, Body, Depends, Request
+from botocore.exceptions import ClientError
+from src.imports.dynamodb_helper import get_table, get_user, user_cache, run_io, deserialize_item
+from src.imports.plate_index import plate_index
+from src.imports.auth import require_user, check_owner
 
 app = FastAPI()
 
-car_plate_router = APIRouter(prefix="/car-plates", tags=["Car Plates"])
+car_plate_router = APIRouter(prefix="/car-plates", tags=["Car Plates"], dependencies=[Depends(require_user)])
+
+PLATE_UPDATE_ATTEMPTS = 5  # conditional removes tried before giving up on a busy list
 
 
 @car_plate_router.post("/{email}")
-async def add_car_plate(email: str, new_plate: str = Body(..., embed=True)):
+async def add_car_plate(request: Request, email: str, new_plate: str = Body(..., embed=True)):
     """
     Add a new car plate to the user's car_plate_ids list.
+
+    One conditional update: the plate is appended only if the user exists
+    and doesn't have it yet, so concurrent adds can't overwrite each other.
     """
+    check_owner(request, email)
     table = get_table("Users")
 
     try:
-        result = table.get_item(Key={"email": email})
-        user = result.get("Item")
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        current_plates = user.get("car_plate_ids", [])
-
-        if new_plate in current_plates:
-            raise HTTPException(status_code=400, detail="Car plate already exists")
-
-        current_plates.append(new_plate)
-
-        table.update_item(
+        response = await run_io(
+            table.update_item,
             Key={"email": email},
-            UpdateExpression="SET car_plate_ids = :plates",
-            ExpressionAttributeValues={":plates": current_plates}
+            UpdateExpression="SET car_plate_ids = list_append(if_not_exists(car_plate_ids, :empty), :new)",
+            ConditionExpression="attribute_exists(email) AND NOT contains(car_plate_ids, :plate)",
+            ExpressionAttributeValues={":empty": [], ":new": [new_plate], ":plate": new_plate},
+            ReturnValues="UPDATED_NEW",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD"
         )
+        user_cache.invalidate(email)
+        await run_io(plate_index.add, email, new_plate)
 
-        return {"message": "Car plate added successfully", "car_plate_ids": current_plates}
+        return {"message": "Car plate added successfully", "car_plate_ids": response["Attributes"]["car_plate_ids"]}
 
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            if not e.response.get("Item"):
+                raise HTTPException(status_code=404, detail="User not found")
+            raise HTTPException(status_code=400, detail="Car plate already exists")
+        raise HTTPException(status_code=500, detail=f"Failed to add car plate: {e.response['Error']['Message']}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add car plate: {str(e)}")
 
 
 @car_plate_router.delete("/{email}/{plate_id}")
-async def delete_car_plate(email: str, plate_id: str):
+async def delete_car_plate(request: Request, email: str, plate_id: str):
     """
     Delete a car plate from the user's car_plate_ids list.
+
+    Lists can only be edited by index, so the plate is removed at the index
+    seen in the (cached) user record, on condition that the plate is still
+    there. If the list changed in between, the failed update returns the
+    current list and the removal is retried at the new index.
     """
+    check_owner(request, email)
     table = get_table("Users")
 
     try:
-        result = table.get_item(Key={"email": email})
-        user = result.get("Item")
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        plates = user.get("car_plate_ids", [])
-
-        if plate_id not in plates:
-            raise HTTPException(status_code=404, detail="Car plate not found")
-
-        plates.remove(plate_id)
-
-        table.update_item(
-            Key={"email": email},
-            UpdateExpression="SET car_plate_ids = :plates",
-            ExpressionAttributeValues={":plates": plates}
-        )
-
-        return {"message": "Car plate removed successfully", "car_plate_ids": plates}
-
+        user = await get_user(email)
+
+        for _ in range(PLATE_UPDATE_ATTEMPTS):
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+
+            plates = user.get("car_plate_ids", [])
+            if plate_id not in plates:
+                raise HTTPException(status_code=404, detail="Car plate not found")
+            index = plates.index(plate_id)
+
+            try:
+                response = await run_io(
+                    table.update_item,
+                    Key={"email": email},
+                    UpdateExpression=f"REMOVE car_plate_ids[{index}]",
+                    ConditionExpression=f"car_plate_ids[{index}] = :plate",
+                    ExpressionAttributeValues={":plate": plate_id},
+                    ReturnValues="UPDATED_NEW",
+                    ReturnValuesOnConditionCheckFailure="ALL_OLD"
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                # Stale index: retry against the list as it is now
+                user_cache.invalidate(email)
+                user = deserialize_item(e.response.get("Item"))
+                continue
+
+            user_cache.invalidate(email)
+            plates = response.get("Attributes", {}).get("car_plate_ids", [])
+            await run_io(plate_index.remove, email, plate_id, plates)
+            return {"message": "Car plate removed successfully", "car_plate_ids": plates}
+
+        raise HTTPException(status_code=409, detail="Car plates changed concurrently, try again")
+
+    except HTTPException:
+        raise
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to remove car plate: {e.response['Error']['Message']}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to remove car plate: {str(e)}")
 
 
 @car_plate_router.get("/{email}")
-async def get_car_plates(email: str):
+async def get_car_plates(request: Request, email: str):
     """
     Get all car plates associated with the user.
     """
-    table = get_table("Users")
-
+    check_owner(request, email)
     try:
-        result = table.get_item(Key={"email": email})
-        user = result.get("Item")
+        user = await get_user(email)
 
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -0,0 +1,62 @@
+import asyncio
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from src.imports.live_broadcast import (
+    live_broadcast, Overflow, OVERFLOW_RESYNC, OVERFLOW_POLICIES, LIVE_SEND_TIMEOUT,
+)
+
+live_router = APIRouter(prefix="/live", tags=["Live"])
+
+POLICY_PATTERN = "^(" + "|".join(OVERFLOW_POLICIES) + ")$"
+
+
+@live_router.websocket("/ws")
+async def live_websocket(websocket: WebSocket, on_overflow: str = Query(default=OVERFLOW_RESYNC, pattern=POLICY_PATTERN)):
+    """
+    Live spot availability and reservation status.
+
+    Every frame is a JSON array of events ({"type", "ts", "data"}); the
+    first one holds a snapshot. Clients that cannot keep up are resynced
+    with a new snapshot or, with on_overflow=disconnect, closed.
+    """
+    await websocket.accept()
+    try:
+        async for frame in live_broadcast.stream(on_overflow):
+            text = "[" + ",".join(frame) + "]" if frame is not None else '[{"type":"ping"}]'
+            try:
+                await asyncio.wait_for(websocket.send_text(text), LIVE_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                live_broadcast.slow_send()
+                await websocket.close(code=1013, reason="Client too slow")
+                return
+    except Overflow:
+        await websocket.close(code=1013, reason="Client fell behind")
+    except WebSocketDisconnect:
+        pass
+
+
+@live_router.get("/events")
+async def live_events(on_overflow: str = Query(default=OVERFLOW_RESYNC, pattern=POLICY_PATTERN)):
+    """Same feed as /live/ws as Server-Sent Events (one event per line of data)."""
+
+    async def event_stream():
+        try:
+            async for frame in live_broadcast.stream(on_overflow):
+                if frame is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield "".join(f"data: {event}\n\n" for event in frame)
+        except Overflow:
+            yield "event: overflow\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@live_router.get("/metrics")
+async def get_live_metrics():
+    """Connected clients, resyncs/disconnects of lagging clients and buffer state."""
+    return live_broadcast.metrics()
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from src.imports.occupancy_subscriber import occupancy_table
+
+occupancy_router = APIRouter(prefix="/occupancy", tags=["Occupancy"])
+
+
+@occupancy_router.get("/")
+async def get_occupancy():
+    """Live occupancy of every spot, served from memory (fed by the Pi 4 over MQTT)."""
+    return occupancy_table.snapshot()
+
+
+@occupancy_router.get("/metrics")
+async def get_occupancy_metrics():
+    """Message counts, sequence gaps and publish-to-apply lag of the occupancy stream."""
+    return occupancy_table.metrics()
+
+
+@occupancy_router.get("/{spot_id}")
+async def get_spot_occupancy(spot_id: str):
+    spot = occupancy_table.get(spot_id)
+    if spot is None:
+        raise HTTPException(status_code=404, detail=f"No occupancy data for spot {spot_id}")
+    return spot
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Depends, Request
 from typing import Optional, List
 from pydantic import BaseModel, EmailStr
-from src.imports.dynamodb_helper import get_table
+from src.imports.dynamodb_helper import get_table, get_user, user_cache, run_io
+from src.imports.plate_index import plate_index
+from src.imports.auth import require_user, check_owner
 
-profile_router = APIRouter(prefix="/profile", tags=["Profile"])
+profile_router = APIRouter(prefix="/profile", tags=["Profile"], dependencies=[Depends(require_user)])
 
 class UserUpdateProfile(BaseModel):
     email: EmailStr
@@ -12,12 +14,12 @@ class UserUpdateProfile(BaseModel):
     car_plate_ids: Optional[List[str]]
 
 @profile_router.put("/update/")
-async def update_profile(profile: UserUpdateProfile):
+async def update_profile(request: Request, profile: UserUpdateProfile):
+    check_owner(request, profile.email)
     table = get_table("Users")
 
     try:
-        result = table.get_item(Key={"email": profile.email})
-        user = result.get("Item")
+        user = await get_user(profile.email)
 
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -39,12 +41,19 @@ async def update_profile(profile: UserUpdateProfile):
 
         update_expr = "SET " + ", ".join(update_expr_parts)
 
-        table.update_item(
+        response = await run_io(
+            table.update_item,
             Key={"email": profile.email},
             UpdateExpression=update_expr,
             ExpressionAttributeNames=expr_attr_names,
-            ExpressionAttributeValues=expr_attr_vals
+            ExpressionAttributeValues=expr_attr_vals,
+            ReturnValues="UPDATED_OLD"
         )
+        user_cache.invalidate(profile.email)
+
+        if "car_plate_ids" in data:
+            old_plates = response.get("Attributes", {}).get("car_plate_ids", [])
+            await run_io(plate_index.replace, profile.email, old_plates, data["car_plate_ids"])
 
         return {"message": "Profile updated successfully"}
 
@@ -1,62 +1,81 @@
-from datetime import datetime, timedelta
+import logging
 from fastapi import APIRouter, HTTPException
 from boto3.dynamodb.conditions import Key
-from src.imports.dynamodb_helper import get_table, hash_password
+from botocore.exceptions import ClientError
+from src.imports.dynamodb_helper import get_table, get_user, user_cache, run_io
+from src.imports.passwords import hash_password_async, verify_password_async, PasswordPoolBusy
+from src.imports.plate_index import plate_index
+from src.imports.auth import create_access_token, PRIVILEGED_ROLES
 from src.models.user import UserRegistration, UserLogin
-import jwt
 
 register_router = APIRouter(prefix="/register", tags=["Register"])
 login_router = APIRouter(prefix="/login", tags=["Login"])
 
-# Secret key & algorithm
-SECRET_KEY = 'td_WKP0BViNq3n4t-z9kmEcOexJOhGZfDWseUnO0rPY'
-ALGORITHM = 'HS256'
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+logger = logging.getLogger(__name__)
+
+USERS_TABLE = "Users"
+MAX_TRANSACTION_ITEMS = 100  # DynamoDB limit per TransactWriteItems call
 
 
 @register_router.post("/")
 async def register_user(user_data: UserRegistration):
-    table = get_table("Users")
-    encrypted_password = hash_password(user_data.password)
+    if user_data.role in PRIVILEGED_ROLES:
+        # Admin and device tokens are issued by the operators, never through sign-up
+        raise HTTPException(status_code=403, detail=f"Role '{user_data.role}' can't be self-assigned")
+    # The user and its plate index entries are written together: no account without its plates
+    plate_items = plate_index.transact_items(user_data.email, [], user_data.car_plate_ids)
+    if len(plate_items) >= MAX_TRANSACTION_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TRANSACTION_ITEMS - 1} car plates can be registered")
+    table = get_table(USERS_TABLE)
+    try:
+        # scrypt runs on the password pool, not the event loop
+        encrypted_password = await hash_password_async(user_data.password)
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+
+    user = {
+        "email": user_data.email,    # email as primary key here
+        "name": user_data.name,
+        "phone": user_data.phone,
+        "car_plate_ids": user_data.car_plate_ids,
+        "role": user_data.role,
+        "password_hash": encrypted_password
+    }
+    items = [{"Put": {"TableName": USERS_TABLE, "Item": user,
+                      "ConditionExpression": "attribute_not_exists(email)"}}]  # ensure email is unique
 
     try:
-        table.put_item(
-            Item={
-                "email": user_data.email,    # email as primary key here
-                "name": user_data.name,
-                "phone": user_data.phone,
-                "car_plate_ids": user_data.car_plate_ids,
-                "role": user_data.role,
-                "password_hash": encrypted_password
-            },
-            ConditionExpression="attribute_not_exists(email)"  # ensure email is unique
-        )
-        return {"email": user_data.email, "message": "User registered successfully"}
+        await run_io(table.meta.client.transact_write_items, TransactItems=items + plate_items)
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        reasons = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+        if code == "TransactionCanceledException" and reasons and reasons[0] == "ConditionalCheckFailed":
+            raise HTTPException(status_code=400, detail="User already exists")
+        if code == "ValidationException":
+            raise HTTPException(status_code=400, detail=f"Invalid input: {e.response['Error'].get('Message', '')}")
+        logger.error(f"Registration of {user_data.email} failed: {e}")
+        raise HTTPException(status_code=503, detail="Registration failed, please retry")
 
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"User already exists or invalid input: {str(e)}")
+    user_cache.invalidate(user_data.email)
+    plate_index.committed(user_data.email, [], user_data.car_plate_ids)
+    return {"email": user_data.email, "message": "User registered successfully"}
 
 
 @login_router.post("/")
 async def login_user(user_data: UserLogin):
-    table = get_table("Users")
-
-    encrypted_password = hash_password(user_data.password)
-
     try:
-        response = table.get_item(Key={"email": user_data.email})  # get by email
-        user = response.get("Item")
+        user = await get_user(user_data.email)  # get by email (cached)
+        stored_hash = user.get("password_hash") if user else None
 
-        if not user or user.get('password_hash') != encrypted_password:
+        matches, needs_rehash = await verify_password_async(user_data.password, stored_hash)
+        if not matches:
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
-        expiration = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        payload = {
-            "sub": user["email"],
-            "exp": expiration,
-            "role": user.get("role")
-        }
-        token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+        if needs_rehash:
+            # Legacy SHA-256 (or outdated scrypt parameters): upgrade while we have the password
+            await upgrade_password_hash(user["email"], stored_hash, user_data.password)
+
+        token = create_access_token(user["email"], user.get("role"))
 
         return {
             "access_token": token,
@@ -70,5 +89,26 @@ async def login_user(user_data: UserLogin):
             }
         }
 
+    except HTTPException:
+        raise
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Login failed: {str(e)}")
+
+
+async def upgrade_password_hash(email: str, old_hash: str, password: str):
+    """Replace a user's stored hash, unless it changed since it was read."""
+    try:
+        new_hash = await hash_password_async(password)
+        await run_io(
+            get_table("Users").update_item,
+            Key={"email": email},
+            UpdateExpression="SET password_hash = :new",
+            ConditionExpression="password_hash = :old",
+            ExpressionAttributeValues={":new": new_hash, ":old": old_hash}
+        )
+        user_cache.invalidate(email)
+    except (ClientError, PasswordPoolBusy) as e:
+        # The login itself succeeded; the upgrade is retried on the next one
+        logger.warning(f"Password hash upgrade for {email} skipped: {e}")
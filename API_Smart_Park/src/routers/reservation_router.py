@@ -1,13 +1,20 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
 from pydantic import EmailStr
 from typing import Optional
 from datetime import date, time, datetime
-from boto3.dynamodb.conditions import Attr
 from botocore.exceptions import ClientError
-from src.imports.dynamodb_helper import get_table
-from src.models.reservation import Reservation
+from src.imports.dynamodb_helper import get_table, run_io
+from src.imports.reservation_repository import get_reservation_repository, spot_date_key, expires_at
+from src.imports.active_reservation_index import active_reservation_index
+from src.imports.live_broadcast import live_broadcast
+from src.imports.pagination import encode_cursor, decode_cursor, InvalidCursor, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from src.imports.reservation_archive import reservation_archive
+from src.imports.status_engine import status_engine, CANCELLED
+from src.imports.spot_availability import spot_availability, SpotConflict, ReservationExists, UnknownSpot
+from src.imports.auth import require_user, check_owner, is_owner, ADMIN_ROLE
+from src.models.reservation import Reservation, ReservationBulk, ReservationIds
 
-reservation_router = APIRouter(prefix="/reservations", tags=["Reservations"])
+reservation_router = APIRouter(prefix="/reservations", tags=["Reservations"], dependencies=[Depends(require_user)])
 
 def time_str_to_obj(t: str) -> time:
     return datetime.strptime(t, "%H:%M:%S").time()
@@ -15,17 +22,42 @@ def time_str_to_obj(t: str) -> time:
 def ranges_overlap(start1: time, end1: time, start2: time, end2: time) -> bool:
     return max(start1, start2) < min(end1, end2)
 
-@reservation_router.post("/", status_code=201)
-async def create_reservation(reservation: Reservation):
-    table = get_table("Reservations")
+def publish_reservation_event(action: str, item: dict):
+    # Live clients only get what affects availability, not who reserved
+    live_broadcast.publish("reservation", {
+        "action": action,
+        "parking_spot_id": item.get("parking_spot_id"),
+        "date": item.get("date"),
+        "hour_range": item.get("hour_range"),
+        "status": item.get("status"),
+    })
 
-    reservation_id = f"{reservation.email}#{reservation.date}#{reservation.parking_spot_id}#{reservation.hour_range[0].isoformat()}-{reservation.hour_range[1].isoformat()}"
+def reservation_key(reservation: Reservation) -> str:
+    return f"{reservation.email}#{reservation.date}#{reservation.parking_spot_id}#{reservation.hour_range[0].isoformat()}-{reservation.hour_range[1].isoformat()}"
+
+def reservation_item(reservation: Reservation) -> dict:
+    start, end = reservation.hour_range
+    return {
+        "reservation_id": reservation_key(reservation),
+        "email": reservation.email,
+        "car_plate": reservation.car_plate,
+        "parking_spot_id": reservation.parking_spot_id,
+        "date": reservation.date.isoformat(),
+        "spot_date": spot_date_key(reservation.parking_spot_id, reservation.date.isoformat()),
+        "hour_range": [start.isoformat(), end.isoformat()],
+        "status": reservation.status or "pending",
+        "expires_at": expires_at(reservation.date.isoformat())
+    }
+
+@reservation_router.post("/", status_code=201)
+async def create_reservation(request: Request, reservation: Reservation):
+    check_owner(request, reservation.email)
+    repository = get_reservation_repository()
 
     try:
-        response = table.scan(
-            FilterExpression=Attr("email").eq(reservation.email) & Attr("date").eq(reservation.date.isoformat())
+        existing_reservations = await run_io(
+            repository.by_email_and_date, reservation.email, reservation.date.isoformat()
         )
-        existing_reservations = response.get("Items", [])
 
         new_start, new_end = reservation.hour_range
 
@@ -38,62 +70,249 @@ async def create_reservation(reservation: Reservation):
                     detail=f"Time range overlaps with existing reservation from {existing_start} to {existing_end}"
                 )
 
-        item = {
-            "reservation_id": reservation_id,
-            "email": reservation.email,
-            "car_plate": reservation.car_plate,
-            "parking_spot_id": reservation.parking_spot_id,
-            "date": reservation.date.isoformat(),
-            "hour_range": [
-                new_start.isoformat(),
-                new_end.isoformat()
-            ],
-            "status": reservation.status or "pending"
-        }
-
-        table.put_item(
-            Item=item,
-            ConditionExpression="attribute_not_exists(reservation_id)"
-        )
+        item = reservation_item(reservation)
+
+        # Reservation put + spot bitmap update in one transaction: no double booking across users
+        await run_io(spot_availability.book, item)
+        active_reservation_index.upsert(item)
+        status_engine.schedule(item)
+        publish_reservation_event("created", item)
         return {"message": "Reservation created", "reservation": item}
 
+    except HTTPException:
+        raise
+    except ReservationExists:
+        raise HTTPException(status_code=400, detail="Reservation already exists")
+    except UnknownSpot as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SpotConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ClientError as e:
-        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
-            raise HTTPException(status_code=400, detail="Reservation already exists")
         raise HTTPException(status_code=500, detail=f"AWS error: {e.response['Error']['Message']}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 
+@reservation_router.post("/bulk", status_code=201)
+async def create_reservations_bulk(request: Request, bulk: ReservationBulk):
+    """
+    Create many reservations (e.g. every weekday of a month) in one call.
+
+    The whole batch is validated in memory first: against itself, against
+    each user's reservations (one query per user) and against the spot
+    bitmaps (one BatchGetItem). Any conflict rejects the batch with 409 and
+    nothing is written. Valid batches are written with a few
+    TransactWriteItems calls; reservations that lose a race with another
+    booking are reported in "failed".
+    """
+    for email in {reservation.email for reservation in bulk.reservations}:
+        check_owner(request, email)
+    repository = get_reservation_repository()
+    problems = []
+    items = [reservation_item(r) for r in bulk.reservations]
+    seen = set()
+    for item in items:
+        if item["reservation_id"] in seen:
+            problems.append({"reservation_id": item["reservation_id"], "detail": "Duplicate reservation in the batch"})
+        seen.add(item["reservation_id"])
+        if not spot_availability.has_spot(item["parking_spot_id"]):
+            problems.append({"reservation_id": item["reservation_id"], "detail": f"Spot {item['parking_spot_id']} does not exist"})
+    if problems:
+        raise HTTPException(status_code=400, detail=problems)
+
+    try:
+        # Same-user overlaps: one query per user, then one sorted pass over the batch merged into it
+        by_user = {}
+        for item in items:
+            by_user.setdefault(item["email"], []).append(item)
+        for email, new_items in by_user.items():
+            days = {item["date"] for item in new_items}
+            existing = [r for r in await run_io(repository.by_email, email) if r["date"] in days]
+            timeline = sorted(
+                [(r["date"], time_str_to_obj(r["hour_range"][0]), time_str_to_obj(r["hour_range"][1]), None) for r in existing] +
+                [(i["date"], time_str_to_obj(i["hour_range"][0]), time_str_to_obj(i["hour_range"][1]), i) for i in new_items],
+                key=lambda entry: (entry[0], entry[1])
+            )
+            latest = None  # entry ending last so far on the current day
+            for entry in timeline:
+                if latest and latest[0] == entry[0] and entry[1] < latest[2]:
+                    clash = entry[3] or latest[3]
+                    if clash:
+                        problems.append({
+                            "reservation_id": clash["reservation_id"],
+                            "detail": f"Time range overlaps with reservation from {latest[1]} to {latest[2]} on {latest[0]}"
+                        })
+                if not latest or latest[0] != entry[0] or entry[2] > latest[2]:
+                    latest = entry
+
+        problems.extend(
+            {"reservation_id": item["reservation_id"], "detail": detail}
+            for item, detail in await run_io(spot_availability.conflicts, items)
+        )
+        if problems:
+            raise HTTPException(status_code=409, detail=problems)
+
+        booked, failed = await run_io(spot_availability.book_many, items)
+    except HTTPException:
+        raise
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"AWS error: {e.response['Error']['Message']}")
+
+    for item in booked:
+        active_reservation_index.upsert(item)
+        status_engine.schedule(item)
+        publish_reservation_event("created", item)
+    return {
+        "message": f"{len(booked)} reservations created",
+        "reservations": booked,
+        "failed": [{"reservation_id": item["reservation_id"], "detail": detail} for item, detail in failed]
+    }
+
+
+@reservation_router.post("/bulk/get")
+async def get_reservations_bulk(request: Request, body: ReservationIds):
+    """Many reservations by id with BatchGetItem; unknown ids (and other users') are listed in "missing"."""
+    repository = get_reservation_repository()
+    try:
+        found = await run_io(repository.get_many, body.reservation_ids)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"AWS error: {e.response['Error']['Message']}")
+    found = {reservation_id: item for reservation_id, item in found.items() if is_owner(request, item["email"])}
+    ids = list(dict.fromkeys(body.reservation_ids))
+    return {
+        "reservations": [found[reservation_id] for reservation_id in ids if reservation_id in found],
+        "missing": [reservation_id for reservation_id in ids if reservation_id not in found]
+    }
+
+
+@reservation_router.post("/bulk/cancel")
+async def cancel_reservations_bulk(request: Request, body: ReservationIds):
+    """Delete many reservations and free their spot time, a few transactions for the whole list."""
+    repository = get_reservation_repository()
+    try:
+        found = await run_io(repository.get_many, body.reservation_ids)
+        for item in found.values():
+            check_owner(request, item["email"])
+        deleted, missing, failed = await run_io(spot_availability.release_many, body.reservation_ids)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"AWS error: {e.response['Error']['Message']}")
+    for item in deleted:
+        active_reservation_index.remove(item["reservation_id"])
+        status_engine.unschedule(item["reservation_id"])
+        publish_reservation_event("deleted", item)
+    return {
+        "message": f"{len(deleted)} reservations deleted",
+        "deleted": [item["reservation_id"] for item in deleted],
+        "missing": missing,
+        "failed": [{"reservation_id": item["reservation_id"], "detail": detail} for item, detail in failed]
+    }
+
+
+@reservation_router.get("/free-spots")
+async def get_free_spots(
+    date: date = Query(...),
+    start: time = Query(..., description="HH:MM[:SS]"),
+    end: time = Query(..., description="HH:MM[:SS]")
+):
+    """Spots with no reservation overlapping [start, end) on a day, from the availability bitmaps."""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    try:
+        free = await run_io(spot_availability.free_spots, date.isoformat(), start, end)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"AWS error: {e.response['Error']['Message']}")
+    return {
+        "date": date.isoformat(),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "free_spots": free,
+        "spots_checked": len(spot_availability.spots)
+    }
+
+
+@reservation_router.get("/history")
+async def get_reservation_history(
+    request: Request,
+    email: Optional[EmailStr] = Query(None),
+    spot_id: Optional[int] = Query(None),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Finished reservations from the Parquet archive, newest first (never reads DynamoDB)."""
+    if email is not None:
+        check_owner(request, email)
+    elif request.state.user.get("role") != ADMIN_ROLE:
+        raise HTTPException(status_code=403, detail="email is required (only admins can read every user's history)")
+    return await run_io(reservation_archive.history, email, spot_id, start, end, limit)
+
+
+@reservation_router.get("/history/summary")
+async def get_reservation_history_summary(start: Optional[date] = Query(None), end: Optional[date] = Query(None)):
+    """Archived reservation count and reserved hours per spot."""
+    return await run_io(reservation_archive.summary, start, end)
+
+
 @reservation_router.get("/{reservation_id}")
-async def get_reservation(reservation_id: str):
-    table = get_table("Reservations")
+async def get_reservation(request: Request, reservation_id: str):
+    repository = get_reservation_repository()
     try:
-        response = table.get_item(Key={"reservation_id": reservation_id})
-        item = response.get("Item")
+        item = await run_io(repository.get, reservation_id)
         if not item:
             raise HTTPException(status_code=404, detail="Reservation not found")
+        check_owner(request, item["email"])
         return item
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"AWS error: {e.response['Error']['Message']}")
 
 
 @reservation_router.get("/")
-async def get_reservations_by_email(email: EmailStr = Query(...)):
-    table = get_table("Reservations")
+async def get_reservations_by_email(
+    request: Request,
+    email: EmailStr = Query(...),
+    start: Optional[date] = Query(None, description="First day (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day (inclusive)"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    """
+    One page of a user's reservations by day, read from EmailDateIndex with only
+    the listed fields. Pass next_cursor back to get the following page; it is
+    null on the last one.
+    """
+    check_owner(request, email)
+    if start and end and end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    repository = get_reservation_repository()
+    start_day = start.isoformat() if start else None
+    end_day = end.isoformat() if end else None
+    query = (email, start_day, end_day, order)
     try:
-        response = table.scan(FilterExpression=Attr("email").eq(email))
-        items = response.get("Items", [])
-        return items
+        items, last_key = await run_io(
+            repository.page_by_email, email, start_day, end_day,
+            order == "desc", limit, decode_cursor(cursor, query)
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"AWS error: {e.response['Error']['Message']}")
+    return {"items": items, "next_cursor": encode_cursor(last_key, query)}
 
 
 @reservation_router.put("/{reservation_id}")
-async def update_reservation_status(reservation_id: str, status: str):
+async def update_reservation_status(request: Request, reservation_id: str, status: str):
+    if status == CANCELLED:
+        # Only DELETE frees the spot's minutes in the availability bitmap
+        raise HTTPException(status_code=400, detail="Cancel a reservation with DELETE /reservations/{reservation_id}")
     table = get_table("Reservations")
     try:
-        response = table.update_item(
+        item = await run_io(get_reservation_repository().get, reservation_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Reservation not found")
+        check_owner(request, item["email"])
+        response = await run_io(
+            table.update_item,
             Key={"reservation_id": reservation_id},
             UpdateExpression="SET #st = :s",
             ExpressionAttributeNames={"#st": "status"},
@@ -101,6 +320,9 @@ async def update_reservation_status(reservation_id: str, status: str):
             ConditionExpression="attribute_exists(reservation_id)",
             ReturnValues="ALL_NEW"
         )
+        active_reservation_index.upsert(response["Attributes"])
+        status_engine.schedule(response["Attributes"])
+        publish_reservation_event("updated", response["Attributes"])
         return {"message": "Reservation updated", "reservation": response["Attributes"]}
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
@@ -109,15 +331,21 @@ async def update_reservation_status(reservation_id: str, status: str):
 
 
 @reservation_router.delete("/{reservation_id}", status_code=204)
-async def delete_reservation(reservation_id: str):
-    table = get_table("Reservations")
+async def delete_reservation(request: Request, reservation_id: str):
     try:
-        table.delete_item(
-            Key={"reservation_id": reservation_id},
-            ConditionExpression="attribute_exists(reservation_id)"
-        )
+        item = await run_io(get_reservation_repository().get, reservation_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Reservation not found")
+        check_owner(request, item["email"])
+        # Deletes the reservation and frees its minutes in one transaction
+        deleted = await run_io(spot_availability.release, reservation_id)
+        if deleted is None:
+            raise HTTPException(status_code=404, detail="Reservation not found")
+        active_reservation_index.remove(reservation_id)
+        status_engine.unschedule(reservation_id)
+        publish_reservation_event("deleted", deleted)
         return {"message": "Reservation deleted"}
+    except SpotConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ClientError as e:
-        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
-            raise HTTPException(status_code=404, detail="Reservation not found")
         raise HTTPException(status_code=500, detail=f"AWS error: {e.response['Error']['Message']}")
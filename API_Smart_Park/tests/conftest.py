@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+import pytest
+
+# Tests import the API the way uvicorn does, from API_Smart_Park/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.imports.local_dynamodb import local_dynamodb  # noqa: E402
+
+
+@pytest.fixture
+def dynamodb():
+    """Empty API tables on moto (or DYNAMODB_ENDPOINT), used by every table lookup."""
+    with local_dynamodb() as resource:
+        yield resource
@@ -0,0 +1,88 @@
+import time
+from src.imports.alert_dispatcher import AlertDispatcher, ALERT_MAX_ATTEMPTS
+
+RESERVATION = {"reservation_id": "r1", "email": "driver@example.com", "car_plate": "ABC123"}
+
+
+class FlakySNS:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def publish(self, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("SNS unreachable")
+        self.sent.append(kwargs)
+
+
+def dispatcher(tmp_path, sns):
+    alerts = AlertDispatcher(sns_client=sns, outbox_path=tmp_path / "alerts.jsonl", workers=0)
+    alerts._lookup_phone = lambda email: "+40700000000"
+    return alerts
+
+
+def take(alerts):
+    """Deliver one queued alert the way a worker does; returns whether it finished."""
+    alert = alerts._queue.get_nowait()
+    finished = alerts._deliver(alert)
+    op = {"op": "done", "id": alert["id"]} if finished else {"op": "attempt", "id": alert["id"], "attempts": alert["attempts"]}
+    alerts._append_outbox([op])
+    return finished
+
+
+def test_pending_alert_suppresses_duplicates_until_delivered(tmp_path):
+    sns = FlakySNS(failures=1)
+    alerts = dispatcher(tmp_path, sns)
+    assert alerts.enqueue(RESERVATION, "XYZ999")
+    assert not take(alerts)  # failed, waiting for a retry
+    assert not alerts.enqueue(RESERVATION, "XYZ999")
+
+    alerts._queue.put(alerts._retries[0][2])
+    assert take(alerts)
+    assert len(sns.sent) == 1
+    assert not alerts.enqueue(RESERVATION, "XYZ999")  # inside the window after delivery
+
+
+def test_dropped_alert_does_not_suppress_the_next_one(tmp_path):
+    alerts = dispatcher(tmp_path, FlakySNS(failures=ALERT_MAX_ATTEMPTS))
+    assert alerts.enqueue(RESERVATION, "XYZ999")
+    for _ in range(ALERT_MAX_ATTEMPTS - 1):
+        assert not take(alerts)
+        alerts._queue.put(alerts._retries.pop()[2])
+    assert take(alerts)  # gave up
+    assert alerts.metrics()["failed"] == 1
+    assert alerts.enqueue(RESERVATION, "XYZ999")
+
+
+def test_restart_keeps_attempts(tmp_path):
+    alerts = dispatcher(tmp_path, FlakySNS(failures=2))
+    alerts.enqueue(RESERVATION, "XYZ999")
+    assert not take(alerts)
+    alerts._queue.put(alerts._retries.pop()[2])
+    assert not take(alerts)
+
+    restarted = dispatcher(tmp_path, FlakySNS())
+    [alert] = restarted._load_outbox()
+    assert alert["attempts"] == 2
+    [alert] = restarted._load_outbox()  # the compacted outbox keeps the count too
+    assert alert["attempts"] == 2
+
+
+def test_outbox_errors_dont_stop_the_workers(tmp_path):
+    sns = FlakySNS()
+    alerts = AlertDispatcher(sns_client=sns, outbox_path=tmp_path / "alerts.jsonl", workers=1)
+    alerts._lookup_phone = lambda email: "+40700000000"
+    alerts.outbox_path.mkdir()  # every append now fails with IsADirectoryError
+    alerts.start()
+    try:
+        assert alerts.enqueue(RESERVATION, "XYZ999")
+        assert alerts.enqueue({**RESERVATION, "reservation_id": "r2"}, "XYZ999")
+        deadline = time.time() + 5
+        while len(sns.sent) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(sns.sent) == 2
+        assert all(thread.is_alive() for thread in alerts._threads)
+        assert alerts.metrics()["outbox_errors"] >= 2
+    finally:
+        alerts.stop()
@@ -0,0 +1,96 @@
+import asyncio
+from urllib.parse import quote
+import httpx
+from fastapi import FastAPI
+from src.imports.auth import create_access_token
+from src.imports.dynamodb_helper import user_cache
+from src.routers.car_plate_router import car_plate_router
+from src.routers.private_park_router import private_parking_router
+from src.routers.register_router import register_router
+from src.routers.reservation_router import reservation_router
+
+OWNER = "owner@example.com"
+OTHER = "other@example.com"
+RESERVATION = {
+    "reservation_id": f"{OWNER}#2030-01-01#1#10:00:00-11:00:00",
+    "email": OWNER,
+    "parking_spot_id": 1,
+    "date": "2030-01-01",
+    "hour_range": ["10:00:00", "11:00:00"],
+    "status": "pending",
+}
+
+app = FastAPI()
+app.include_router(car_plate_router)
+app.include_router(private_parking_router)
+app.include_router(register_router)
+app.include_router(reservation_router)
+
+
+def call(method, path, subject=OWNER, role="regular", target=app, **kwargs):
+    async def send():
+        headers = {"Authorization": f"Bearer {create_access_token(subject, role)}"} if subject else {}
+        transport = httpx.ASGITransport(app=target)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+def seed(dynamodb):
+    dynamodb.Table("Users").put_item(Item={"email": OWNER, "name": "Owner", "car_plate_ids": ["B001XYZ"]})
+    dynamodb.Table("Reservations").put_item(Item=RESERVATION)
+    user_cache.invalidate(OWNER)
+
+
+def test_other_users_data_is_forbidden(dynamodb):
+    seed(dynamodb)
+    reservation_path = f"/reservations/{quote(RESERVATION['reservation_id'], safe='')}"
+    assert call("GET", f"/car-plates/{OWNER}", subject=OTHER).status_code == 403
+    assert call("POST", f"/car-plates/{OWNER}", subject=OTHER, json={"new_plate": "B002XYZ"}).status_code == 403
+    assert call("GET", "/reservations/", subject=OTHER, params={"email": OWNER}).status_code == 403
+    assert call("GET", reservation_path, subject=OTHER).status_code == 403
+    assert call("PUT", reservation_path, subject=OTHER, params={"status": "active"}).status_code == 403
+    assert call("DELETE", reservation_path, subject=OTHER).status_code == 403
+    assert call("POST", "/reservations/bulk/cancel", subject=OTHER, json={"reservation_ids": [RESERVATION["reservation_id"]]}).status_code == 403
+    bulk = call("POST", "/reservations/bulk/get", subject=OTHER, json={"reservation_ids": [RESERVATION["reservation_id"]]})
+    assert bulk.json() == {"reservations": [], "missing": [RESERVATION["reservation_id"]]}
+    assert dynamodb.Table("Reservations").get_item(Key={"reservation_id": RESERVATION["reservation_id"]})["Item"]["status"] == "pending"
+
+
+def test_owner_and_admin_are_allowed(dynamodb):
+    seed(dynamodb)
+    assert call("GET", f"/car-plates/{OWNER}").json() == {"car_plate_ids": ["B001XYZ"]}
+    assert call("GET", f"/car-plates/{OWNER}", subject="ops@example.com", role="admin").status_code == 200
+    assert call("GET", f"/reservations/{quote(RESERVATION['reservation_id'], safe='')}").json()["email"] == OWNER
+
+
+def test_history_is_limited_to_the_caller(dynamodb):
+    assert call("GET", "/reservations/history").status_code == 403
+    assert call("GET", "/reservations/history", params={"email": OTHER}).status_code == 403
+    assert call("GET", "/reservations/history", params={"email": OWNER}).status_code == 200
+    assert call("GET", "/reservations/history", subject="ops@example.com", role="admin").status_code == 200
+
+
+def test_device_token_only_uploads(dynamodb):
+    seed(dynamodb)
+    assert call("GET", f"/car-plates/{OWNER}", subject="camera", role="device").status_code == 403
+    assert call("GET", "/reservations/", subject="camera", role="device", params={"email": OWNER}).status_code == 403
+    upload = {"files": {"file": ("capture.jpg", b"", "image/jpeg")}, "data": {"plate": "B001XYZ"}}
+    assert call("POST", "/private-parking/upload/", **upload).status_code == 403
+
+
+def test_privileged_roles_cannot_be_registered(dynamodb):
+    user = {"email": "new@example.com", "name": "New", "phone": "0700000000", "password": "secret123",
+            "car_plate_ids": [], "role": "admin"}
+    assert call("POST", "/register/", json=user).status_code == 403
+    assert "Item" not in dynamodb.Table("Users").get_item(Key={"email": "new@example.com"})
+
+
+def test_metrics_need_an_admin_token():
+    from src.main import app as main_app
+    for path in ("/cache/users/metrics", "/cache/tokens/metrics", "/reservations-engine/metrics",
+                 "/archive/reservations/metrics"):
+        assert call("GET", path, subject=None, target=main_app).status_code == 401
+        assert call("GET", path, target=main_app).status_code == 403
+        assert call("GET", path, subject="camera", role="device", target=main_app).status_code == 403
+        assert call("GET", path, subject="ops@example.com", role="admin", target=main_app).status_code == 200
@@ -0,0 +1,63 @@
+import asyncio
+import httpx
+from fastapi import FastAPI
+from src.imports.auth import create_access_token
+from src.imports.dynamodb_helper import user_cache
+from src.routers.car_plate_router import car_plate_router
+
+EMAIL = "driver@example.com"
+
+app = FastAPI()
+app.include_router(car_plate_router)
+
+
+def stored_plates(dynamodb):
+    return dynamodb.Table("Users").get_item(Key={"email": EMAIL}, ConsistentRead=True)["Item"]["car_plate_ids"]
+
+
+async def hammer(calls):
+    """Run every (method, path, json) at once against the app; returns the responses in order."""
+    headers = {"Authorization": f"Bearer {create_access_token(EMAIL, 'regular')}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+        return await asyncio.gather(*(client.request(method, path, json=body) for method, path, body in calls))
+
+
+def seed(dynamodb, plates):
+    dynamodb.Table("Users").put_item(Item={"email": EMAIL, "name": "Driver", "car_plate_ids": plates})
+    user_cache.invalidate(EMAIL)
+
+
+def test_concurrent_adds_are_all_kept(dynamodb):
+    seed(dynamodb, [])
+    plates = [f"B{i:03d}XYZ" for i in range(40)]
+    responses = asyncio.run(hammer([("POST", f"/car-plates/{EMAIL}", {"new_plate": p}) for p in plates]))
+    assert [r.status_code for r in responses] == [200] * len(plates)
+    assert sorted(stored_plates(dynamodb)) == plates
+
+
+def test_same_plate_added_concurrently_once(dynamodb):
+    seed(dynamodb, [])
+    responses = asyncio.run(hammer([("POST", f"/car-plates/{EMAIL}", {"new_plate": "B000XYZ"})] * 10))
+    assert sorted(r.status_code for r in responses) == [200] + [400] * 9
+    assert stored_plates(dynamodb) == ["B000XYZ"]
+
+
+def test_concurrent_adds_and_deletes_lose_nothing(dynamodb):
+    kept = [f"K{i:03d}" for i in range(10)]
+    removed = [f"D{i:03d}" for i in range(20)]
+    added = [f"A{i:03d}" for i in range(20)]
+    seed(dynamodb, kept + removed)
+
+    calls = [("DELETE", f"/car-plates/{EMAIL}/{p}", None) for p in removed]
+    calls += [("POST", f"/car-plates/{EMAIL}", {"new_plate": p}) for p in added]
+    responses = asyncio.run(hammer(calls))
+
+    deleted = {p for p, r in zip(removed, responses) if r.status_code == 200}
+    # A delete may give up after its retries (409), but never report a removal that didn't happen
+    assert all(r.status_code in (200, 409) for r in responses[:len(removed)])
+    assert all(r.status_code == 200 for r in responses[len(removed):])
+    assert deleted
+    expected = set(kept) | set(added) | (set(removed) - deleted)
+    final = stored_plates(dynamodb)
+    assert sorted(final) == sorted(expected)  # no plate lost, none duplicated
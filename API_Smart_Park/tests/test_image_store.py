@@ -0,0 +1,67 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import UploadFile
+from PIL import Image
+from src.imports import image_store as store
+
+
+def capture(name: str, data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=name)
+
+
+def use_tmp_dirs(tmp_path, monkeypatch):
+    for name, path in (("UPLOAD_DIR", "uploads"), ("OBJECTS_DIR", "uploads/objects"), ("THUMBS_DIR", "uploads/thumbs"),
+                       ("TMP_DIR", "uploads/tmp"), ("HISTORY_PATH", "uploads/captures.json")):
+        monkeypatch.setattr(store, name, tmp_path / path)
+
+
+def jpeg(color) -> bytes:
+    frame = io.BytesIO()
+    Image.new("RGB", (32, 24), color).save(frame, format="JPEG")
+    return frame.getvalue()
+
+
+def test_same_bytes_share_one_blob(tmp_path, monkeypatch):
+    use_tmp_dirs(tmp_path, monkeypatch)
+    frame = io.BytesIO(jpeg((200, 10, 10)))
+
+    images = store.ImageStore()
+
+    async def ingest_both():
+        first = await images.ingest(capture("a.jpg", frame.getvalue()), "1")
+        second = await images.ingest(capture("b.JPEG", frame.getvalue()), "1")
+        return first, second
+
+    first, second = asyncio.run(ingest_both())
+    assert first["image_url"] == second["image_url"]
+    assert first["image_url"].endswith(f"{first['digest']}.jpg")
+    assert len(list((tmp_path / "uploads/objects").rglob("*.*"))) == 1
+
+
+def test_evicted_blob_and_late_thumbnail_are_removed(tmp_path, monkeypatch):
+    use_tmp_dirs(tmp_path, monkeypatch)
+    monkeypatch.setattr(store, "RETENTION_PER_SPOT", 1)
+    monkeypatch.setattr(store, "thumbnail_executor", ThreadPoolExecutor(max_workers=1))
+    images = store.ImageStore()
+    first_frame, second_frame = jpeg((200, 10, 10)), jpeg((10, 200, 10))
+
+    async def ingest(name, data):
+        return await images.ingest(capture(name, data), "1")
+
+    first = asyncio.run(ingest("a.jpg", first_frame))
+    store.thumbnail_executor.submit(lambda: None).result()  # let the thumbnail land
+    second = asyncio.run(ingest("b.jpg", second_frame))
+    store.thumbnail_executor.submit(lambda: None).result()
+    assert not store.object_path(first["digest"], ".jpg").exists()
+    assert not store.thumbnail_path(first["digest"]).exists()
+
+    # A thumbnail job finishing after its blob was evicted leaves nothing behind
+    images._build_thumbnail(store.object_path(first["digest"], ".jpg"), first["digest"])
+    assert not store.thumbnail_path(first["digest"]).exists()
+
+    # The same bytes uploaded again are stored and recorded again
+    again = asyncio.run(ingest("a.jpg", first_frame))
+    assert store.object_path(again["digest"], ".jpg").exists()
+    assert images.history("1") == [again]
+    assert not store.object_path(second["digest"], ".jpg").exists()
@@ -0,0 +1,38 @@
+import asyncio
+import json
+import threading
+from datetime import date
+from decimal import Decimal
+from src.imports.live_broadcast import LiveBroadcast
+
+
+def test_dynamodb_numbers_are_sent_as_json_numbers():
+    live = LiveBroadcast()
+    live.publish("reservation", {"parking_spot_id": Decimal("1"), "ratio": Decimal("0.25"), "date": date(2030, 1, 1)})
+    live.add_snapshot("spots", lambda: {"spot": Decimal("7")})
+
+    (_, event), = live._buffer
+    data = json.loads(event)["data"]
+    assert data["parking_spot_id"] == 1 and isinstance(data["parking_spot_id"], int)
+    assert data["ratio"] == 0.25
+    assert data["date"] == "2030-01-01"
+    assert json.loads(live.snapshot())["data"]["spots"] == {"spot": 7}
+
+
+def test_unbound_broadcast_binds_to_the_first_waiting_client():
+    live = LiveBroadcast()
+
+    async def client():
+        stream = live.stream()
+        try:
+            assert json.loads((await stream.__anext__())[0])["type"] == "snapshot"
+            # Published from another thread once the client is waiting
+            asyncio.get_running_loop().call_later(0.05, lambda: threading.Thread(
+                target=live.publish, args=("availability", {"free": 3})).start())
+            frame = await asyncio.wait_for(stream.__anext__(), 2)
+            return json.loads(frame[0])
+        finally:
+            await stream.aclose()
+
+    event = asyncio.run(client())
+    assert event["type"] == "availability" and event["data"] == {"free": 3}
@@ -0,0 +1,17 @@
+from src.imports.passwords import hash_password, legacy_sha256, verify_password
+
+
+def test_current_and_legacy_hashes():
+    stored = hash_password("secret")
+    assert verify_password("secret", stored) == (True, False)
+    assert verify_password("wrong", stored) == (False, False)
+    assert verify_password("secret", legacy_sha256("secret")) == (True, True)
+    assert verify_password("secret", hash_password("secret", n=2 ** 12)) == (True, True)
+
+
+def test_malformed_scrypt_hashes_fail_without_raising():
+    _, n, r, p, salt, key = hash_password("secret").split("$")
+    for params in (("3000", r, p), (n, "0", p), (str(2 ** 24), r, p), ("x", r, p)):
+        assert verify_password("secret", "$".join(["scrypt", *params, salt, key])) == (False, False)
+    assert verify_password("secret", f"scrypt${n}${r}${p}$!!!${key}") == (False, False)
+    assert verify_password("secret", f"scrypt${n}${r}${p}${salt}") == (False, False)
@@ -0,0 +1,56 @@
+from src.imports.plate_index import PlateIndex
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_changes_from_another_worker_show_up_after_the_ttl(dynamodb):
+    clock = Clock()
+    worker_a, worker_b = PlateIndex(ttl=60, clock=clock), PlateIndex(ttl=60, clock=clock)
+    worker_a.warm()
+    worker_b.replace("b@example.com", [], ["B 123 ABC"])
+
+    assert worker_a.owners("B123ABC") == set()  # trusted warm() answer
+    clock.now += 61
+    assert worker_a.owners("B123ABC") == {"b@example.com"}
+
+    worker_b.remove("b@example.com", "B123ABC")
+    assert worker_a.owners("B123ABC") == {"b@example.com"}
+    clock.now += 61
+    assert worker_a.owners("B123ABC") == set()
+
+
+def test_failed_write_leaves_memory_consistent_with_the_table(dynamodb, monkeypatch):
+    index = PlateIndex()
+    index.warm()
+    index.replace("a@example.com", [], ["B123ABC"])
+    assert index.owners("B123ABC") == {"a@example.com"}
+
+    class Broken:
+        def batch_writer(self):
+            raise ConnectionError("DynamoDB unreachable")
+
+    monkeypatch.setattr(PlateIndex, "table", property(lambda self: Broken()))
+    index.replace("a@example.com", ["B123ABC"], ["CJ01XYZ"])
+    monkeypatch.undo()
+
+    # Nothing was written, and the lookups re-read the table instead of trusting memory
+    assert index.owners("B123ABC") == {"a@example.com"}
+    assert index.owners("CJ01XYZ") == set()
+
+
+def test_memory_follows_successful_writes(dynamodb):
+    index = PlateIndex()
+    index.warm()
+    index.replace("a@example.com", [], ["B123ABC", "CJ01XYZ"])
+    index.replace("b@example.com", [], ["B123ABC"])
+    index.replace("a@example.com", ["B123ABC", "CJ01XYZ"], ["CJ01XYZ"])
+    assert index.owners("B123ABC") == {"b@example.com"}
+    assert index.owners("CJ01XYZ") == {"a@example.com"}
+    rows = dynamodb.Table("CarPlates").scan()["Items"]
+    assert sorted((r["plate"], r["email"]) for r in rows) == [("B123ABC", "b@example.com"), ("CJ01XYZ", "a@example.com")]
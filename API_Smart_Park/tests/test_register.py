@@ -0,0 +1,42 @@
+import asyncio
+import httpx
+from fastapi import FastAPI
+from src.imports.plate_index import plate_index
+from src.routers.register_router import register_router
+
+app = FastAPI()
+app.include_router(register_router)
+
+USER = {"email": "new@example.com", "name": "New", "phone": "0700000000", "password": "secret123",
+        "car_plate_ids": ["B 123 ABC", "CJ01XYZ"]}
+
+
+def register(user):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/register/", json=user)
+    return asyncio.run(send())
+
+
+def plate_rows(dynamodb):
+    return sorted((r["plate"], r["email"]) for r in dynamodb.Table("CarPlates").scan()["Items"])
+
+
+def test_user_and_plates_are_written_together(dynamodb):
+    plate_index.warm()
+    assert register(USER).status_code == 200
+    assert plate_rows(dynamodb) == [("B123ABC", USER["email"]), ("CJ01XYZ", USER["email"])]
+    assert plate_index.owners("B123ABC") == {USER["email"]}
+
+    again = register({**USER, "car_plate_ids": ["B999ZZZ"]})
+    assert again.status_code == 400
+    assert again.json()["detail"] == "User already exists"
+    assert plate_rows(dynamodb) == [("B123ABC", USER["email"]), ("CJ01XYZ", USER["email"])]
+
+
+def test_failed_plate_write_registers_nothing(dynamodb):
+    dynamodb.Table("CarPlates").delete()
+    response = register(USER)
+    assert response.status_code == 503
+    assert "Item" not in dynamodb.Table("Users").get_item(Key={"email": USER["email"]})
@@ -0,0 +1,45 @@
+from src.imports.aws_reservation_migration import OLD_EMAIL_INDEX, migrate
+from src.imports.reservation_repository import ReservationRepository
+
+
+def old_table(dynamodb):
+    """Reservations as created before the repository layer: email-only EmailIndex, no SpotDateIndex."""
+    dynamodb.Table("Reservations").delete()
+    dynamodb.create_table(
+        TableName="Reservations",
+        KeySchema=[{"AttributeName": "reservation_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": name, "AttributeType": "S"} for name in ("reservation_id", "email", "date")],
+        GlobalSecondaryIndexes=[
+            {"IndexName": name, "KeySchema": [{"AttributeName": key, "KeyType": "HASH"}], "Projection": {"ProjectionType": "ALL"}}
+            for name, key in ((OLD_EMAIL_INDEX, "email"), ("DateIndex", "date"))
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table = dynamodb.Table("Reservations")
+    for i, day in enumerate(("2030-01-01", "2030-01-02")):
+        table.put_item(Item={
+            "reservation_id": f"old-{i}",
+            "email": "driver@example.com",
+            "parking_spot_id": 2,
+            "date": day,
+            "hour_range": ["10:00:00", "11:00:00"],
+            "status": "pending",
+        })
+    return table
+
+
+def test_migration_creates_indexes_and_backfills(dynamodb):
+    table = old_table(dynamodb)
+    migrate(dynamodb, poll=0)
+
+    repository = ReservationRepository()
+    assert [r["reservation_id"] for r in repository.by_email_and_date("driver@example.com", "2030-01-02")] == ["old-1"]
+    assert [r["reservation_id"] for r in repository.by_spot_and_date(2, "2030-01-01")] == ["old-0"]
+    assert all("expires_at" in item for item in table.scan()["Items"])
+    indexes = {index["IndexName"] for index in table.meta.client.describe_table(TableName="Reservations")["Table"]["GlobalSecondaryIndexes"]}
+    assert OLD_EMAIL_INDEX in indexes
+
+    # Second run changes nothing, then the old index can go
+    migrate(dynamodb, drop_old=True, poll=0)
+    indexes = {index["IndexName"] for index in table.meta.client.describe_table(TableName="Reservations")["Table"]["GlobalSecondaryIndexes"]}
+    assert indexes == {"EmailDateIndex", "DateIndex", "SpotDateIndex"}
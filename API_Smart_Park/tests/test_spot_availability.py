@@ -0,0 +1,161 @@
+import asyncio
+from datetime import date, timedelta
+import httpx
+import pytest
+from fastapi import FastAPI
+from pydantic import ValidationError
+from src.imports.auth import create_access_token
+from src.imports.reservation_repository import spot_date_key
+from botocore.exceptions import ClientError
+from src.imports.dynamodb_helper import get_table
+from src.imports.spot_availability import SpotAvailabilityIndex, SpotConflict, UnknownSpot, minute_mask, spot_availability
+from src.models.reservation import Reservation
+from src.routers.reservation_router import reservation_router
+
+
+def reservation(reservation_id, spot=1, day="2030-01-01", start="10:00:00", end="11:00:00"):
+    return {
+        "reservation_id": reservation_id,
+        "email": "driver@example.com",
+        "car_plate": "ABC123",
+        "parking_spot_id": spot,
+        "date": day,
+        "spot_date": spot_date_key(spot, day),
+        "hour_range": [start, end],
+        "status": "pending",
+    }
+
+
+def test_book_stores_plain_attributes(dynamodb):
+    index = SpotAvailabilityIndex()
+    index.book(reservation("r1"))
+
+    stored = dynamodb.Table("Reservations").get_item(Key={"reservation_id": "r1"})["Item"]
+    assert stored["hour_range"] == ["10:00:00", "11:00:00"]
+    assert stored["parking_spot_id"] == 1
+    day = dynamodb.Table("SpotAvailability").get_item(Key={"spot_date": "1#2030-01-01"})["Item"]
+    assert day["version"] == 1
+
+
+def test_overlap_is_rejected_across_instances(dynamodb):
+    SpotAvailabilityIndex().book(reservation("r1"))
+    with pytest.raises(SpotConflict):
+        SpotAvailabilityIndex().book(reservation("r2", start="10:30:00", end="12:00:00"))
+    SpotAvailabilityIndex().book(reservation("r3", start="11:00:00", end="12:00:00"))
+
+
+def test_release_frees_the_minutes(dynamodb):
+    index = SpotAvailabilityIndex()
+    index.book(reservation("r1"))
+    assert index.release("r1")["reservation_id"] == "r1"
+    assert index.is_free(1, "2030-01-01", "10:00:00", "11:00:00")
+    assert "Item" not in dynamodb.Table("Reservations").get_item(Key={"reservation_id": "r1"})
+
+
+def test_bulk_book_and_release(dynamodb):
+    index = SpotAvailabilityIndex(spots=range(1, 6))
+    wanted = [reservation(f"r{spot}", spot=spot) for spot in range(1, 6)] + [reservation("clash", spot=3)]
+    booked, failed = index.book_many(wanted)
+    assert sorted(r["reservation_id"] for r in booked) == ["r1", "r2", "r3", "r4", "r5"]
+    assert [r["reservation_id"] for r, _ in failed] == ["clash"]
+
+    deleted, missing, failed = index.release_many(["r1", "r2", "nope"])
+    assert sorted(r["reservation_id"] for r in deleted) == ["r1", "r2"]
+    assert missing == ["nope"] and not failed
+    fresh = SpotAvailabilityIndex()
+    assert fresh.free_spots("2030-01-01", "10:00:00", "11:00:00", spots=range(1, 6)) == ["1", "2"]
+    assert fresh.load(["3#2030-01-01"])["3#2030-01-01"][0] == minute_mask("10:00:00", "11:00:00")
+
+
+def call(method, path, **kwargs):
+    app = FastAPI()
+    app.include_router(reservation_router)
+
+    async def send():
+        headers = {"Authorization": f"Bearer {create_access_token('driver@example.com', 'regular')}"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers=headers) as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+def test_unknown_spots_are_rejected(dynamodb):
+    index = SpotAvailabilityIndex(spots=["1", "2"])
+    with pytest.raises(UnknownSpot):
+        index.book(reservation("r1", spot=9))
+    booked, failed = index.book_many([reservation("r2", spot=2), reservation("r3", spot=9)])
+    assert [r["reservation_id"] for r in booked] == ["r2"]
+    assert [(r["reservation_id"], reason) for r, reason in failed] == [("r3", "Spot 9 does not exist")]
+    assert "Item" not in dynamodb.Table("Reservations").get_item(Key={"reservation_id": "r3"})
+
+    booking = {"email": "driver@example.com", "car_plate": "ABC123", "parking_spot_id": 999,
+               "date": "2030-01-01", "hour_range": ["10:00:00", "11:00:00"]}
+    assert call("POST", "/reservations/", json=booking).status_code == 400
+    response = call("POST", "/reservations/bulk", json={"reservations": [booking]})
+    assert response.status_code == 400 and "does not exist" in response.json()["detail"][0]["detail"]
+
+
+def test_transaction_conflict_on_the_reservation_is_retried(dynamodb, monkeypatch):
+    client = get_table("SpotAvailability").meta.client
+    transact = client.transact_write_items
+    calls = []
+
+    def conflicting(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise ClientError({
+                "Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"},
+                "CancellationReasons": [{"Code": "None"}, {"Code": "TransactionConflict"}],
+            }, "TransactWriteItems")
+        return transact(**kwargs)
+
+    monkeypatch.setattr(client, "transact_write_items", conflicting)
+    index = SpotAvailabilityIndex()
+    index.book(reservation("r1"))
+    assert len(calls) == 2
+    assert dynamodb.Table("Reservations").get_item(Key={"reservation_id": "r1"})["Item"]["status"] == "pending"
+
+
+def test_release_keeps_minutes_of_overlapping_legacy_reservations(dynamodb):
+    # Written before the bitmaps existed: the two overlap on 10:30-11:00
+    table = dynamodb.Table("Reservations")
+    table.put_item(Item=reservation("legacy-1", start="10:00:00", end="11:00:00"))
+    table.put_item(Item=reservation("legacy-2", start="10:30:00", end="12:00:00"))
+    table.put_item(Item=reservation("legacy-3", spot=2, start="10:00:00", end="11:00:00"))
+    table.put_item(Item=reservation("legacy-4", spot=2, start="10:30:00", end="12:00:00"))
+
+    index = SpotAvailabilityIndex()
+    index.release("legacy-1")
+    assert index.is_free(1, "2030-01-01", "10:00:00", "10:30:00")
+    assert not index.is_free(1, "2030-01-01", "10:30:00", "11:00:00")
+
+    deleted, _, _ = index.release_many(["legacy-3"])
+    assert [r["reservation_id"] for r in deleted] == ["legacy-3"]
+    fresh = SpotAvailabilityIndex()
+    assert fresh.is_free(2, "2030-01-01", "10:00:00", "10:30:00")
+    assert not fresh.is_free(2, "2030-01-01", "10:30:00", "11:00:00")
+
+
+def test_cancel_through_put_is_rejected(dynamodb):
+    spot_availability.book(reservation("r1"))
+    response = call("PUT", "/reservations/r1", params={"status": "cancelled"})
+    assert response.status_code == 400
+    assert "DELETE" in response.json()["detail"]
+    assert dynamodb.Table("Reservations").get_item(Key={"reservation_id": "r1"})["Item"]["status"] == "pending"
+    assert not spot_availability.is_free(1, "2030-01-01", "10:00", "11:00")
+
+
+def test_past_days_cannot_be_booked():
+    booking = {"email": "driver@example.com", "car_plate": "ABC123", "parking_spot_id": 1, "hour_range": ["10:00", "11:00"]}
+    Reservation(**booking, date=date.today())
+    with pytest.raises(ValidationError):
+        Reservation(**booking, date=date.today() - timedelta(days=1))
+
+
+def test_hour_range_must_be_a_start_and_a_later_end(dynamodb):
+    booking = {"email": "driver@example.com", "car_plate": "ABC123", "parking_spot_id": 1, "date": "2030-01-01"}
+    for hour_range in (["10:00", "10:00"], ["11:00", "10:00"], ["10:00", "11:00", "12:00"], ["10:00"]):
+        with pytest.raises(ValidationError):
+            Reservation(**booking, hour_range=hour_range)
+        assert call("POST", "/reservations/", json={**booking, "hour_range": hour_range}).status_code == 422
+        assert call("POST", "/reservations/bulk", json={"reservations": [{**booking, "hour_range": hour_range}]}).status_code == 422
+    assert dynamodb.Table("Reservations").scan()["Items"] == []
@@ -0,0 +1,117 @@
+import os
+from datetime import date, datetime
+import pytest
+from src.imports.status_engine import ACTIVE, COMPLETED, NO_SHOW, NO_SHOW_GRACE, PENDING, StatusEngine, simulate
+
+# Reservations in the simulated day; CI can lower it with STATUS_SIM_COUNT
+SIM_COUNT = int(os.getenv("STATUS_SIM_COUNT", "20000"))
+
+DAY = date(2030, 1, 7)
+MIDNIGHT = datetime.combine(DAY, datetime.min.time()).timestamp()
+START = MIDNIGHT + 10 * 3600
+END = MIDNIGHT + 11 * 3600
+
+
+def reservation(reservation_id="r1", status=PENDING):
+    return {
+        "reservation_id": reservation_id,
+        "email": "driver@example.com",
+        "parking_spot_id": 1,
+        "date": DAY.isoformat(),
+        "hour_range": ["10:00:00", "11:00:00"],
+        "status": status,
+    }
+
+
+class FlakyTable:
+    """In-memory writer: conditional like the real one, failing while `down` is set."""
+
+    def __init__(self, *reservations):
+        self.statuses = {r["reservation_id"]: r["status"] for r in reservations}
+        self.down = False
+        self.calls = []
+
+    def write(self, batch):
+        self.calls.append([(previous, status) for previous, status, _ in batch])
+        if self.down:
+            raise ConnectionError("DynamoDB unreachable")
+        applied = []
+        for change in batch:
+            previous, status, tracked = change
+            if self.statuses.get(tracked.reservation["reservation_id"]) == previous:
+                self.statuses[tracked.reservation["reservation_id"]] = status
+                applied.append(change)
+        return applied
+
+
+def engine_for(table):
+    published = []
+    engine = StatusEngine(clock=lambda: MIDNIGHT, writer=table.write,
+                          publisher=lambda previous, status, item: published.append((previous, status)))
+    return engine, published
+
+
+def test_failed_write_is_retried_from_the_table_status():
+    table = FlakyTable(reservation())
+    engine, published = engine_for(table)
+    engine.schedule(reservation())
+
+    table.down = True
+    assert engine.advance(START) == 0
+    assert table.statuses["r1"] == PENDING
+    assert published == []
+    assert engine.metrics()["pending_writes"] == 1
+
+    # Still active in memory: the car is late, so the grace deadline turns it into a no-show
+    table.down = False
+    assert engine.advance(START + NO_SHOW_GRACE) == 1
+    assert table.calls[-1] == [(PENDING, NO_SHOW)]
+    assert table.statuses["r1"] == NO_SHOW
+    assert published == [(PENDING, NO_SHOW)]
+    assert engine.metrics()["pending_writes"] == 0
+
+
+def test_final_status_is_kept_until_written():
+    table = FlakyTable(reservation())
+    engine, published = engine_for(table)
+    engine.schedule(reservation())
+    engine.advance(START)
+    engine.mark_arrived("r1")
+
+    table.down = True
+    assert engine.advance(END) == 0
+    assert engine.metrics()["tracked"] == 1
+    engine.mark_arrived("r1")  # ignored once ended
+
+    table.down = False
+    assert engine.advance(END + 60) == 1
+    assert table.calls[-1] == [(ACTIVE, COMPLETED)]
+    assert table.statuses["r1"] == COMPLETED
+    assert published == [(PENDING, ACTIVE), (ACTIVE, COMPLETED)]
+    assert engine.metrics()["tracked"] == 0
+
+
+def test_conflicting_write_rereads_the_table(dynamodb):
+    dynamodb.Table("Reservations").put_item(Item=reservation())
+    engine = StatusEngine(clock=lambda: MIDNIGHT, publisher=lambda *args: None)
+    engine.schedule(reservation())
+    assert engine.advance(START) == 1
+    assert dynamodb.Table("Reservations").get_item(Key={"reservation_id": "r1"})["Item"]["status"] == ACTIVE
+
+    # Cancelled by another API instance: the engine's write loses and it stops tracking
+    dynamodb.Table("Reservations").update_item(
+        Key={"reservation_id": "r1"}, UpdateExpression="SET #st = :s",
+        ExpressionAttributeNames={"#st": "status"}, ExpressionAttributeValues={":s": "cancelled"})
+    assert engine.advance(END) == 0
+    assert dynamodb.Table("Reservations").get_item(Key={"reservation_id": "r1"})["Item"]["status"] == "cancelled"
+    assert engine.metrics()["tracked"] == 0
+
+
+@pytest.mark.parametrize("count", [SIM_COUNT])
+def test_simulated_day_applies_every_transition_on_time(count):
+    result = simulate(count, spots=max(1, count // 250))
+    assert result["lost"] == 0 and result["late"] == 0
+    assert result["lag_max"] < 60.0
+    assert sum(result["final"].values()) == count
+    assert result["transitions"] == result["written"] and result["pending_writes"] == 0
+    assert result["write_failures"] == 0
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from src.imports import dynamodb_helper
+from src.imports.dynamodb_helper import UserCache
+
+
+def put_user(dynamodb, email, name):
+    dynamodb.Table("Users").put_item(Item={"email": email, "name": name})
+
+
+def test_hit_after_load(dynamodb):
+    put_user(dynamodb, "a@example.com", "A")
+    cache = UserCache()
+    assert cache.get("a@example.com")["name"] == "A"
+    assert cache.lookup("a@example.com") == (True, {"email": "a@example.com", "name": "A"})
+    assert cache.metrics()["loads"] == 1
+    assert not cache._loading and not cache._versions
+
+
+def test_failed_load_is_not_left_in_flight(dynamodb, monkeypatch):
+    put_user(dynamodb, "a@example.com", "A")
+    cache = UserCache()
+    real_get_table = dynamodb_helper.get_table
+
+    class Broken:
+        def get_item(self, **kwargs):
+            raise ConnectionError("DynamoDB unreachable")
+
+    monkeypatch.setattr(dynamodb_helper, "get_table", lambda name: Broken())
+    with pytest.raises(ConnectionError):
+        cache.load("a@example.com")
+    assert not cache._loading and not cache._versions
+
+    monkeypatch.setattr(dynamodb_helper, "get_table", real_get_table)
+    assert cache.get("a@example.com")["name"] == "A"
+
+
+def test_invalidation_during_load_is_not_cached(dynamodb, monkeypatch):
+    put_user(dynamodb, "a@example.com", "A")
+    cache = UserCache()
+    real_get_table = dynamodb_helper.get_table
+    reading, release = threading.Event(), threading.Event()
+
+    class Slow:
+        def get_item(self, **kwargs):
+            item = real_get_table("Users").get_item(**kwargs)
+            reading.set()
+            release.wait(5)
+            return item
+
+    monkeypatch.setattr(dynamodb_helper, "get_table", lambda name: Slow())
+    result = {}
+    loader = threading.Thread(target=lambda: result.update(user=cache.load("a@example.com")))
+    loader.start()
+    reading.wait(5)
+    put_user(dynamodb, "a@example.com", "A2")
+    cache.invalidate("a@example.com")
+    release.set()
+    loader.join(5)
+
+    assert result["user"]["name"] == "A"  # the caller still gets what it read
+    assert cache.lookup("a@example.com") == (False, None)  # but the stale copy wasn't kept
+    assert not cache._loading and not cache._versions
+
+
+def test_invalidate_without_load_keeps_no_state(dynamodb):
+    cache = UserCache()
+    for i in range(100):
+        cache.invalidate(f"user{i}@example.com")
+    assert not cache._versions
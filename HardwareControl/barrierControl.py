@@ -0,0 +1,167 @@
+import threading
+import time
+
+# Servo signal
+SERVO_FREQUENCY = 50  # Hz (20ms period)
+SERVO_SETTLE_TIME = 0.5  # seconds the signal is held before releasing the servo
+
+# Barrier timing
+BARRIER_OPEN_TIME = 5  # seconds
+
+
+class ServoMotor:
+    """
+    Barrier servo driven by a PWM peripheral instead of bit-banged pulses.
+
+    Uses pigpio's hardware PWM when the pigpio daemon is reachable (GPIO12
+    and GPIO13 are hardware PWM pins), otherwise the PWM thread of the
+    GPIO library. set_angle only changes the duty cycle and returns.
+    """
+
+    def __init__(self, gpio, pin):
+        self.gpio = gpio
+        self.pin = pin
+        self.is_open = False
+        self.current_angle = 0 # Tracking current position
+        self.pi = None
+        self.pwm = None
+
+        try:
+            import pigpio
+            pi = pigpio.pi()
+            if pi.connected:
+                self.pi = pi
+        except ImportError:
+            pass
+
+        if self.pi is None:
+            gpio.setup(self.pin, gpio.OUT)
+            self.pwm = gpio.PWM(self.pin, SERVO_FREQUENCY)
+            self.pwm.start(0)
+        print("Servo initialized" + (" (hardware PWM)." if self.pi else "."))
+
+    def set_angle(self, angle):
+        angle = max(0, min(90, angle))
+
+        # Calculate duty cycle: 2.5% for 0°, 12.5% for 90°
+        duty_cycle = 2.5 + (angle / 90.0) * 5
+
+        if self.pi:
+            # pigpio takes the duty cycle in millionths
+            self.pi.hardware_PWM(self.pin, SERVO_FREQUENCY, int(duty_cycle * 10000))
+        else:
+            self.pwm.ChangeDutyCycle(duty_cycle)
+        self.current_angle = angle
+
+    def release(self):
+        """Stop the signal once the servo has reached its position (0% duty cycle)."""
+        if self.pi:
+            self.pi.hardware_PWM(self.pin, SERVO_FREQUENCY, 0)
+        else:
+            self.pwm.ChangeDutyCycle(0)
+
+    def open_barrier(self):
+        if not self.is_open:
+            print("Opening barrier...")
+            self.set_angle(90) # 90 degrees = barrier open
+            self.is_open = True
+
+    def close_barrier(self):
+        if self.is_open:
+            print("Closing barrier...")
+            self.set_angle(0) # 0 degrees = barrier closed
+            self.is_open = False
+
+    def cleanup(self):
+        print("Cleaning up servo...")
+        self.set_angle(0) # Ensuring initial position - CLOSED
+        time.sleep(SERVO_SETTLE_TIME)
+        self.release()
+        self.is_open = False
+        if self.pi:
+            self.pi.stop()
+        else:
+            self.pwm.stop()
+
+
+class BarrierController:
+    """
+    Barrier state machine running on its own thread.
+
+    Lanes (e.g. "entrance", "exit") request open windows; the barrier opens
+    on the first request and closes once every lane's window has expired.
+    A request on a lane that is already open either extends its window or
+    queues a full extra window after it, so the sensing loop never waits
+    on the barrier.
+
+    All state changes go through step(now), which the thread calls with
+    the real clock and a test harness can call with simulated time.
+    """
+
+    def __init__(self, servo, open_time=BARRIER_OPEN_TIME, clock=time.monotonic):
+        self.servo = servo
+        self.open_time = open_time
+        self.clock = clock
+        self.deadlines = {}  # lane -> time its open window ends
+        self.release_at = None  # time to stop the servo signal
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def request_open(self, lane, queue=False):
+        """Open for `lane`; extend its window, or with queue=True append another one."""
+        with self.cond:
+            now = self.clock()
+            current = self.deadlines.get(lane, now)
+            if queue:
+                self.deadlines[lane] = max(current, now) + self.open_time
+            else:
+                self.deadlines[lane] = max(current, now + self.open_time)
+            self.cond.notify()
+
+    def is_open(self):
+        with self.cond:
+            return self.servo.is_open
+
+    def step(self, now):
+        """Apply state transitions due at `now`; return when to wake up next (or None)."""
+        with self.cond:
+            self.deadlines = {lane: t for lane, t in self.deadlines.items() if t > now}
+
+            if self.deadlines and not self.servo.is_open:
+                self.servo.open_barrier()
+                self.release_at = now + SERVO_SETTLE_TIME
+            elif not self.deadlines and self.servo.is_open:
+                self.servo.close_barrier()
+                self.release_at = now + SERVO_SETTLE_TIME
+
+            if self.release_at is not None and self.release_at <= now:
+                self.servo.release()
+                self.release_at = None
+
+            wake_times = list(self.deadlines.values())
+            if self.release_at is not None:
+                wake_times.append(self.release_at)
+            return min(wake_times) if wake_times else None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="barrier", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.deadlines.clear()
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def _run(self):
+        # step() and the wait share one hold of the (re-entrant) lock, so a
+        # request can only come in while waiting, and its notify wakes us
+        with self.cond:
+            while self.running:
+                wake_at = self.step(self.clock())
+                timeout = None if wake_at is None else max(0.0, wake_at - self.clock())
+                self.cond.wait(timeout)
@@ -1,10 +1,15 @@
-from picamera2 import Picamera2
-from time import sleep
+import os
 import requests
-from PIL import Image
+from requests.adapters import HTTPAdapter
 import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import paho.mqtt.client as mqtt
 import logging
+from cameraService import CaptureService, Picamera2Backend, FakeCamera
+from plateRecognition import PlateRecognitionService, PlateRecognizerApi, OpenAlprBackend
+from occupancyTelemetry import OCCUPANCY_TOPIC
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -14,80 +19,142 @@ logger = logging.getLogger(__name__)
 API_KEY = "2491ff317ab16b7b95c78f964d041bfca5ccedc5"  # Plate Recognizer API Key
 API_URL = "https://api.platerecognizer.com/v1/plate-reader/"
 FASTAPI_URL = "http://192.168.1.13:8000/private-parking/upload/"
+FASTAPI_TOKEN = os.getenv("FASTAPI_TOKEN", "")  # device token for the API (python -m src.imports.auth camera)
 IMAGE_PATH = "/home/raspberry_user/ParckingSystem/car.jpg"
 MQTT_BROKER = "192.168.1.8"  # Pi 4 broker IP
 MQTT_TOPIC = "parking/camera"
+CAMERA_SPOT_ID = int(os.getenv("CAMERA_SPOT_ID", "1"))  # spot in front of the camera ("camera": true in spots.json)
+CAMERA_BACKEND = os.getenv("CAMERA_BACKEND", "picamera2")  # "fake" runs without a Pi camera
+SAVE_TO_DISK = os.getenv("SAVE_TO_DISK", "0") == "1"  # keep a copy of each capture at IMAGE_PATH
+JPEG_QUALITY = 90
+MAX_CONCURRENT_JOBS = 2  # capture/recognize/upload workflows running at once
+OFFLINE_RECOGNIZER = os.getenv("OFFLINE_RECOGNIZER", "openalpr")  # fallback when the API fails, "none" to disable
+
+# Long-lived camera, started once in main()
+capture_service = None
+
+# (src, seq) of the last occupancy message, to notice lost ones
+occupancy_position = None
+
+# Single background writer, so optional SD-card copies never delay a trigger
+disk_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-writer")
+
+# Keep-alive HTTP sessions, one per endpoint, shared by all workers
+def create_session(headers=None):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT_JOBS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+plate_session = create_session({"Authorization": f"Token {API_KEY}"})
+fastapi_session = create_session({"Authorization": f"Bearer {FASTAPI_TOKEN}"} if FASTAPI_TOKEN else None)
+
+
+class JobPipeline:
+    """
+    Runs trigger workflows on a bounded worker pool, off the MQTT thread.
+
+    At most one job waits for a free worker; triggers arriving while one
+    is already waiting are coalesced into it, since it will capture a
+    fresh frame anyway.
+    """
+
+    def __init__(self, handler, max_workers=MAX_CONCURRENT_JOBS):
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="camera-job")
+        self.lock = threading.Lock()
+        self.pending = False
+
+    def trigger(self):
+        with self.lock:
+            if self.pending:
+                logger.info("Trigger coalesced with pending job")
+                return False
+            self.pending = True
+        self.executor.submit(self._run)
+        return True
+
+    def _run(self):
+        with self.lock:
+            self.pending = False
+        try:
+            self.handler()
+        except Exception as e:
+            logger.error(f"Error during workflow: {e}", exc_info=True)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
 
 # Functions
-def capture_image(image_path: str):
-    """Capture an image with Raspberry Pi camera."""
-    camera = Picamera2()
-    config = camera.create_still_configuration(main={"size": (2028, 1520)})
-    camera.configure(config)
-    print("Starting camera...")
-    camera.start()
-    sleep(3)  # camera warm-up
-    camera.capture_file(image_path)
-    camera.stop()
-    print(f"Image captured and saved at {image_path}")
-
-def recognize_plate(image_path):
-    """Send image to Plate Recognizer API and return plate in uppercase."""
+def create_capture_service():
+    """Build the capture service for the configured camera backend."""
+    backend = FakeCamera() if CAMERA_BACKEND == "fake" else Picamera2Backend()
+    return CaptureService(backend)
+
+def capture_image():
+    """Take the newest frame from the running camera and its JPEG encoding, made once in memory."""
+    frame = capture_service.capture()
+    buffer = io.BytesIO()
+    frame.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    # memoryview over the encoder's buffer: shared by every consumer, never copied
+    image_bytes = buffer.getbuffer()
+    logger.info(f"Image captured ({image_bytes.nbytes} bytes)")
+    return frame, image_bytes
+
+def write_image(image_bytes, image_path: str):
+    """Write encoded image bytes to disk (runs on the disk writer thread)."""
     try:
-        with open(image_path, "rb") as image_file:
-            files = {"upload": image_file}
-            headers = {"Authorization": f"Token {API_KEY}"}
-            response = requests.post(API_URL, files=files, headers=headers, timeout=10)
-            
-            if response.status_code != 201:
-                logger.error(f"Plate Recognizer API error: {response.status_code} - {response.text}")
-                return None
-                
-            data = response.json()
-            logger.info(f"Plate Recognizer response: {data}")
-            
-            if "results" not in data or len(data["results"]) == 0:
-                logger.warning("No plates detected")
-                return None
-                
-            plate = data["results"][0].get("plate", "")
-            result = plate.upper() if plate else None
-            logger.info(f"Detected plate: {result}")
-            return result
-            
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error calling Plate Recognizer API: {e}")
-        return None
+        with open(image_path, "wb") as image_file:
+            image_file.write(image_bytes)
+        logger.info(f"Image saved at {image_path}")
+    except OSError as e:
+        logger.error(f"Failed to save image at {image_path}: {e}")
+
+def save_image_async(image_bytes, image_path: str):
+    disk_writer.submit(write_image, image_bytes, image_path)
+
+def create_plate_recognizer():
+    """Plate Recognizer API first, offline recognizer as fallback, behind a per-spot plate cache."""
+    fallbacks = [OpenAlprBackend()] if OFFLINE_RECOGNIZER == "openalpr" else []
+    return PlateRecognitionService(PlateRecognizerApi(API_URL, plate_session), fallbacks)
+
+plate_recognizer = create_plate_recognizer()
+
+def recognize_plate(frame, image_bytes):
+    """Return the plate in the image in uppercase, reusing the last read while the same car is parked."""
+    try:
+        plate = plate_recognizer.recognize(image_bytes, frame, CAMERA_SPOT_ID)
+        logger.info(f"Recognition stats: {plate_recognizer.summary()}")
+        return plate
     except Exception as e:
         logger.error(f"Unexpected error in recognize_plate: {e}")
         return None
 
 
-def send_image_to_fastapi(image_path, plate):
+def send_image_to_fastapi(image_bytes, plate):
     """Send image and detected plate to FastAPI."""
     try:
         logger.info(f"Sending image to FastAPI - plate: {plate}")
-        
-        with Image.open(image_path) as image:
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='JPEG')
-            img_byte_arr = img_byte_arr.getvalue()
 
-        # Prepare files for multipart/form-data
+        # Prepare files for multipart/form-data (same encoded bytes as the recognizer got)
         files = {
-            'file': ('car.jpg', img_byte_arr, 'image/jpeg')
+            'file': ('car.jpg', image_bytes, 'image/jpeg')
         }
         
         # Prepare form data
         data = {
             'plate': plate or "",
-            'spot_id': "1"
+            'spot_id': str(CAMERA_SPOT_ID)
         }
         
         logger.info(f"Sending request to {FASTAPI_URL}")
         logger.info(f"Form data: {data}")
         
-        response = requests.post(
+        response = fastapi_session.post(
             FASTAPI_URL,
             files=files,
             data=data,  # Use data parameter for form fields
@@ -123,43 +190,79 @@ def on_connect(client, userdata, flags, rc):
     if rc == 0:
         logger.info("Connected to MQTT broker")
         client.subscribe(MQTT_TOPIC)
-        logger.info(f"Subscribed to topic: {MQTT_TOPIC}")
+        client.subscribe(OCCUPANCY_TOPIC)
+        logger.info(f"Subscribed to topics: {MQTT_TOPIC}, {OCCUPANCY_TOPIC}")
     else:
         logger.error(f"Failed to connect to MQTT broker, return code {rc}")
 
 
+def run_workflow():
+    """Capture, recognize and upload one image (runs on a pipeline worker)."""
+    logger.info("\n--- Starting camera capture workflow ---")
+
+    # Step 1: Capture image (encoded once, kept in memory)
+    frame, image_bytes = capture_image()
+    if SAVE_TO_DISK:
+        save_image_async(image_bytes, IMAGE_PATH)
+
+    # Step 2: Recognize plate (cached while the spot stays occupied)
+    plate = recognize_plate(frame, image_bytes)
+
+    # Step 3: Send to FastAPI (even if no plate detected)
+    result = send_image_to_fastapi(image_bytes, plate)
+
+    if result:
+        logger.info("FastAPI workflow completed successfully")
+        logger.info(f"Result: {result}")
+    else:
+        logger.error("FastAPI workflow failed")
+
+
+pipeline = JobPipeline(run_workflow)
+
+
+def on_occupancy(payload):
+    """Pass the camera spot's sensor state to the plate cache; a lost message clears it."""
+    global occupancy_position
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.error(f"Invalid occupancy message: {payload[:200]}")
+        return
+    position = (message.get("src"), message.get("seq"))
+    if occupancy_position and (position[0] != occupancy_position[0] or position[1] != occupancy_position[1] + 1):
+        # Missed deltas (or a restarted publisher): the car may have changed in between
+        plate_recognizer.occupancy_lost()
+    occupancy_position = position
+    for spot_id, occupied, _, changed_at in message.get("spots", []):
+        if spot_id == CAMERA_SPOT_ID:
+            plate_recognizer.occupancy_changed(spot_id, occupied, changed_at)
+
+
 def on_message(client, userdata, msg):
+    if msg.topic == OCCUPANCY_TOPIC:
+        on_occupancy(msg.payload)
+        return
     message = msg.payload.decode()
     logger.info(f"MQTT message received on topic {msg.topic}: {message}")
-    
+
     if message == "start_camera":
-        logger.info("\n--- Triggered by MQTT: Starting camera capture workflow ---")
-        try:
-            # Step 1: Capture image
-            capture_image(IMAGE_PATH)
-            
-            # Step 2: Recognize plate
-            plate = recognize_plate(IMAGE_PATH)
-            
-            # Step 3: Send to FastAPI (even if no plate detected)
-            result = send_image_to_fastapi(IMAGE_PATH, plate)
-            
-            if result:
-                logger.info("FastAPI workflow completed successfully")
-                logger.info(f"Result: {result}")
-            else:
-                logger.error("FastAPI workflow failed")
-                
-        except Exception as e:
-            logger.error(f"Error during workflow: {e}", exc_info=True)
+        # Hand off and return at once so the MQTT loop keeps serving keepalives
+        logger.info("Triggered by MQTT: queuing camera capture workflow")
+        pipeline.trigger()
 
 def on_disconnect(client, userdata, rc):
     logger.info(f"Disconnected from MQTT broker with result code: {rc}")
 
 # MAIN
 def main():
+    global capture_service
     logger.info("Starting Pi Zero parking system...")
-    
+
+    # Configure and warm up the camera once; triggers then read from its buffer
+    capture_service = create_capture_service()
+    capture_service.start()
+
     client = mqtt.Client()
     client.on_connect = on_connect
     client.on_message = on_message
@@ -176,6 +279,10 @@ def main():
         client.disconnect()
     except Exception as e:
         logger.error(f"MQTT connection error: {e}")
+    finally:
+        pipeline.shutdown()
+        capture_service.stop()
+        disk_writer.shutdown(wait=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Capture settings
+FRAME_SIZE = (2028, 1520)
+WARMUP_TIME = 3  # seconds, paid once when the service starts
+FRAME_INTERVAL = 0.5  # seconds between background frames
+RING_BUFFER_SIZE = 3  # recent frames kept in memory
+
+
+# Camera backends
+class CameraBackend(ABC):
+    """Hardware abstraction: anything that can be started, grabbed from and stopped."""
+
+    @abstractmethod
+    def start(self):
+        """Open the camera; called once when the service starts."""
+
+    @abstractmethod
+    def capture_frame(self):
+        """Return the next frame as a PIL image."""
+
+    @abstractmethod
+    def stop(self):
+        """Release the camera."""
+
+
+class Picamera2Backend(CameraBackend):
+    """Raspberry Pi camera through picamera2 (imported lazily so other backends run anywhere)."""
+
+    def __init__(self, size=FRAME_SIZE):
+        self.size = size
+        self.camera = None
+
+    def start(self):
+        from picamera2 import Picamera2
+        self.camera = Picamera2()
+        config = self.camera.create_still_configuration(main={"size": self.size})
+        self.camera.configure(config)
+        self.camera.start()
+
+    def capture_frame(self):
+        return self.camera.capture_image("main")
+
+    def stop(self):
+        if self.camera:
+            self.camera.stop()
+            self.camera.close()
+            self.camera = None
+
+
+class FakeCamera(CameraBackend):
+    """Synthetic frames for running the pipeline on a plain Linux box."""
+
+    def __init__(self, size=FRAME_SIZE, frame_delay=0.03):
+        self.size = size
+        self.frame_delay = frame_delay  # simulated sensor readout time
+        self.frames_captured = 0
+
+    def start(self):
+        pass
+
+    def capture_frame(self):
+        from PIL import Image
+        time.sleep(self.frame_delay)
+        self.frames_captured += 1
+        shade = (self.frames_captured * 16) % 256
+        return Image.new("RGB", self.size, (shade, shade, shade))
+
+    def stop(self):
+        pass
+
+
+# Capture service
+class CaptureService:
+    """
+    Keeps one camera configured and running, grabbing frames in the
+    background into a small ring buffer, so a trigger is answered from
+    memory instead of paying camera setup and warm-up every time.
+    """
+
+    def __init__(self, backend: CameraBackend, buffer_size=RING_BUFFER_SIZE,
+                 frame_interval=FRAME_INTERVAL, warmup=WARMUP_TIME):
+        self.backend = backend
+        self.frame_interval = frame_interval
+        self.warmup = warmup
+        self.frames = deque(maxlen=buffer_size)  # (timestamp, frame)
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        logger.info("Starting camera...")
+        self.backend.start()
+        time.sleep(self.warmup)
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, name="camera", daemon=True)
+        self.thread.start()
+        logger.info("Camera running")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.backend.stop()
+        logger.info("Camera stopped")
+
+    def _capture_loop(self):
+        while self.running:
+            started = time.monotonic()
+            try:
+                frame = self.backend.capture_frame()
+            except Exception as e:
+                logger.error(f"Frame capture failed: {e}")
+                time.sleep(self.frame_interval)
+                continue
+            with self.cond:
+                self.frames.append((time.monotonic(), frame))
+                self.cond.notify_all()
+            # Sleep out the rest of the interval instead of grabbing flat out
+            remaining = self.frame_interval - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def latest(self):
+        """Newest buffered frame, or None before the first one arrives."""
+        with self.cond:
+            return self.frames[-1][1] if self.frames else None
+
+    def capture(self, max_age=FRAME_INTERVAL, timeout=5):
+        """
+        Return a frame taken at most `max_age` seconds ago, waiting for
+        the next background frame if the newest one is older than that.
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                if self.frames and now - self.frames[-1][0] <= max_age:
+                    return self.frames[-1][1]
+                if now >= deadline:
+                    raise TimeoutError("No frame from camera")
+                self.cond.wait(deadline - now)
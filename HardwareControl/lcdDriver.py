@@ -0,0 +1,165 @@
+import threading
+import time
+
+# LCD I2C Configuration
+I2C_ADDR = 0x27 # I2C device address
+I2C_BUS = 1 # I2C bus
+
+# LCD constants
+LCD_WIDTH = 16 # Maximum characters per line
+LCD_LINES = 2
+LCD_CHR = 1 # Character mode
+LCD_CMD = 0 # Command mode
+LCD_LINE_ADDRESSES = [0x80, 0xC0] # LCD RAM address of each line
+LCD_BACKLIGHT = 0x08 # Backlight on bit
+LCD_ENABLE = 0x04 # Enable bit
+
+# LCD flags for commands
+LCD_CLEARDISPLAY = 0x01
+LCD_ENTRYMODESET = 0x04
+LCD_DISPLAYCONTROL = 0x08
+LCD_FUNCTIONSET = 0x20
+LCD_SETDDRAMADDR = 0x80
+
+# LCD flags for display entry mode / display control / function set
+LCD_ENTRYLEFT = 0x02
+LCD_DISPLAYON = 0x04
+LCD_2LINE = 0x08
+LCD_5x8DOTS = 0x00
+LCD_4BITMODE = 0x00
+
+I2C_BLOCK_SIZE = 32 # SMBus block write limit (data bytes after the command byte)
+CLEAR_DELAY = 0.002 # clear display takes 1.52ms
+I2C_RETRY_DELAY = 0.5 # seconds before redrawing after an I2C error, doubled on each failure
+I2C_RETRY_MAX = 10 # seconds, longest wait between retries
+
+
+def lcd_byte_frames(bits, mode):
+    """
+    PCF8574 port states that send one byte in 4-bit mode.
+
+    Each nibble is set up, strobed with Enable high and latched with Enable
+    low. At 100kHz every port write takes ~90us, which already covers the
+    HD44780 enable pulse width and execution time, so no sleeps are needed.
+    """
+    frames = []
+    for nibble in (bits & 0xF0, (bits << 4) & 0xF0):
+        value = mode | nibble | LCD_BACKLIGHT
+        frames += [value, value | LCD_ENABLE, value & ~LCD_ENABLE]
+    return frames
+
+
+class LcdDisplay:
+    """
+    Framebuffer-backed 16x2 I2C LCD driver.
+
+    show() only updates the wanted contents; a background thread compares
+    them with what the display currently shows and sends just the changed
+    cells, packed into SMBus block writes, so callers never wait on I2C.
+    """
+
+    def __init__(self, bus, address=I2C_ADDR, width=LCD_WIDTH, lines=LCD_LINES):
+        self.bus = bus
+        self.address = address
+        self.width = width
+        self.wanted = [" " * width for _ in range(lines)]
+        self.shown = [None] * lines  # None = unknown, redraw the whole line
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.block_writes = 0
+
+    def init(self):
+        """Initialize display in 4-bit mode (blocking, called once at startup)."""
+        for command in (0x33, 0x32,
+                        LCD_FUNCTIONSET | LCD_2LINE | LCD_5x8DOTS | LCD_4BITMODE, # 2 lines, 5x8 font, 4-bit mode
+                        LCD_DISPLAYCONTROL | LCD_DISPLAYON, # Display on, cursor off
+                        LCD_ENTRYMODESET | LCD_ENTRYLEFT): # Left to right
+            self._send(lcd_byte_frames(command, LCD_CMD))
+            time.sleep(0.005)
+        self.clear()
+
+    def clear(self):
+        with self.cond:
+            self._send(lcd_byte_frames(LCD_CLEARDISPLAY, LCD_CMD))
+            time.sleep(CLEAR_DELAY)
+            self.shown = [" " * self.width for _ in self.shown]
+
+    def show(self, *lines):
+        """Set the text of the display, one string per line (non-blocking)."""
+        with self.cond:
+            for i, text in enumerate(lines[:len(self.wanted)]):
+                self.wanted[i] = text[:self.width].ljust(self.width)
+            self.cond.notify()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="lcd", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Flush pending changes and stop the render thread."""
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.render()
+
+    def _run(self):
+        retry_delay = 0
+        while True:
+            with self.cond:
+                while self.running and self.wanted == self.shown:
+                    self.cond.wait()
+                # After an I2C error, wait before redrawing (show() doesn't cut it short, stop() does)
+                retry_at = time.monotonic() + retry_delay
+                while self.running and time.monotonic() < retry_at:
+                    self.cond.wait(retry_at - time.monotonic())
+                if not self.running:
+                    return
+            if self.render():
+                retry_delay = 0
+            else:
+                retry_delay = min(max(retry_delay * 2, I2C_RETRY_DELAY), I2C_RETRY_MAX)
+
+    def render(self):
+        """Send the cells that differ between the wanted and the shown contents; False on an I2C error."""
+        with self.cond:
+            wanted = list(self.wanted)
+            shown = list(self.shown)
+
+        frames = []
+        for line, (new, old) in enumerate(zip(wanted, shown)):
+            col = 0
+            while col < self.width:
+                if old is not None and new[col] == old[col]:
+                    col += 1
+                    continue
+                # A run of changed cells: one address command, then the characters
+                start = col
+                while col < self.width and (old is None or new[col] != old[col]):
+                    col += 1
+                frames += lcd_byte_frames(LCD_LINE_ADDRESSES[line] + start, LCD_CMD)
+                for char in new[start:col]:
+                    frames += lcd_byte_frames(ord(char), LCD_CHR)
+
+        if frames and not self._send(frames):
+            with self.cond:
+                self.shown = [None] * len(self.shown)  # state unknown after an I2C error
+            return False
+        with self.cond:
+            self.shown = wanted
+        return True
+
+    def _send(self, frames):
+        try:
+            for i in range(0, len(frames), I2C_BLOCK_SIZE + 1):
+                block = frames[i:i + I2C_BLOCK_SIZE + 1]
+                # PCF8574 has no registers: the "command" byte is just the first port write
+                self.bus.write_i2c_block_data(self.address, block[0], block[1:])
+                self.block_writes += 1
+            return True
+        except IOError:
+            print("I2C Error: Could not write to device")
+            return False
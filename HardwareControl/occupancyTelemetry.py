@@ -0,0 +1,102 @@
+import json
+import math
+import time
+
+OCCUPANCY_TOPIC = "parking/occupancy"
+DISTANCE_DEADBAND = 0.5 # cm a filtered distance must move before it is re-published
+SNAPSHOT_INTERVAL = 30 # seconds between full snapshots (late subscribers, lost messages)
+
+
+class OccupancyPublisher:
+    """
+    Publishes spot occupancy as compact, batched deltas.
+
+    After every sweep, the spots whose state changed (or whose filtered
+    distance moved more than DISTANCE_DEADBAND) are sent in one message:
+
+        {"src": <publisher id>, "seq": 12, "ts": 1712345678.12, "full": false,
+         "spots": [[spot_id, occupied 0/1, distance cm or null, changed_at], ...]}
+
+    seq increases by one per message so the subscriber can detect gaps; src
+    changes whenever the publisher restarts. Every SNAPSHOT_INTERVAL seconds
+    (and on the first publish) a full snapshot of all spots is sent instead.
+    """
+
+    def __init__(self, client, topic=OCCUPANCY_TOPIC, deadband=DISTANCE_DEADBAND,
+                 snapshot_interval=SNAPSHOT_INTERVAL, clock=time.time):
+        self.client = client
+        self.topic = topic
+        self.deadband = deadband
+        self.snapshot_interval = snapshot_interval
+        self.clock = clock
+        self.source = f"{clock():.3f}"
+        self.seq = 0
+        self.last_snapshot = None
+        self.published = {} # spot id -> (occupied, distance) last sent
+        self.changed_at = {} # spot id -> time the occupancy last changed
+        self.messages = 0
+        self.bytes_sent = 0
+        self.last_info = None # MQTTMessageInfo of the last publish
+
+    def _moved(self, previous, distance):
+        if previous is None or distance is None:
+            return previous != distance
+        return abs(previous - distance) >= self.deadband
+
+    def build(self, spots, now=None):
+        """Payload for the current spot states, or None if nothing changed."""
+        now = self.clock() if now is None else now
+        full = self.last_snapshot is None or now - self.last_snapshot >= self.snapshot_interval
+
+        entries = []
+        for spot in spots:
+            previous = self.published.get(spot.id)
+            if previous is None or previous[0] != spot.occupied:
+                self.changed_at[spot.id] = now
+            if not full and previous is not None and previous[0] == spot.occupied \
+                    and not self._moved(previous[1], spot.distance):
+                continue
+            self.published[spot.id] = (spot.occupied, spot.distance)
+            entries.append([spot.id, int(spot.occupied), spot.distance, round(self.changed_at[spot.id], 3)])
+
+        if not entries:
+            return None
+        if full:
+            self.last_snapshot = now
+        self.seq += 1
+        return {"src": self.source, "seq": self.seq, "ts": round(now, 3), "full": full, "spots": entries}
+
+    def publish(self, spots, now=None):
+        """Publish the changes since the last call; return the payload sent (or None)."""
+        message = self.build(spots, now)
+        if message is None:
+            return None
+        payload = json.dumps(message, separators=(",", ":"))
+        self.last_info = self.client.publish(self.topic, payload)
+        self.messages += 1
+        self.bytes_sent += len(payload)
+        return message
+
+
+class TraceRecorder:
+    """
+    Appends the raw reading of every spot after each sweep to a JSON-lines file:
+
+        {"t": 1712345678.12, "r": {"1": 4.21, "2": null}}
+
+    replayTrace.py feeds these files back through the filters and the publisher.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.file = open(path, "a", buffering=1)
+        self.clock = clock
+
+    def record(self, spots):
+        readings = {}
+        for spot in spots:
+            raw = spot.readings[-1] if spot.readings else None
+            readings[str(spot.id)] = None if raw is None or math.isinf(raw) else raw
+        self.file.write(json.dumps({"t": round(self.clock(), 3), "r": readings}, separators=(",", ":")) + "\n")
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,155 @@
+"""
+Replay recorded (or synthetic) ultrasonic sensor traces through the
+occupancy filters and publisher, to measure telemetry throughput.
+
+Record a trace on the Pi 4 with SENSOR_TRACE=trace.jsonl python3 sensorControl.py,
+then replay it against a broker and, optionally, the API:
+
+    python3 replayTrace.py trace.jsonl --broker 192.168.1.8 --speed 0 --api http://localhost:8000
+    python3 replayTrace.py --spots 200 --sweeps 5000 --dry-run
+"""
+import argparse
+import json
+import random
+import time
+
+from occupancyTelemetry import OccupancyPublisher, OCCUPANCY_TOPIC
+from sensorArray import SensorArray, SpotSensor, CAR_DETECTION_DISTANCE, HYSTERESIS
+
+
+class NullClient:
+    """MQTT client stand-in for --dry-run: measures filtering and encoding only."""
+
+    def publish(self, topic, payload):
+        return None
+
+
+def load_trace(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def synthetic_trace(spots, sweeps, interval, seed=0):
+    """Cars arriving and leaving at random, with noisy readings."""
+    rng = random.Random(seed)
+    parked = {str(i): False for i in range(1, spots + 1)}
+    t = time.time()
+    for _ in range(sweeps):
+        readings = {}
+        for spot_id in parked:
+            if rng.random() < 0.01:
+                parked[spot_id] = not parked[spot_id]
+            if parked[spot_id]:
+                readings[spot_id] = round(rng.uniform(1.5, 2.5), 2)
+            else:
+                readings[spot_id] = None if rng.random() < 0.8 else round(rng.uniform(6, 10), 2)
+        yield {"t": t, "r": readings}
+        t += interval
+
+
+def build_sensors(config, trace_spot_ids):
+    """Spot filters from the spots config, or default filters for the ids in the trace."""
+    if config:
+        array = SensorArray.from_config(None, config)
+        return {str(spot.id): spot for spot in array.spots}, array.detection_distance, array.hysteresis
+    sensors = {spot_id: SpotSensor(spot_id, None, None) for spot_id in trace_spot_ids}
+    return sensors, CAR_DETECTION_DISTANCE, HYSTERESIS
+
+
+def wait_for_api(api_url, source, seq, timeout):
+    """Poll the API until it has applied message `seq`; return the wait in seconds (or None)."""
+    import requests
+
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        try:
+            state = requests.get(f"{api_url}/occupancy/", timeout=2).json()
+            if state.get("source") == source and state.get("seq", 0) >= seq:
+                return time.monotonic() - started
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", nargs="?", help="trace file recorded with SENSOR_TRACE (omit for a synthetic trace)")
+    parser.add_argument("--config", help="spots config file (detection distances, filter window)")
+    parser.add_argument("--spots", type=int, default=50, help="spots in the synthetic trace")
+    parser.add_argument("--sweeps", type=int, default=2000, help="sweeps in the synthetic trace")
+    parser.add_argument("--interval", type=float, default=0.3, help="seconds between synthetic sweeps")
+    parser.add_argument("--speed", type=float, default=0, help="replay speed factor (0 = as fast as possible)")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--topic", default=OCCUPANCY_TOPIC)
+    parser.add_argument("--dry-run", action="store_true", help="don't connect to a broker")
+    parser.add_argument("--api", help="API base URL; wait until it has applied the last message")
+    args = parser.parse_args()
+
+    records = list(load_trace(args.trace) if args.trace
+                   else synthetic_trace(args.spots, args.sweeps, args.interval))
+    if not records:
+        print("Empty trace")
+        return
+
+    sensors, detection_distance, hysteresis = build_sensors(args.config, records[0]["r"].keys())
+
+    if args.dry_run:
+        client = NullClient()
+    else:
+        import paho.mqtt.client as mqtt
+        client = mqtt.Client()
+        client.connect(args.broker, 1883, 60)
+        client.loop_start()
+
+    # Trace times are shifted to now, so the API sees current timestamps
+    offset = time.time() - records[0]["t"]
+    clock_now = [records[0]["t"] + offset]
+    publisher = OccupancyPublisher(client, topic=args.topic, clock=lambda: clock_now[0])
+
+    started = time.monotonic()
+    changes = 0
+    for record in records:
+        if args.speed > 0:
+            due = started + (record["t"] - records[0]["t"]) / args.speed
+            time.sleep(max(0.0, due - time.monotonic()))
+        clock_now[0] = record["t"] + offset
+
+        spots = []
+        for spot_id, distance in record["r"].items():
+            spot = sensors.get(spot_id)
+            if spot is None:
+                continue
+            if spot.add_reading(distance, detection_distance, hysteresis):
+                changes += 1
+            spots.append(spot)
+
+        publisher.publish(spots)
+
+    if publisher.last_info is not None:
+        publisher.last_info.wait_for_publish()
+    elapsed = time.monotonic() - started
+
+    print(f"Sweeps: {len(records)} ({len(records) / elapsed:.0f}/s) over {len(sensors)} spots")
+    print(f"Occupancy changes: {changes}")
+    print(f"Messages: {publisher.messages} ({publisher.messages / elapsed:.0f}/s), "
+          f"{publisher.bytes_sent} bytes, {publisher.bytes_sent / max(1, publisher.messages):.0f} bytes/message")
+    print(f"Elapsed: {elapsed:.3f}s")
+
+    if args.api and not args.dry_run:
+        drained = wait_for_api(args.api.rstrip("/"), publisher.source, publisher.seq, timeout=30)
+        if drained is None:
+            print("API did not catch up within 30s")
+        else:
+            print(f"API caught up {drained * 1000:.0f}ms after the last publish "
+                  f"(end to end {(elapsed + drained):.3f}s, {publisher.messages / (elapsed + drained):.0f} messages/s)")
+
+    if not args.dry_run:
+        client.loop_stop()
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import json
+import statistics
+import threading
+import time
+from collections import deque
+
+# Detection defaults (overridable in the spots config file)
+CAR_DETECTION_DISTANCE = 3 # Car detected when under 3cm
+MIN_VALID_DISTANCE = 1 # Ignore readings below 1cm (sensor noise)
+MAX_VALID_DISTANCE = 10 # Ignore readings above 10cm (not relevant)
+HYSTERESIS = 1.0 # cm above the detection distance before a spot is free again
+FILTER_WINDOW = 5 # readings in the per-spot median filter
+GROUP_GAP = 0.05 # seconds between two trigger groups, lets echoes die out
+ECHO_TIMEOUT = 0.04 # seconds to wait for a group's echoes
+
+SPEED_OF_SOUND_HALF = 17150 # cm/s, speed of sound / 2
+TRIGGER_PULSE = 0.00001 # 10 microseconds
+
+# pigpio edge callbacks (pigpio itself is only imported on the Pi, in sensorControl)
+PIGPIO_EITHER_EDGE = 2 # pigpio.EITHER_EDGE
+PIGPIO_TIMEOUT = 2 # level passed to callbacks on a watchdog timeout, not an edge
+TICK_WRAP = 1 << 32 # pigpio ticks are 32-bit microsecond counters
+
+
+class SpotSensor:
+    """One ultrasonic sensor watching one parking spot, with its filter state."""
+
+    def __init__(self, spot_id, trig, echo, group=0, camera=False, camera_distance=None, window=FILTER_WINDOW):
+        self.id = spot_id
+        self.trig = trig
+        self.echo = echo
+        self.group = group
+        self.camera = camera  # spot watched by the Pi Zero camera
+        self.camera_distance = camera_distance if camera_distance is not None else CAR_DETECTION_DISTANCE
+        self.readings = deque(maxlen=window)
+        self.occupied = False
+        self.distance = None  # filtered distance, None when nothing in range
+        # Echo capture, filled in by the edge callback: (arrival time, edge tick in microseconds)
+        self.edges = []
+
+    def reset_echo(self):
+        self.edges = []
+
+    def on_edge(self, arrival, tick):
+        if len(self.edges) < 2:
+            self.edges.append((arrival, tick))
+
+    def echo_deadline(self, fired_at):
+        """Time after which a missing edge can no longer be in range; None once the echo is complete."""
+        if len(self.edges) == 2:
+            return None
+        if len(self.edges) == 1:
+            return self.edges[0][0] + MAX_VALID_DISTANCE / SPEED_OF_SOUND_HALF
+        return fired_at + ECHO_TIMEOUT
+
+    def echo_resolved(self, now, fired_at):
+        """True once the echo is complete or can no longer be in range."""
+        deadline = self.echo_deadline(fired_at)
+        return deadline is None or now > deadline
+
+    def echo_distance(self):
+        if len(self.edges) < 2:
+            return None
+        # Pulse width from the edge ticks, not from when the callbacks ran
+        width = ((self.edges[1][1] - self.edges[0][1]) % TICK_WRAP) / 1e6
+        distance = width * SPEED_OF_SOUND_HALF
+        if distance < MIN_VALID_DISTANCE or distance > MAX_VALID_DISTANCE:
+            return None
+        return round(distance, 2)
+
+    def add_reading(self, distance, detection_distance, hysteresis):
+        """Feed one raw reading through the median/hysteresis filter; True if occupancy changed."""
+        # No echo in range means nothing parked: count it as far away
+        self.readings.append(distance if distance is not None else float("inf"))
+        median = statistics.median(self.readings)
+        self.distance = None if median == float("inf") else round(median, 2)
+
+        if self.occupied:
+            occupied = median <= detection_distance + hysteresis
+        else:
+            occupied = median <= detection_distance
+        changed = occupied != self.occupied
+        self.occupied = occupied
+        return changed
+
+
+class SensorArray:
+    """
+    Ultrasonic sensors for an arbitrary number of spots.
+
+    Sensors are fired in groups (from the config file): sensors in the same
+    group are mounted far enough apart to trigger together, and groups are
+    separated by a short gap to avoid crosstalk. Echo pulses are timed from
+    GPIO edges rather than by spinning on the echo pin: with a pigpio
+    connection (`pi`) each edge carries the tick the pigpio daemon sampled
+    it at, so callback thread latency doesn't skew the pulse width;
+    without one, RPi.GPIO callbacks are timestamped on arrival.
+    """
+
+    def __init__(self, gpio, spots, detection_distance=CAR_DETECTION_DISTANCE,
+                 hysteresis=HYSTERESIS, group_gap=GROUP_GAP, pi=None):
+        self.gpio = gpio
+        self.pi = pi
+        self.spots = spots
+        self.detection_distance = detection_distance
+        self.hysteresis = hysteresis
+        self.group_gap = group_gap
+        self.cond = threading.Condition()
+        self._pigpio_callbacks = []
+        groups = {}
+        for spot in spots:
+            groups.setdefault(spot.group, []).append(spot)
+        self.groups = [groups[g] for g in sorted(groups)]
+
+    @classmethod
+    def from_config(cls, gpio, path, pi=None):
+        with open(path) as f:
+            config = json.load(f)
+        window = config.get("filter_window", FILTER_WINDOW)
+        spots = [
+            SpotSensor(
+                s["id"], s["trig"], s["echo"],
+                group=s.get("group", i),
+                camera=s.get("camera", False),
+                camera_distance=s.get("camera_distance"),
+                window=window,
+            )
+            for i, s in enumerate(config["spots"])
+        ]
+        return cls(
+            gpio, spots,
+            detection_distance=config.get("detection_distance", CAR_DETECTION_DISTANCE),
+            hysteresis=config.get("hysteresis", HYSTERESIS),
+            group_gap=config.get("group_gap", GROUP_GAP),
+            pi=pi,
+        )
+
+    def setup(self):
+        for spot in self.spots:
+            self.gpio.setup(spot.trig, self.gpio.OUT)
+            self.gpio.setup(spot.echo, self.gpio.IN)
+            self.gpio.output(spot.trig, False)
+            if self.pi:
+                self._pigpio_callbacks.append(
+                    self.pi.callback(spot.echo, PIGPIO_EITHER_EDGE, self._tick_callback(spot))
+                )
+            else:
+                self.gpio.add_event_detect(spot.echo, self.gpio.BOTH, callback=self._edge_callback(spot))
+
+    def _tick_callback(self, spot):
+        def callback(pin, level, tick):
+            if level == PIGPIO_TIMEOUT:
+                return
+            arrival = time.monotonic()
+            with self.cond:
+                spot.on_edge(arrival, tick)
+                self.cond.notify_all()
+        return callback
+
+    def _edge_callback(self, spot):
+        def callback(pin):
+            arrival = time.monotonic()
+            with self.cond:
+                spot.on_edge(arrival, int(arrival * 1e6) % TICK_WRAP)
+                self.cond.notify_all()
+        return callback
+
+    def _fire_group(self, group):
+        """Trigger every sensor of a group at once and wait for their echoes."""
+        with self.cond:
+            for spot in group:
+                spot.reset_echo()
+        for spot in group:
+            self.gpio.output(spot.trig, self.gpio.HIGH)
+        time.sleep(TRIGGER_PULSE)
+        for spot in group:
+            self.gpio.output(spot.trig, self.gpio.LOW)
+        fired_at = time.monotonic()
+
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                pending = [spot.echo_deadline(fired_at) for spot in group if not spot.echo_resolved(now, fired_at)]
+                if not pending:
+                    break
+                # Woken by the edge callbacks; otherwise sleep until the next echo runs out of range
+                self.cond.wait(max(0.0, min(pending) - now))
+            return [(spot, spot.echo_distance()) for spot in group]
+
+    def sweep(self):
+        """Read every sensor once; return the spots whose occupancy changed."""
+        changed = []
+        for i, group in enumerate(self.groups):
+            if i:
+                time.sleep(self.group_gap)
+            for spot, distance in self._fire_group(group):
+                if spot.add_reading(distance, self.detection_distance, self.hysteresis):
+                    changed.append(spot)
+        return changed
+
+    def available(self):
+        return sum(1 for spot in self.spots if not spot.occupied)
+
+    def camera_spots(self):
+        return [spot for spot in self.spots if spot.camera]
+
+    def cleanup(self):
+        for callback in self._pigpio_callbacks:
+            callback.cancel()
+        self._pigpio_callbacks = []
+        if not self.pi:
+            for spot in self.spots:
+                self.gpio.remove_event_detect(spot.echo)
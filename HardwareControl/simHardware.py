@@ -0,0 +1,244 @@
+"""
+Simulated Raspberry Pi hardware for running the parking controller off-device.
+
+SimGPIO mirrors the subset of the RPi.GPIO API used by sensorControl, and
+adds helpers to drive inputs (IR sensors, ultrasonic echoes) from tests or
+scripts. FakeSMBus records I2C writes instead of talking to the LCD.
+"""
+import threading
+import time
+
+
+class SimGPIO:
+    BCM = "BCM"
+    BOARD = "BOARD"
+    IN = "IN"
+    OUT = "OUT"
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = "PUD_OFF"
+    PUD_UP = "PUD_UP"
+    PUD_DOWN = "PUD_DOWN"
+    RISING = "RISING"
+    FALLING = "FALLING"
+    BOTH = "BOTH"
+
+    ECHO_LATENCY = 0.0002  # seconds between trigger and echo rising
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.mode = None
+        self.directions = {}
+        self.levels = {}
+        self.callbacks = {}  # pin -> (edge, [callbacks], bouncetime seconds, last fire)
+        self.ultrasonic = {}  # trig pin -> (echo pin, distance function)
+        self.echo_windows = {}  # echo pin -> (rise time, fall time) of the current pulse
+
+    # --- RPi.GPIO API ---
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        with self.lock:
+            self.directions[pin] = direction
+            if initial is not None:
+                self.levels[pin] = initial
+            elif pin not in self.levels:
+                self.levels[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+    def input(self, pin):
+        with self.lock:
+            window = self.echo_windows.get(pin)
+            if window:
+                # Echo level follows the clock, so polling loops see an exact pulse width
+                return self.HIGH if window[0] <= time.monotonic() < window[1] else self.LOW
+            return self.levels.get(pin, self.LOW)
+
+    def output(self, pin, value):
+        value = self.HIGH if value else self.LOW
+        with self.lock:
+            previous = self.levels.get(pin, self.LOW)
+            self.levels[pin] = value
+            sensor = self.ultrasonic.get(pin)
+        # Falling edge on a trigger pin starts a simulated echo
+        if sensor and previous == self.HIGH and value == self.LOW:
+            self._echo(*sensor)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self.lock:
+            callbacks = [callback] if callback else []
+            self.callbacks[pin] = [edge, callbacks, (bouncetime or 0) / 1000.0, 0.0]
+
+    def add_event_callback(self, pin, callback):
+        with self.lock:
+            self.callbacks[pin][1].append(callback)
+
+    def remove_event_detect(self, pin):
+        with self.lock:
+            self.callbacks.pop(pin, None)
+
+    def cleanup(self, pins=None):
+        with self.lock:
+            if pins is None:
+                self.directions.clear()
+                self.callbacks.clear()
+            else:
+                for pin in pins if isinstance(pins, (list, tuple)) else [pins]:
+                    self.directions.pop(pin, None)
+                    self.callbacks.pop(pin, None)
+
+    def PWM(self, pin, frequency):
+        return SimPWM(pin, frequency)
+
+    # --- Simulation helpers ---
+
+    def set_input(self, pin, value):
+        """Drive an input pin, firing edge callbacks like the real interrupt thread."""
+        value = self.HIGH if value else self.LOW
+        with self.lock:
+            previous = self.levels.get(pin, self.LOW)
+            self.levels[pin] = value
+            detect = self.callbacks.get(pin)
+            if previous == value or not detect:
+                return
+            edge, callbacks, bounce, last_fire = detect
+            rising = value == self.HIGH
+            if edge == self.BOTH or (edge == self.RISING) == rising:
+                now = time.monotonic()
+                if now - last_fire < bounce:
+                    return
+                detect[3] = now
+                callbacks = list(callbacks)
+            else:
+                return
+        for callback in callbacks:
+            callback(pin)
+
+    def attach_ultrasonic(self, trig_pin, echo_pin, distance_fn):
+        """Answer triggers on trig_pin with an echo pulse for distance_fn() cm (None = no echo)."""
+        with self.lock:
+            self.ultrasonic[trig_pin] = (echo_pin, distance_fn)
+
+    def _echo(self, echo_pin, distance_fn):
+        distance = distance_fn()
+        if distance is None:
+            return
+        rise = time.monotonic() + self.ECHO_LATENCY
+        fall = rise + distance / 17150
+        with self.lock:
+            self.echo_windows[echo_pin] = (rise, fall)
+            has_callbacks = echo_pin in self.callbacks
+
+        if has_callbacks:
+            def pulse():
+                time.sleep(max(0.0, rise - time.monotonic()))
+                self._fire(echo_pin, self.HIGH)
+                time.sleep(max(0.0, fall - time.monotonic()))
+                self._fire(echo_pin, self.LOW)
+
+            threading.Thread(target=pulse, daemon=True).start()
+
+    def _fire(self, pin, value):
+        with self.lock:
+            detect = self.callbacks.get(pin)
+            if not detect:
+                return
+            edge, callbacks = detect[0], list(detect[1])
+        if edge == self.BOTH or (edge == self.RISING) == (value == self.HIGH):
+            for callback in callbacks:
+                callback(pin)
+
+
+class SimPWM:
+    """Records the duty cycle a PWM channel is set to."""
+
+    def __init__(self, pin, frequency):
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = None
+        self.history = []
+
+    def start(self, duty_cycle):
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.history.append((time.monotonic(), duty_cycle))
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.duty_cycle = None
+
+
+class FakeSMBus:
+    """
+    Stand-in for smbus.SMBus that records every byte written.
+
+    The bytes are also decoded as a PCF8574 backpack driving an HD44780 in
+    4-bit mode, so text() returns what a real 16x2 LCD would show.
+    """
+
+    LINE_ADDRESSES = (0x00, 0x40)
+
+    def __init__(self, bus=1, width=16):
+        self.bus = bus
+        self.width = width
+        self.writes = []  # (address, byte)
+        self.transactions = 0  # I2C transfers (single bytes or blocks)
+        self.ddram = {}  # DDRAM address -> character
+        self.cursor = 0
+        self._port = 0
+        self._high_nibble = None
+
+    def write_byte(self, address, value):
+        self.transactions += 1
+        self._port_write(address, value)
+
+    def write_i2c_block_data(self, address, cmd, values):
+        if len(values) > 32:
+            raise IOError("SMBus block write longer than 32 bytes")
+        self.transactions += 1
+        for value in [cmd] + list(values):
+            self._port_write(address, value)
+
+    def close(self):
+        pass
+
+    def text(self):
+        """The characters currently displayed, one string per line."""
+        return [
+            "".join(self.ddram.get(base + col, " ") for col in range(self.width))
+            for base in self.LINE_ADDRESSES
+        ]
+
+    def _port_write(self, address, value):
+        value &= 0xFF
+        self.writes.append((address, value))
+        # The HD44780 latches the data nibble on the falling edge of Enable (0x04)
+        if self._port & 0x04 and not value & 0x04:
+            nibble = self._port & 0xF0
+            if self._high_nibble is None:
+                self._high_nibble = nibble
+            else:
+                byte = self._high_nibble | (nibble >> 4)
+                self._high_nibble = None
+                self._lcd_byte(byte, self._port & 0x01)
+        self._port = value
+
+    def _lcd_byte(self, byte, is_char):
+        if is_char:
+            self.ddram[self.cursor] = chr(byte)
+            self.cursor += 1
+        elif byte & 0x80:  # set DDRAM address
+            self.cursor = byte & 0x7F
+        elif byte == 0x01:  # clear display
+            self.ddram.clear()
+            self.cursor = 0
+        elif byte in (0x33, 0x32):  # 8-bit to 4-bit mode switch sequence
+            self._high_nibble = None
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The controller modules import each other by name, as when run from HardwareControl/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,103 @@
+import threading
+import time
+from barrierControl import SERVO_SETTLE_TIME, BarrierController
+
+
+class FakeServo:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.is_open = False
+        self.moves = []  # (time, "open" / "close" / "release")
+        self.opened = threading.Event()
+        self.closed = threading.Event()
+
+    def open_barrier(self):
+        self.is_open = True
+        self.moves.append((self.clock(), "open"))
+        self.closed.clear()
+        self.opened.set()
+
+    def close_barrier(self):
+        self.is_open = False
+        self.moves.append((self.clock(), "close"))
+        self.opened.clear()
+        self.closed.set()
+
+    def release(self):
+        self.moves.append((self.clock(), "release"))
+
+
+class SlowToLock(threading.Condition):
+    """Lets other threads in whenever the barrier thread is about to take the lock."""
+
+    def __enter__(self):
+        if threading.current_thread().name == "barrier":
+            time.sleep(0.002)
+        return super().__enter__()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_windows_follow_the_simulated_clock():
+    clock = FakeClock()
+    servo = FakeServo(clock)
+    barrier = BarrierController(servo, open_time=5, clock=clock)
+
+    def at(now):
+        clock.now = now
+        return barrier.step(now)
+
+    assert at(0.0) is None
+    barrier.request_open("entrance")
+    assert at(0.0) == SERVO_SETTLE_TIME
+    assert at(SERVO_SETTLE_TIME) == 5
+
+    # The exit lane opens its own window, a second entrance car extends the first
+    clock.now = 3.0
+    barrier.request_open("exit")
+    clock.now = 4.0
+    barrier.request_open("entrance")
+    assert at(4.0) == 8.0
+    assert at(8.0) == 9.0
+    assert servo.is_open
+    assert at(9.0) == 9.0 + SERVO_SETTLE_TIME
+    assert at(9.0 + SERVO_SETTLE_TIME) is None
+
+    # A queued request adds a whole window after the current one
+    clock.now = 20.0
+    barrier.request_open("exit")
+    barrier.request_open("exit", queue=True)
+    at(20.0)
+    assert at(20.0 + SERVO_SETTLE_TIME) == 30.0
+    at(30.0)
+    assert not servo.is_open
+    assert servo.moves == [(0.0, "open"), (SERVO_SETTLE_TIME, "release"), (9.0, "close"), (9.0 + SERVO_SETTLE_TIME, "release"),
+                           (20.0, "open"), (20.0 + SERVO_SETTLE_TIME, "release"), (30.0, "close")]
+
+
+def test_requests_are_handled_at_once_by_the_thread():
+    servo = FakeServo()
+    barrier = BarrierController(servo, open_time=0.01)
+    barrier.cond = SlowToLock()
+    barrier.start()
+    latencies = []
+    try:
+        for _ in range(50):
+            # Lands while the thread is between step() and its wait, or waiting
+            requested = time.monotonic()
+            barrier.request_open("entrance")
+            assert servo.opened.wait(1), "request lost"
+            latencies.append(servo.moves[-1][0] - requested)
+            assert servo.closed.wait(1)
+    finally:
+        barrier.stop()
+
+    latencies.sort()
+    print(f"barrier event latency: median {latencies[25] * 1000:.2f}ms, max {latencies[-1] * 1000:.2f}ms")
+    assert latencies[-1] < 0.05
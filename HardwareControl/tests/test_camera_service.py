@@ -0,0 +1,55 @@
+import threading
+import time
+import pytest
+from cameraService import CaptureService, FakeCamera
+
+
+def service(buffer_size=3, frame_interval=0.01):
+    return CaptureService(FakeCamera(size=(8, 8), frame_delay=0), buffer_size=buffer_size,
+                          frame_interval=frame_interval, warmup=0)
+
+
+def shade(frame):
+    return frame.getpixel((0, 0))[0]
+
+
+def test_ring_buffer_keeps_the_newest_frames():
+    capture = service(buffer_size=3)
+    capture.start()
+    try:
+        deadline = time.monotonic() + 5
+        while capture.backend.frames_captured < 8 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        capture.stop()
+
+    captured = capture.backend.frames_captured
+    assert captured >= 8
+    assert len(capture.frames) == 3
+    # Oldest frames were evicted: the buffer holds the last three, in order
+    assert [shade(frame) for _, frame in capture.frames] == [(n * 16) % 256 for n in range(captured - 2, captured + 1)]
+    timestamps = [ts for ts, _ in capture.frames]
+    assert timestamps == sorted(timestamps)
+    assert shade(capture.latest()) == (captured * 16) % 256
+
+
+def test_capture_skips_frames_older_than_max_age():
+    capture = service()
+    stale = FakeCamera(size=(8, 8), frame_delay=0).capture_frame()
+    capture.frames.append((time.monotonic() - 10, stale))
+    assert capture.latest() is stale
+    with pytest.raises(TimeoutError):
+        capture.capture(max_age=1, timeout=0.05)
+
+    # A fresh frame arriving while capture() waits is returned
+    fresh = FakeCamera(size=(8, 8), frame_delay=0).capture_frame()
+
+    def deliver():
+        time.sleep(0.05)
+        with capture.cond:
+            capture.frames.append((time.monotonic(), fresh))
+            capture.cond.notify_all()
+
+    threading.Thread(target=deliver).start()
+    assert capture.capture(max_age=1, timeout=5) is fresh
+    assert capture.capture(max_age=1, timeout=0) is fresh
@@ -0,0 +1,30 @@
+import threading
+import time
+from sensorControl import EventScheduler
+
+
+def test_events_and_periodic_tasks_share_the_loop():
+    scheduler = EventScheduler()
+    handled = []
+    ticks = []
+    scheduler.on("entrance", lambda: handled.append(time.monotonic()))
+    scheduler.every(0.05, lambda: ticks.append(time.monotonic()))
+
+    def interrupts():
+        for _ in range(5):
+            time.sleep(0.02)
+            scheduler.post("entrance")
+        scheduler.post("unknown")  # no handler: ignored
+        time.sleep(0.2)
+        scheduler.stop()
+
+    threading.Thread(target=interrupts).start()
+    scheduler.run()
+
+    assert len(handled) == 5
+    assert scheduler.latency_count == 5
+    # Handlers run as soon as the interrupt is posted, not at the next sweep
+    assert scheduler.latency_max < 0.05
+    # Periodic task keeps its cadence while events come in
+    assert 5 <= len(ticks) <= 8
+    assert all(b - a > 0.03 for a, b in zip(ticks, ticks[1:]))
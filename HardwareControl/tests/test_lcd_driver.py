@@ -0,0 +1,63 @@
+import time
+import lcdDriver
+from lcdDriver import LcdDisplay
+from simHardware import FakeSMBus
+
+
+def test_only_changed_cells_are_written():
+    bus = FakeSMBus()
+    lcd = LcdDisplay(bus)
+    lcd.init()
+    lcd.show("Parking Spaces", "Available: 3")
+    assert lcd.render()
+    assert bus.text() == ["Parking Spaces  ", "Available: 3    "]
+
+    writes, transactions = len(bus.writes), bus.transactions
+    lcd.show("Parking Spaces", "Available: 4")
+    lcd.render()
+    assert bus.text() == ["Parking Spaces  ", "Available: 4    "]
+    # One address command and one character, 6 port writes each, in a single block
+    assert len(bus.writes) - writes == 12
+    assert bus.transactions - transactions == 1
+
+    writes = len(bus.writes)
+    lcd.show("Parking Spaces", "Available: 4")
+    lcd.render()
+    assert len(bus.writes) == writes
+
+    # Two separate runs on the second line: two address commands
+    lcd.show("Parking Spaces", "Avail.ble: 5")
+    lcd.render()
+    assert len(bus.writes) - writes == 4 * 6
+    assert bus.text()[1] == "Avail.ble: 5    "
+
+
+class FlakySMBus(FakeSMBus):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.attempts = 0
+
+    def write_i2c_block_data(self, address, cmd, values):
+        self.attempts += 1
+        if self.failures:
+            self.failures -= 1
+            raise IOError("remote I/O error")
+        super().write_i2c_block_data(address, cmd, values)
+
+
+def test_i2c_errors_back_off_before_redrawing(monkeypatch):
+    monkeypatch.setattr(lcdDriver, "I2C_RETRY_DELAY", 0.05)
+    bus = FlakySMBus(failures=3)
+    lcd = LcdDisplay(bus)
+    lcd.start()
+    lcd.show("Parking Spaces", "Available: 3")
+
+    # Retries after 0.05s, 0.1s and 0.2s instead of spinning on the bus
+    time.sleep(0.25)
+    assert bus.attempts == 3
+    deadline = time.monotonic() + 2
+    while bus.text()[1].strip() != "Available: 3" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert bus.text() == ["Parking Spaces  ", "Available: 3    "]
+    lcd.stop()
@@ -0,0 +1,86 @@
+import io
+from PIL import Image
+from plateRecognition import PlateRecognitionService, RecognizerBackend
+
+BOX = (100, 100, 220, 140)
+
+
+class CountingBackend(RecognizerBackend):
+    name = "counting"
+
+    def __init__(self, plate):
+        self.plate = plate
+        self.calls = 0
+
+    def recognize(self, image_bytes):
+        self.calls += 1
+        return self.plate, BOX
+
+
+def shot(flipped=False, quality=90, noise=0):
+    """Frame with a plate-like pattern in BOX, freshly noised and JPEG-encoded."""
+    frame = Image.new("L", (320, 240), 90)
+    plate = Image.linear_gradient("L").rotate(90).resize((BOX[2] - BOX[0], BOX[3] - BOX[1]))
+    if flipped:
+        plate = plate.rotate(180)
+    frame.paste(plate, BOX[:2])
+    frame = Image.blend(frame, Image.effect_noise(frame.size, 10 + noise), 0.05).convert("RGB")
+    buffer = io.BytesIO()
+    frame.save(buffer, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue())), buffer.getvalue()
+
+
+def recognize(service, frame_and_bytes):
+    frame, image_bytes = frame_and_bytes
+    return service.recognize(image_bytes, frame, spot_id=1)
+
+
+def test_reencoded_frames_hit_while_the_spot_stays_occupied():
+    backend = CountingBackend("B123ABC")
+    service = PlateRecognitionService(backend)
+    service.occupancy_changed(1, True, 100.0)
+
+    assert recognize(service, shot(quality=90)) == "B123ABC"
+    for quality, noise in ((85, 1), (92, 2), (80, 3)):
+        assert recognize(service, shot(quality=quality, noise=noise)) == "B123ABC"
+    assert backend.calls == 1
+    # Periodic snapshots repeat the same changed_at: still the same car
+    service.occupancy_changed(1, True, 100.0)
+    assert recognize(service, shot(quality=88)) == "B123ABC"
+    assert backend.calls == 1
+    assert service.summary()["hits"] == 4
+
+
+def test_a_new_parking_session_is_recognized_again():
+    backend = CountingBackend("B123ABC")
+    service = PlateRecognitionService(backend)
+    service.occupancy_changed(1, True, 100.0)
+    recognize(service, shot())
+
+    # The car left and another parked: same-looking frame, different car
+    service.occupancy_changed(1, False, 200.0)
+    service.occupancy_changed(1, True, 210.0)
+    backend.plate = "B999XYZ"
+    assert recognize(service, shot()) == "B999XYZ"
+    assert backend.calls == 2
+
+    # A lost telemetry message could hide the same swap
+    service.occupancy_lost()
+    assert recognize(service, shot()) == "B999XYZ"
+    assert backend.calls == 3
+
+
+def test_nothing_is_reused_without_occupancy_or_with_a_changed_plate_region():
+    backend = CountingBackend("B123ABC")
+    service = PlateRecognitionService(backend)
+    recognize(service, shot())
+    recognize(service, shot())
+    assert backend.calls == 2
+
+    service.occupancy_changed(1, True, 100.0)
+    recognize(service, shot())
+    assert recognize(service, shot(flipped=True)) == "B123ABC"
+    assert backend.calls == 4
+    # Frames without a spot (or without the decoded image) always go to the backend
+    service.recognize(shot()[1])
+    assert backend.calls == 5
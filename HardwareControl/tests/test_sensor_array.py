@@ -0,0 +1,74 @@
+import threading
+import time
+from sensorArray import ECHO_TIMEOUT, SensorArray, SpotSensor
+from simHardware import SimGPIO
+
+
+def feed(spot, *readings):
+    """Push readings through the filter; returns the occupancy change flags."""
+    return [spot.add_reading(distance, 3, 1.0) for distance in readings]
+
+
+def test_median_filter_ignores_single_spikes():
+    spot = SpotSensor(1, trig=5, echo=6, window=5)
+    assert feed(spot, 10, 10, 10, 2, 2) == [False] * 5
+    assert not spot.occupied
+    # Third close reading moves the median under the detection distance
+    assert feed(spot, 2) == [True]
+    assert spot.occupied and spot.distance == 2
+    # One far reading (a passer-by, a missed echo) doesn't free the spot
+    assert feed(spot, 10, None) == [False, False]
+    assert spot.occupied
+
+
+def test_hysteresis_band_keeps_the_current_state():
+    spot = SpotSensor(1, trig=5, echo=6, window=3)
+    # Inside the band (3 < d <= 4): a free spot stays free...
+    assert feed(spot, 3.5, 3.5, 3.5) == [False] * 3
+    assert not spot.occupied
+    feed(spot, 2.5, 2.5)
+    assert spot.occupied
+    # ...and an occupied one stays occupied
+    assert feed(spot, 3.5, 3.5, 3.5) == [False] * 3
+    assert spot.occupied
+    assert feed(spot, 4.5, 4.5) == [False, True]
+    assert not spot.occupied
+
+
+def test_no_echo_reads_as_far_away():
+    spot = SpotSensor(1, trig=5, echo=6, window=3)
+    feed(spot, 2, 2, 2)
+    assert feed(spot, None, None) == [False, True]
+    assert spot.distance is None
+    assert not spot.occupied
+
+
+class CountingCondition(threading.Condition):
+    def __init__(self):
+        super().__init__()
+        self.waits = 0
+
+    def wait(self, timeout=None):
+        self.waits += 1
+        return super().wait(timeout)
+
+
+def test_group_waits_on_edges_instead_of_polling():
+    gpio = SimGPIO()
+    parked, empty = SpotSensor(1, trig=5, echo=6), SpotSensor(2, trig=13, echo=19)
+    gpio.attach_ultrasonic(5, 6, lambda: 8)
+    gpio.attach_ultrasonic(13, 19, lambda: None)
+    array = SensorArray(gpio, [parked, empty])
+    array.cond = CountingCondition()
+    array.setup()
+
+    started = time.monotonic()
+    readings = dict(array._fire_group([parked, empty]))
+    elapsed = time.monotonic() - started
+
+    assert abs(readings[parked] - 8) < 2
+    assert readings[empty] is None
+    # The missing echo is given up on at its deadline, after a handful of wake-ups (two edges, one timeout)
+    assert ECHO_TIMEOUT <= elapsed < ECHO_TIMEOUT + 0.03
+    assert array.cond.waits <= 4
+    array.cleanup()
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   View,
   Text,
@@ -9,28 +9,60 @@ import {
   Pressable,
 } from 'react-native';
 import { getReservations, deleteReservation } from './api/reserveService';
+import { subscribeLive } from './api/liveService';
 
 const ReservationList = ({ route }) => {
   const userEmail = route.params?.email || '';
   const [reservations, setReservations] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const reservationsRef = useRef([]);
 
+  // First page; replaces whatever was loaded before
   const fetchReservations = async () => {
     setLoading(true);
     const result = await getReservations(userEmail);
     if (result.success) {
-      setReservations(result.data);
-      console.log('Fetched reservations:', result.data);
+      setReservations(result.data.items);
+      setNextCursor(result.data.next_cursor);
+      reservationsRef.current = result.data.items;
     } else {
       Alert.alert('Error', 'Failed to fetch reservations');
     }
     setLoading(false);
   };
 
+  const fetchMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    const result = await getReservations(userEmail, nextCursor);
+    if (result.success) {
+      const items = [...reservationsRef.current, ...result.data.items];
+      setReservations(items);
+      setNextCursor(result.data.next_cursor);
+      reservationsRef.current = items;
+    }
+    setLoadingMore(false);
+  };
+
   useEffect(() => {
     fetchReservations();
   }, []);
 
+  // Refresh when the status of a spot/date we hold a reservation for changes
+  useEffect(() => {
+    const unsubscribe = subscribeLive((event) => {
+      if (event.type !== 'reservation' && event.type !== 'status') return;
+      if (event.type === 'reservation' && event.data.action === 'created') return;
+      const affected = reservationsRef.current.some(
+        (item) => item.parking_spot_id === event.data.parking_spot_id && item.date === event.data.date
+      );
+      if (affected) fetchReservations();
+    });
+    return unsubscribe;
+  }, []);
+
   const handleDelete = (reservationId) => {
     Alert.alert(
       'Confirm Delete',
@@ -93,6 +125,9 @@ const renderItem = ({ item }) => (
       keyExtractor={(item) => item.reservation_id}
       renderItem={renderItem}
       contentContainerStyle={styles.container}
+      onEndReached={fetchMore}
+      onEndReachedThreshold={0.5}
+      ListFooterComponent={loadingMore ? <ActivityIndicator color="#4CAF50" /> : null}
     />
   );
 };
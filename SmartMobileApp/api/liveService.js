@@ -0,0 +1,51 @@
+const LIVE_URL = 'ws://192.168.1.7:8000/live/ws';
+const MAX_RETRY_DELAY = 30000;
+
+// Subscribe to live availability and reservation updates.
+// onEvent gets every event ({ type, ts, data }): a 'snapshot' first (and after
+// a resync), then 'availability' and 'reservation' changes.
+// Reconnects with backoff; returns a function that closes the subscription.
+export const subscribeLive = (onEvent) => {
+  let socket = null;
+  let closed = false;
+  let retryDelay = 1000;
+  let retryTimer = null;
+
+  const connect = () => {
+    socket = new WebSocket(LIVE_URL);
+
+    socket.onopen = () => {
+      retryDelay = 1000;
+    };
+
+    socket.onmessage = (message) => {
+      let events;
+      try {
+        events = JSON.parse(message.data);
+      } catch {
+        return;
+      }
+      events.forEach((event) => {
+        if (event.type !== 'ping') onEvent(event);
+      });
+    };
+
+    socket.onclose = () => {
+      if (closed) return;
+      retryTimer = setTimeout(connect, retryDelay);
+      retryDelay = Math.min(retryDelay * 2, MAX_RETRY_DELAY);
+    };
+
+    socket.onerror = () => {
+      socket.close();
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (socket) socket.close();
+  };
+};
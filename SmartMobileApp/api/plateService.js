@@ -6,7 +6,12 @@ const carPlateKey = (email) => `userCarPlates_${email.toLowerCase()}`;
 
 export const getCarPlates = async (email) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/car-plates/${email}`);
+    const { token, tokenType } = await getStoredToken();
+    if (!token) throw new Error('Not authenticated');
+
+    const response = await fetch(`${API_BASE_URL}/car-plates/${email}`, {
+      headers: { 'Authorization': `${tokenType} ${token}` },
+    });
     if (!response.ok) throw new Error('Failed to fetch car plates');
     const data = await response.json();
     await AsyncStorage.setItem(carPlateKey(email), JSON.stringify(data.car_plate_ids || []));
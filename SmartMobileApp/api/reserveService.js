@@ -28,13 +28,17 @@ export const makeReservation = async (reservationData) => {
   }
 };
 
-export const getReservations = async (userEmail) => {
+// One page of reservations: data is { items, next_cursor }; pass next_cursor back for the next page
+export const getReservations = async (userEmail, cursor = null, limit = 20) => {
   try {
     const { token, tokenType } = await getStoredToken();
 
     if (!token) throw new Error('Not authenticated');
 
-    const response = await fetch(`${API_BASE_URL}/reservations/?email=${encodeURIComponent(userEmail)}`, {
+    let url = `${API_BASE_URL}/reservations/?email=${encodeURIComponent(userEmail)}&limit=${limit}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+
+    const response = await fetch(url, {
       method: 'GET',
       headers: {
         'Authorization': `${tokenType} ${token}`,